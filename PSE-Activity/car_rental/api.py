@@ -0,0 +1,378 @@
+
+"""HTTP/JSON API over CarRentalService (standard library only).
+
+    python api.py --port 8000
+
+Read endpoints (GET):
+    /vehicles?after_id=&limit=&available=1     /vehicles/<id>
+    /vehicles/search?q=                         /vehicles/free?start=&end=
+    /customers?after_id=&limit=                 /customers/<id>
+    /rentals?after_id=&limit=&status=           /rentals/<id>
+    /quote?vehicle_id=&start=&end=
+    /metrics?format=prometheus|json             (filled when started with --metrics)
+Write endpoints (POST, JSON body):
+    /vehicles  /customers  /rentals  /rentals/<id>/return  /rentals/<id>/cancel
+
+Connections are kept alive (HTTP/1.1). GET responses carry an ETag and
+Cache-Control; a matching If-None-Match returns 304. Bodies larger than
+GZIP_MIN_BYTES are gzipped when the client accepts it.
+"""
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sqlite3
+import traceback
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from models import Customer, Rental, Vehicle
+from services import CarRentalService, ValidationError
+from utils import parse_date
+
+GZIP_MIN_BYTES = 1024
+MAX_INT = 2**63 - 1  # SQLite integers are 64-bit; a bigger Python int makes sqlite3 raise OverflowError
+# Cache-Control per kind of resource: listings change with every booking, so clients
+# revalidate them with the ETag; single entities and quotes may be reused briefly.
+CACHE_CONTROL = {
+    "list": "no-cache",
+    "entity": "private, max-age=5",
+    "quote": "private, max-age=60",
+}
+
+
+class NotFound(Exception):
+    pass
+
+
+class MethodNotAllowed(Exception):
+    def __init__(self, allowed: List[str]):
+        super().__init__("Method not allowed.")
+        self.allowed = allowed
+
+
+def to_json(obj: Any) -> Any:
+    if isinstance(obj, Vehicle):
+        return {"id": obj.id, "brand": obj.brand, "model": obj.model, "year": obj.year,
+                "daily_rate": obj.daily_rate, "vehicle_type": obj.vehicle_type, "available": obj.available}
+    if isinstance(obj, Customer):
+        return {"id": obj.id, "name": obj.name, "email": obj.email, "phone": obj.phone}
+    if isinstance(obj, Rental):
+        return {"id": obj.id, "customer_id": obj.customer_id, "vehicle_id": obj.vehicle_id,
+                "start_date": obj.start_date.isoformat(), "end_date": obj.end_date.isoformat(),
+                "total_cost": obj.total_cost, "status": obj.status}
+    if isinstance(obj, list):
+        return [to_json(o) for o in obj]
+    return obj
+
+
+class Params:
+    """Typed access to query-string or JSON-body values; bad input becomes a ValidationError."""
+    def __init__(self, values: Dict[str, Any]):
+        self._values = values
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._values.get(name, default)
+
+    def require(self, name: str) -> Any:
+        value = self._values.get(name)
+        if value is None or value == "":
+            raise ValidationError(f"'{name}' is required.")
+        return value
+
+    def int(self, name: str, default: Optional[int] = None) -> int:
+        value = self._values.get(name, default) if default is not None else self.require(name)
+        if isinstance(value, (bool, float)):  # int() would take true or 2.7 from a JSON body
+            raise ValidationError(f"'{name}' must be an integer.")
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError(f"'{name}' must be an integer.") from None
+        if not -MAX_INT - 1 <= number <= MAX_INT:
+            raise ValidationError(f"'{name}' is out of range.")
+        return number
+
+    def float(self, name: str) -> float:
+        value = self.require(name)
+        if isinstance(value, bool):
+            raise ValidationError(f"'{name}' must be a number.")
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValidationError(f"'{name}' must be a number.") from None
+
+    def date(self, name: str) -> date:
+        try:
+            return parse_date(str(self.require(name)))
+        except ValueError as e:
+            raise ValidationError(str(e)) from None
+
+
+Route = Tuple[str, "re.Pattern[str]", Callable[..., Any], Optional[str]]
+
+
+class CarRentalAPI:
+    """Maps (method, path) to service calls; transport-agnostic so it is easy to test."""
+    def __init__(self, service: CarRentalService):
+        self.service = service
+        self.routes: List[Route] = []
+        get, post = self._route("GET"), self._route("POST")
+        get(r"/vehicles", self.list_vehicles, "list")
+        get(r"/vehicles/search", self.search_vehicles, "list")
+        get(r"/vehicles/free", self.free_vehicles, "list")
+        get(r"/vehicles/(\d+)", self.get_vehicle, "entity")
+        get(r"/customers", self.list_customers, "list")
+        get(r"/customers/(\d+)", self.get_customer, "entity")
+        get(r"/rentals", self.list_rentals, "list")
+        get(r"/rentals/(\d+)", self.get_rental, "entity")
+        get(r"/quote", self.quote, "quote")
+        get(r"/metrics", self.get_metrics)
+        post(r"/vehicles", self.add_vehicle, "created")
+        post(r"/customers", self.add_customer, "created")
+        post(r"/rentals", self.create_rental, "created")
+        post(r"/rentals/(\d+)/return", self.return_vehicle)
+        post(r"/rentals/(\d+)/cancel", self.cancel_rental)
+
+    def _route(self, method: str):
+        def add(pattern: str, handler: Callable[..., Any], kind: Optional[str] = None):
+            self.routes.append((method, re.compile(pattern + r"/?$"), handler, kind))
+        return add
+
+    def resolve(self, method: str, path: str) -> Tuple[Callable[..., Any], Tuple[str, ...], Optional[str]]:
+        allowed: List[str] = []
+        for route_method, pattern, handler, kind in self.routes:
+            m = pattern.match(path)
+            if m:
+                if route_method == method:
+                    return handler, m.groups(), kind
+                allowed.append(route_method)
+        if allowed:
+            raise MethodNotAllowed(allowed)
+        raise NotFound("No such endpoint.")
+
+    # -------- Vehicles --------
+    def list_vehicles(self, p: Params):
+        return self.service.list_vehicles_page(p.int("after_id", 0), p.int("limit", 50),
+                                               only_available=p.get("available") in ("1", "true"))
+
+    def search_vehicles(self, p: Params):
+        return self.service.search_vehicles(str(p.require("q")))
+
+    def free_vehicles(self, p: Params):
+        return self.service.find_available_vehicles(p.date("start"), p.date("end"))
+
+    def get_vehicle(self, p: Params, vehicle_id: str):
+        return self._found(self.service.get_vehicle(self._id(vehicle_id, "Vehicle")), "Vehicle", vehicle_id)
+
+    def add_vehicle(self, p: Params):
+        vid = self.service.add_vehicle(str(p.require("brand")), str(p.require("model")), p.int("year"),
+                                       p.float("daily_rate"), str(p.require("vehicle_type")))
+        return {"id": vid}
+
+    # -------- Customers --------
+    def list_customers(self, p: Params):
+        return self.service.list_customers_page(p.int("after_id", 0), p.int("limit", 50))
+
+    def get_customer(self, p: Params, customer_id: str):
+        return self._found(self.service.get_customer(self._id(customer_id, "Customer")), "Customer", customer_id)
+
+    def add_customer(self, p: Params):
+        return {"id": self.service.add_customer(str(p.require("name")), str(p.require("email")),
+                                                str(p.require("phone")))}
+
+    # -------- Rentals --------
+    def list_rentals(self, p: Params):
+        return self.service.list_rentals_page(p.int("after_id", 0), p.int("limit", 50), status=p.get("status"))
+
+    def get_rental(self, p: Params, rental_id: str):
+        return self._found(self.service.get_rental(self._id(rental_id, "Rental")), "Rental", rental_id)
+
+    def create_rental(self, p: Params):
+        return {"id": self.service.create_rental(p.int("customer_id"), p.int("vehicle_id"),
+                                                 p.date("start"), p.date("end"))}
+
+    def return_vehicle(self, p: Params, rental_id: str):
+        self.service.return_vehicle(self._id(rental_id, "Rental"))
+        return {"id": int(rental_id), "status": "finished"}
+
+    def cancel_rental(self, p: Params, rental_id: str):
+        self.service.cancel_rental(self._id(rental_id, "Rental"))
+        return {"id": int(rental_id), "status": "cancelled"}
+
+    def quote(self, p: Params):
+        vehicle_id, start, end = p.int("vehicle_id"), p.date("start"), p.date("end")
+        return {"vehicle_id": vehicle_id, "start": start.isoformat(), "end": end.isoformat(),
+                "total_cost": self.service.quote_rental(vehicle_id, start, end)}
+
+    # -------- Instrumentation --------
+    def get_metrics(self, p: Params):
+        fmt = p.get("format", "prometheus")
+        if fmt == "json":
+            return metrics.export_json()
+        if fmt != "prometheus":
+            raise ValidationError("format must be 'prometheus' or 'json'.")
+        return metrics.export_prometheus()  # plain text, see RequestHandler._handle
+
+    @staticmethod
+    def _id(entity_id: str, kind: str) -> int:
+        # the routes only match digits; an id no row can have is simply not there
+        number = int(entity_id)
+        if number > MAX_INT:
+            raise NotFound(f"{kind} {entity_id} does not exist.")
+        return number
+
+    @staticmethod
+    def _found(entity: Any, kind: str, entity_id: str) -> Any:
+        if entity is None:
+            raise NotFound(f"{kind} {entity_id} does not exist.")
+        return entity
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive by default
+    # headers and body go out in separate writes; with Nagle on, the body waits for the
+    # client's delayed ACK (~40 ms per request on a kept-alive connection)
+    disable_nagle_algorithm = True
+    api: CarRentalAPI  # set by make_server()
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        try:
+            # read the body before routing: whatever the answer, the next request on this
+            # connection starts right after it
+            body = self._read_body()
+            handler, args, kind = self.api.resolve(method, url.path)
+            if method == "GET":
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            else:
+                params = self._parse_json(body)
+            result = handler(Params(params), *args)
+            if isinstance(result, str):  # Prometheus exposition format
+                self._write(HTTPStatus.OK, result.encode("utf-8"), {"Content-Type": "text/plain; version=0.0.4"})
+                return
+            status = HTTPStatus.CREATED if kind == "created" else HTTPStatus.OK
+            self._send(status, to_json(result), kind if kind in CACHE_CONTROL else None)
+        except ConnectionError:  # the client went away; there is no one to answer
+            raise
+        except NotFound as e:
+            self._send(HTTPStatus.NOT_FOUND, {"error": str(e)})
+        except MethodNotAllowed as e:
+            self._send(HTTPStatus.METHOD_NOT_ALLOWED, {"error": str(e)}, headers={"Allow": ", ".join(e.allowed)})
+        except ValidationError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except sqlite3.IntegrityError as e:  # e.g. a duplicate customer email
+            self._send(HTTPStatus.CONFLICT, {"error": str(e)})
+        except Exception:  # a bug, not bad input: answer the client and keep the connection
+            self.log_error("%s %s failed:\n%s", method, self.path, traceback.format_exc())
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."})
+
+    def _read_body(self) -> bytes:
+        header = self.headers.get("Content-Length")
+        if header is None:
+            return b""
+        length = int(header) if header.strip().isdigit() else -1
+        if length < 0:
+            # where this body ends is unknown, so the connection cannot carry another request
+            self.close_connection = True
+            raise ValidationError("Content-Length must be a non-negative integer.")
+        return self.rfile.read(length) if length else b""
+
+    @staticmethod
+    def _parse_json(raw: bytes) -> Dict[str, Any]:
+        try:
+            body = json.loads(raw or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValidationError("Request body must be JSON.") from None
+        if not isinstance(body, dict):
+            raise ValidationError("Request body must be a JSON object.")
+        return body
+
+    def _send(self, status: HTTPStatus, payload: Any, cache: Optional[str] = None,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        # strict JSON: a NaN or infinity fails here (a 500) instead of reaching the client as a bare token
+        body = json.dumps(payload, separators=(",", ":"), allow_nan=False).encode("utf-8")
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        if cache:
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            headers["Cache-Control"] = CACHE_CONTROL[cache]
+            headers["Vary"] = "Accept-Encoding"
+            if self._etag_matches(etag):
+                self._write(HTTPStatus.NOT_MODIFIED, b"", dict(headers, ETag=etag))
+                return
+            headers["ETag"] = etag
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+            if "ETag" in headers:  # a different representation needs a different strong ETag
+                headers["ETag"] = headers["ETag"][:-1] + '-gz"'
+        self._write(status, body, headers)
+
+    def _etag_matches(self, etag: str) -> bool:
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        tags = {t.strip().removeprefix("W/").replace('-gz"', '"') for t in header.split(",")}
+        return "*" in tags or etag in tags
+
+    def _write(self, status: HTTPStatus, body: bytes, headers: Dict[str, str]) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):  # keep the console quiet under load
+        pass
+
+    def log_error(self, format, *args):  # errors still go to stderr
+        BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000,
+                service: Optional[CarRentalService] = None) -> ThreadingHTTPServer:
+    handler = type("BoundRequestHandler", (RequestHandler,), {"api": CarRentalAPI(service or CarRentalService())})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Car rental HTTP/JSON API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--metrics", action="store_true",
+                   help="time service, repository and SQL calls and serve them at /metrics "
+                        "(also enabled by CAR_RENTAL_METRICS=1)")
+    args = p.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    else:
+        metrics.enable_from_env()
+    server = make_server(args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+
+"""asyncio facade over CarRentalService for async front ends.
+
+Each call runs the synchronous service on a bounded worker pool, so an event
+loop (e.g. an async web server) never blocks on SQLite:
+
+    async with AsyncCarRentalService() as svc:
+        rental_id = await svc.create_rental(1, 2, start, end, timeout=2.0)
+
+Timeouts and cancellation drop calls that are still waiting for a worker.
+A call that is already running on a worker finishes in the background; its
+transaction commits or rolls back as a unit, so it never leaves partial writes.
+"""
+from __future__ import annotations
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import repository as repo
+from models import Customer, Rental, Vehicle
+from services import CarRentalService
+
+
+class AsyncCarRentalService:
+    def __init__(self, service: Optional[CarRentalService] = None, max_workers: Optional[int] = None,
+                 max_pending: int = 1000, timeout: Optional[float] = 10.0):
+        # one worker per pooled connection, so workers never queue on the pool itself
+        self.max_workers = max_workers or max(repo.POOL_SIZE, 1)
+        self.timeout = timeout
+        self._service = service or CarRentalService()
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="car-rental")
+        self._max_pending = max_pending
+        self._pending: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncCarRentalService":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Stop accepting work and wait for calls already running on workers."""
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            self._executor.shutdown, wait=True, cancel_futures=True))
+
+    async def _call(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        if self._pending is None:
+            self._pending = asyncio.Semaphore(self._max_pending)
+        loop = asyncio.get_running_loop()
+
+        async def run():
+            # bounds the backlog: callers wait here instead of piling up in the executor queue
+            async with self._pending:
+                return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+        return await asyncio.wait_for(run(), timeout if timeout is not None else self.timeout)
+
+    # -------- Customers --------
+    async def add_customer(self, name: str, email: str, phone: str, timeout: Optional[float] = None) -> int:
+        return await self._call(self._service.add_customer, name, email, phone, timeout=timeout)
+
+    async def get_customer(self, customer_id: int, timeout: Optional[float] = None) -> Optional[Customer]:
+        return await self._call(self._service.get_customer, customer_id, timeout=timeout)
+
+    async def list_customers_page(self, after_id: int = 0, limit: int = 50,
+                                  timeout: Optional[float] = None) -> List[Customer]:
+        return await self._call(self._service.list_customers_page, after_id, limit, timeout=timeout)
+
+    # -------- Vehicles --------
+    async def add_vehicle(self, brand: str, model: str, year: int, daily_rate: float, vehicle_type: str,
+                          timeout: Optional[float] = None) -> int:
+        return await self._call(self._service.add_vehicle, brand, model, year, daily_rate, vehicle_type,
+                                timeout=timeout)
+
+    async def get_vehicle(self, vehicle_id: int, timeout: Optional[float] = None) -> Optional[Vehicle]:
+        return await self._call(self._service.get_vehicle, vehicle_id, timeout=timeout)
+
+    async def list_vehicles_page(self, after_id: int = 0, limit: int = 50, only_available: bool = False,
+                                 timeout: Optional[float] = None) -> List[Vehicle]:
+        return await self._call(self._service.list_vehicles_page, after_id, limit,
+                                only_available=only_available, timeout=timeout)
+
+    async def search_vehicles(self, keyword: str, timeout: Optional[float] = None) -> List[Vehicle]:
+        return await self._call(self._service.search_vehicles, keyword, timeout=timeout)
+
+    async def find_available_vehicles(self, start: date, end: date,
+                                      timeout: Optional[float] = None) -> List[Vehicle]:
+        return await self._call(self._service.find_available_vehicles, start, end, timeout=timeout)
+
+    async def is_vehicle_free(self, vehicle_id: int, start: date, end: date,
+                              timeout: Optional[float] = None) -> bool:
+        return await self._call(self._service.is_vehicle_free, vehicle_id, start, end, timeout=timeout)
+
+    # -------- Rentals --------
+    async def create_rental(self, customer_id: int, vehicle_id: int, start: date, end: date,
+                            timeout: Optional[float] = None) -> int:
+        return await self._call(self._service.create_rental, customer_id, vehicle_id, start, end, timeout=timeout)
+
+    async def quote_rental(self, vehicle_id: int, start: date, end: date, timeout: Optional[float] = None) -> float:
+        return await self._call(self._service.quote_rental, vehicle_id, start, end, timeout=timeout)
+
+    async def return_vehicle(self, rental_id: int, timeout: Optional[float] = None) -> None:
+        return await self._call(self._service.return_vehicle, rental_id, timeout=timeout)
+
+    async def cancel_rental(self, rental_id: int, timeout: Optional[float] = None) -> None:
+        return await self._call(self._service.cancel_rental, rental_id, timeout=timeout)
+
+    async def get_rental(self, rental_id: int, timeout: Optional[float] = None) -> Optional[Rental]:
+        return await self._call(self._service.get_rental, rental_id, timeout=timeout)
+
+    async def list_rentals_page(self, after_id: int = 0, limit: int = 50, status: Optional[str] = None,
+                                timeout: Optional[float] = None) -> List[Rental]:
+        return await self._call(self._service.list_rentals_page, after_id, limit, status=status, timeout=timeout)
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._service.cache_stats()
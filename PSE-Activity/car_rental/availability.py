@@ -0,0 +1,75 @@
+
+"""In-memory availability index over active rentals.
+
+Active rentals of one vehicle never overlap (book_rental() guards that), so
+each vehicle's bookings form a set of disjoint intervals. Kept sorted by start
+day, their end days are sorted too, and "is [start, end] free?" only has to
+look at the one booking that starts last on or before `end` - a binary search.
+"""
+from __future__ import annotations
+import threading
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Tuple
+
+
+class AvailabilityIndex:
+    """Per-vehicle sorted interval lists keyed by day ordinals (inclusive)."""
+    def __init__(self):
+        self._starts: Dict[int, List[int]] = {}
+        self._ends: Dict[int, List[int]] = {}
+        self._rentals: Dict[int, Tuple[int, int, int]] = {}  # rental_id -> (vehicle_id, start, end)
+        self._lock = threading.Lock()
+
+    def load(self, rows: Iterable[Tuple[int, int, int, int]]) -> None:
+        """Replace the index with (rental_id, vehicle_id, start_day, end_day) rows."""
+        by_vehicle: Dict[int, List[Tuple[int, int]]] = {}
+        rentals = {}
+        for rental_id, vehicle_id, start, end in rows:
+            by_vehicle.setdefault(vehicle_id, []).append((start, end))
+            rentals[rental_id] = (vehicle_id, start, end)
+        with self._lock:
+            self._starts, self._ends = {}, {}
+            for vehicle_id, intervals in by_vehicle.items():
+                intervals.sort()
+                self._starts[vehicle_id] = [s for s, _ in intervals]
+                self._ends[vehicle_id] = [e for _, e in intervals]
+            self._rentals = rentals
+
+    def add(self, rental_id: int, vehicle_id: int, start: int, end: int) -> None:
+        with self._lock:
+            if rental_id in self._rentals:  # already applied
+                return
+            starts = self._starts.setdefault(vehicle_id, [])
+            ends = self._ends.setdefault(vehicle_id, [])
+            i = bisect_right(starts, start)
+            starts.insert(i, start)
+            ends.insert(i, end)
+            self._rentals[rental_id] = (vehicle_id, start, end)
+
+    def remove(self, rental_id: int) -> None:
+        with self._lock:
+            entry = self._rentals.pop(rental_id, None)
+            if entry is None:
+                return
+            vehicle_id, start, end = entry
+            starts, ends = self._starts[vehicle_id], self._ends[vehicle_id]
+            i = bisect_right(starts, start) - 1
+            while i >= 0 and starts[i] == start and ends[i] != end:
+                i -= 1
+            if i >= 0 and starts[i] == start:
+                del starts[i]
+                del ends[i]
+
+    def is_free(self, vehicle_id: int, start: int, end: int) -> bool:
+        with self._lock:
+            starts = self._starts.get(vehicle_id)
+            if not starts:
+                return True
+            i = bisect_right(starts, end)
+            return i == 0 or self._ends[vehicle_id][i - 1] < start
+
+    def free_vehicles(self, vehicle_ids: Iterable[int], start: int, end: int) -> List[int]:
+        return [vid for vid in vehicle_ids if self.is_free(vid, start, end)]
+
+    def __len__(self) -> int:
+        return len(self._rentals)
@@ -0,0 +1,850 @@
+
+"""Micro-benchmarks for the car rental system.
+
+Every benchmark runs against a throw-away database in a temp directory,
+never against car_rental.db. Run `python bench.py --help` for the list.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import csv
+import http.client
+import itertools
+import json
+import os
+import platform
+import subprocess
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import api
+import bulk
+import datagen
+import history
+import metrics
+import migrations
+from async_service import AsyncCarRentalService
+import repository as repo
+import pricing
+import reports
+from pricing import PricingContext, WeekendDiscountPricing, quote_batch
+from services import CarRentalService, ValidationError
+
+
+@contextmanager
+def temp_db(pool_size: int = repo.POOL_SIZE, db_profile: str = None):
+    with tempfile.TemporaryDirectory() as d:
+        repo.configure(db_name=os.path.join(d, "bench.db"), pool_size=pool_size, db_profile=db_profile)
+        try:
+            yield
+        finally:
+            repo.close_pool()
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def report(label: str, count: int, seconds: float, unit: str = "ops") -> None:
+    rate = count / seconds if seconds else float("inf")
+    print(f"{label:<32} {count:>9} {unit} in {seconds:8.3f}s  -> {rate:12.1f} {unit}/s")
+
+
+# ------------ Connection pool -------------
+def _rental_round_trips(service: CarRentalService, vehicles: int, rentals: int) -> float:
+    customer_id = service.add_customer("Bench User", "bench@example.com", "000")
+    vehicle_ids = [service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy") for _ in range(vehicles)]
+    start = date(2025, 1, 6)
+    t0 = time.perf_counter()
+    for i in range(rentals):
+        vid = vehicle_ids[i % vehicles]
+        rid = service.create_rental(customer_id, vid, start, start + timedelta(days=2))
+        service.return_vehicle(rid)
+    return time.perf_counter() - t0
+
+
+def bench_pool(args) -> None:
+    for label, size in (("open-per-call (pool_size=0)", 0), (f"pooled (pool_size={args.pool_size})", args.pool_size)):
+        with temp_db(pool_size=size):
+            elapsed = _rental_round_trips(CarRentalService(), args.vehicles, args.rentals)
+        report(label, args.rentals, elapsed, "rentals")
+
+
+# ------------ Concurrent booking -------------
+def _legacy_create_rental(customer_id: int, vehicle_id: int, start: date, end: date) -> int:
+    """The pre-transactional create_rental: five separate round trips."""
+    if not repo.get_customer(customer_id):
+        raise ValidationError("missing customer")
+    vehicle = repo.get_vehicle(vehicle_id)
+    if not vehicle or not vehicle.available:
+        raise ValidationError("vehicle not available")
+    if repo.has_overlapping_rental(vehicle_id, start, end):
+        raise ValidationError("overlap")
+    days = (end - start).days + 1
+    cost = PricingContext(vehicle.vehicle_type).choose(start, end).compute_cost(days, vehicle.daily_rate, start, end)
+    rental_id = repo.add_rental(customer_id, vehicle_id, start, end, cost)
+    repo.set_vehicle_availability(vehicle_id, False)
+    return rental_id
+
+
+def _run_booking_clients(book, vehicle_ids, customer_id, threads: int, attempts: int) -> float:
+    start = date(2025, 1, 6)
+
+    def client(n):
+        for i in range(attempts):
+            try:
+                book(customer_id, vehicle_ids[(n * attempts + i) % len(vehicle_ids)], start, start + timedelta(days=3))
+            except ValidationError:
+                pass
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - t0
+
+
+def bench_booking(args) -> None:
+    attempts = args.threads * args.attempts
+    for label, legacy in (("legacy 5-transaction booking", True), ("BEGIN IMMEDIATE booking", False)):
+        with temp_db(pool_size=args.threads):
+            service = CarRentalService()
+            customer_id = service.add_customer("Bench User", "bench@example.com", "000")
+            vehicle_ids = [service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy") for _ in range(args.vehicles)]
+            book = _legacy_create_rental if legacy else service.create_rental
+            elapsed = _run_booking_clients(book, vehicle_ids, customer_id, args.threads, args.attempts)
+            booked = len(service.list_rentals())
+        report(label, attempts, elapsed, "attempts")
+        print(f"{'':<32} {booked} rentals for {args.vehicles} vehicles ({booked - args.vehicles} double-booked)")
+
+
+# ------------ Overlap check on a large rentals table -------------
+LEGACY_OVERLAP_SQL = """
+    SELECT COUNT(*) FROM rentals
+    WHERE vehicle_id=? AND status='active' AND NOT (
+        date(end_date) < date(?) OR date(start_date) > date(?)
+    )
+"""
+
+
+def _fill_rentals(vehicles: int, rentals: int, start: date) -> None:
+    """Back-to-back 3-day active bookings for every vehicle (future reservations)."""
+    per_vehicle = rentals // vehicles
+    base = start.toordinal()
+    with repo.transaction() as conn:
+        conn.execute("INSERT INTO customers(name, email, phone) VALUES ('Bench', 'bench@example.com', '0')")
+        conn.executemany(
+            "INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type, available) VALUES ('Toyota', 'Corolla', 2021, 45.0, 'Economy', 0)",
+            [()] * vehicles)
+
+        def rows():
+            for vid in range(1, vehicles + 1):
+                for i in range(per_vehicle):
+                    s, e = base + 4 * i, base + 4 * i + 2
+                    yield (vid, date.fromordinal(s).isoformat(), date.fromordinal(e).isoformat(), s, e)
+
+        conn.executemany("""INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, start_day, end_day, total_cost, status)
+                            VALUES (1, ?, ?, ?, ?, ?, 135.0, 'active')""", rows())
+
+
+def bench_overlap(args) -> None:
+    start = date(2020, 1, 6)
+    span = 4 * (args.rentals // args.vehicles)
+    rng = random.Random(42)
+    probes = []
+    for _ in range(args.queries):
+        s = start + timedelta(days=rng.randrange(span))
+        probes.append((rng.randint(1, args.vehicles), s, s + timedelta(days=rng.randint(0, 6))))
+    with temp_db():
+        repo.init_db()
+        t0 = time.perf_counter()
+        _fill_rentals(args.vehicles, args.rentals, start)
+        print(f"built {args.rentals} rentals in {time.perf_counter() - t0:.1f}s")
+
+        with repo.get_conn() as conn:
+            t0 = time.perf_counter()
+            for vid, s, e in probes:
+                conn.execute(LEGACY_OVERLAP_SQL, (vid, s.isoformat(), e.isoformat())).fetchone()
+            report("date() text predicate", args.queries, time.perf_counter() - t0, "checks")
+
+        t0 = time.perf_counter()
+        for vid, s, e in probes:
+            repo.has_overlapping_rental(vid, s, e)
+        report("ordinal range predicate", args.queries, time.perf_counter() - t0, "checks")
+
+
+# ------------ Weekend pricing -------------
+def _loop_weekend_cost(days: int, rate: float, start: date, end: date) -> float:
+    """The original O(days) WeekendDiscountPricing.compute_cost."""
+    d, total = start, 0.0
+    while d <= end:
+        total += rate * 0.9 if d.weekday() >= 5 else rate
+        d += timedelta(days=1)
+    return round(total, 2)
+
+
+def bench_weekend(args) -> None:
+    start = date(2025, 1, 6)
+    closed_form = WeekendDiscountPricing().compute_cost
+    for days in (1, 7, 30, 365, 5 * 365):
+        end = start + timedelta(days=days - 1)
+        for label, fn in (("loop", _loop_weekend_cost), ("closed form", closed_form)):
+            t0 = time.perf_counter()
+            for _ in range(args.quotes):
+                fn(days, 45.0, start, end)
+            report(f"{days:>5}-day quote, {label}", args.quotes, time.perf_counter() - t0, "quotes")
+
+
+# ------------ Batch quotes -------------
+def bench_quotes(args) -> None:
+    rng = random.Random(1)
+    base = date(2025, 1, 1).toordinal()
+    rates = [round(rng.uniform(30, 250), 2) for _ in range(args.quotes)]
+    types = [rng.choice(["Economy", "SUV", "Truck"]) for _ in range(args.quotes)]
+    starts = [base + rng.randrange(365) for _ in range(args.quotes)]
+    ends = [s + rng.randrange(30) for s in starts]
+
+    t0 = time.perf_counter()
+    scalar = []
+    for rate, vtype, s, e in zip(rates, types, starts, ends):
+        start, end = date.fromordinal(s), date.fromordinal(e)
+        scalar.append(PricingContext(vtype).choose(start, end).compute_cost(e - s + 1, rate, start, end))
+    report("scalar PricingContext", args.quotes, time.perf_counter() - t0, "quotes")
+
+    t0 = time.perf_counter()
+    batch = quote_batch(rates, types, starts, ends)
+    backend = "numpy" if pricing.np is not None else "pure Python"
+    report(f"quote_batch ({backend})", args.quotes, time.perf_counter() - t0, "quotes")
+    print(f"{'':<32} results identical: {scalar == batch}")
+
+
+# ------------ Vehicle search -------------
+FLEET = [("Toyota", ["Corolla", "RAV4", "Yaris", "Hilux", "Camry"]),
+         ("Nissan", ["X-Trail", "Leaf", "Navara", "Qashqai"]),
+         ("Ford", ["Ranger", "Focus", "Everest", "Mustang"]),
+         ("Mazda", ["CX-5", "Mazda3", "BT-50"]),
+         ("Honda", ["Civic", "Jazz", "CR-V"])]
+
+
+def bench_search(args) -> None:
+    rng = random.Random(3)
+    # selective lookups (a model plus its serial), so the cost measured is matching, not fetching
+    keywords = [f"{rng.choice(rng.choice(FLEET)[1]).lower()} {rng.randrange(args.vehicles)}"
+                for _ in range(args.queries)]
+    with temp_db():
+        repo.init_db()
+        t0 = time.perf_counter()
+
+        def rows():
+            for i in range(args.vehicles):
+                brand, models = rng.choice(FLEET)
+                yield (brand, f"{rng.choice(models)} {i}", 2015 + i % 10, 40.0 + i % 60,
+                       rng.choice(["Economy", "SUV", "Truck"]))
+
+        with repo.transaction() as conn:
+            conn.executemany("""INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type, available)
+                                VALUES (?,?,?,?,?,1)""", rows())
+        print(f"built {args.vehicles} vehicles (with FTS triggers) in {time.perf_counter() - t0:.1f}s")
+        if not repo.has_vehicle_fts():
+            print("SQLite has no FTS5; search_vehicles falls back to the LIKE scan.")
+        for label, fn in (("LIKE scan", repo._search_vehicles_like), ("search_vehicles", repo.search_vehicles)):
+            t0 = time.perf_counter()
+            for kw in keywords:
+                fn(kw)
+            report(label, args.queries, time.perf_counter() - t0, "searches")
+
+
+# ------------ Bulk import -------------
+def bench_import(args) -> None:
+    rng = random.Random(5)
+    with temp_db():
+        repo.init_db()
+        path = os.path.join(os.path.dirname(repo.DB_NAME), "fleet.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(bulk.VEHICLE_FIELDS)
+            for i in range(args.vehicles):
+                brand, models = rng.choice(FLEET)
+                writer.writerow([brand, rng.choice(models), 2015 + i % 10, 40 + i % 60, rng.choice(["Economy", "SUV", "Truck"])])
+
+        t0 = time.perf_counter()
+        for i in range(min(args.vehicles, args.single_rows)):
+            repo.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy")
+        report("add_vehicle one by one", min(args.vehicles, args.single_rows), time.perf_counter() - t0, "rows")
+
+        t0 = time.perf_counter()
+        result = bulk.import_vehicles(path, chunk_size=args.chunk_size)
+        report("bulk.import_vehicles (CSV)", result.imported, time.perf_counter() - t0, "rows")
+
+
+# ------------ Row memory -------------
+def _bytes_per_row(fetch, rows: int) -> float:
+    tracemalloc.start()
+    result = fetch()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(result) == rows
+    del result
+    return current / rows
+
+
+def bench_memory(args) -> None:
+    with temp_db():
+        repo.init_db()
+        _fill_rentals(max(1, args.rentals // 1000), args.rentals, date(2020, 1, 6))
+        sql = """SELECT id, customer_id, vehicle_id, start_date, end_date, total_cost, status
+                 FROM rentals ORDER BY id"""
+        with repo.get_conn() as conn:
+            per_tuple = _bytes_per_row(lambda: conn.execute(sql).fetchall(), args.rentals)
+        per_entity = _bytes_per_row(repo.list_rentals, args.rentals)
+    print(f"{args.rentals} rentals held in memory:")
+    print(f"  raw tuples             {per_tuple:8.1f} bytes/row")
+    print(f"  slotted Rental objects {per_entity:8.1f} bytes/row")
+
+
+# ------------ Async load test -------------
+async def _async_clients(svc: AsyncCarRentalService, customer_id: int, vehicle_ids, clients: int,
+                         requests: int, timeout: float):
+    outcomes = {"booked": 0, "rejected": 0, "timed out": 0}
+    latencies = []
+    rng = random.Random(11)
+    base = date(2025, 1, 6)
+
+    async def client(n):
+        for _ in range(requests):
+            start = base + timedelta(days=rng.randrange(60))
+            t0 = time.perf_counter()
+            try:
+                rental_id = await svc.create_rental(customer_id, rng.choice(vehicle_ids), start,
+                                                    start + timedelta(days=rng.randrange(1, 5)), timeout=timeout)
+                outcomes["booked"] += 1
+                if rng.random() < 0.5:
+                    await svc.return_vehicle(rental_id, timeout=timeout)
+            except ValidationError:
+                outcomes["rejected"] += 1
+            except asyncio.TimeoutError:
+                outcomes["timed out"] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    return time.perf_counter() - t0, outcomes, latencies
+
+
+def bench_async_load(args) -> None:
+    with temp_db(pool_size=args.workers):
+        service = CarRentalService()
+        customer_id = service.add_customer("Bench User", "bench@example.com", "000")
+        vehicle_ids = [service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy") for _ in range(args.vehicles)]
+
+        async def run():
+            async with AsyncCarRentalService(service, max_workers=args.workers) as svc:
+                return await _async_clients(svc, customer_id, vehicle_ids, args.clients, args.requests, args.timeout)
+
+        elapsed, outcomes, latencies = asyncio.run(run())
+        active = service.list_rentals(status="active")
+    report(f"{args.clients} async clients", len(latencies), elapsed, "bookings")
+    print(f"{'':<32} " + ", ".join(f"{k}: {v}" for k, v in outcomes.items()))
+    print(f"{'':<32} latency p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    per_vehicle = {}
+    for r in active:
+        per_vehicle.setdefault(r.vehicle_id, []).append((r.start_date, r.end_date))
+    overlaps = sum(1 for spans in per_vehicle.values()
+                   for a, b in zip(sorted(spans), sorted(spans)[1:]) if b[0] <= a[1])
+    print(f"{'':<32} overlapping active rentals: {overlaps}")
+
+
+# ------------ Reports -------------
+def _scan_revenue_by_type() -> dict:
+    types = {v.id: v.vehicle_type for v in repo.iter_vehicles()}
+    revenue = {}
+    for r in repo.iter_rentals():
+        revenue[types[r.vehicle_id]] = revenue.get(types[r.vehicle_id], 0.0) + r.total_cost
+    return revenue
+
+
+def bench_reports(args) -> None:
+    start = date(2020, 1, 6)
+    with temp_db():
+        repo.init_db()
+        t0 = time.perf_counter()
+        _fill_rentals(args.vehicles, args.rentals, start)
+        print(f"built {args.rentals} rentals (rollup triggers on) in {time.perf_counter() - t0:.1f}s")
+        t0 = time.perf_counter()
+        for _ in range(args.scans):
+            _scan_revenue_by_type()
+        report("scan rentals in Python", args.scans, time.perf_counter() - t0, "reports")
+        t0 = time.perf_counter()
+        for _ in range(args.queries):
+            reports.revenue_by_vehicle_type()
+            reports.top_customers(10)
+            reports.daily_utilization(start, start + timedelta(days=30))
+        report("rollup tables", args.queries, time.perf_counter() - t0, "reports")
+
+
+# ------------ Event log -------------
+def _replay_fleet_state(at: float) -> dict:
+    active = {}
+    with repo.get_conn() as conn:
+        history._apply(active, conn.execute("""SELECT rental_id, vehicle_id, event FROM rental_events
+                                               WHERE recorded_at <= ? ORDER BY id""", (at,)))
+    return active
+
+
+def bench_history(args) -> None:
+    rng = random.Random(9)
+    with temp_db():
+        repo.init_db()
+        t0 = time.perf_counter()
+        with repo.transaction() as conn:
+            conn.execute("INSERT INTO customers(name, email, phone) VALUES ('Bench', 'bench@example.com', '0')")
+            conn.executemany("""INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type)
+                                VALUES ('Toyota', 'Corolla', 2021, 45.0, 'Economy')""", [()] * args.vehicles)
+        day = date(2020, 1, 6).toordinal()
+        for _ in range(args.rentals // args.batch):
+            # a batch of bookings; the previous batch is returned and half of this one, then a snapshot
+            with repo.transaction() as conn:
+                first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM rentals").fetchone()[0] + 1
+                conn.execute("UPDATE rentals SET status='finished' WHERE status='active'")
+                conn.executemany("""INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date,
+                                                        start_day, end_day, total_cost, status)
+                                    VALUES (1, ?, ?, ?, ?, ?, 135.0, 'active')""",
+                                 [(rng.randint(1, args.vehicles), date.fromordinal(day).isoformat(),
+                                   date.fromordinal(day + 2).isoformat(), day, day + 2) for _ in range(args.batch)])
+                conn.executemany("UPDATE rentals SET status='finished' WHERE id=?",
+                                 [(rid,) for rid in range(first, first + args.batch) if rng.random() < 0.5])
+            history.take_snapshot()
+            day += 3
+        with repo.get_conn() as conn:
+            times = [t for (t,) in conn.execute("SELECT recorded_at FROM rental_events")]
+        print(f"built {len(times)} events and {args.rentals // args.batch} snapshots "
+              f"in {time.perf_counter() - t0:.1f}s")
+        probes = [rng.choice(times) for _ in range(args.queries)]
+        for label, fn in (("full replay", _replay_fleet_state), ("snapshot + tail", history.fleet_state_at)):
+            t0 = time.perf_counter()
+            for at in probes:
+                fn(at)
+            report(label, len(probes), time.perf_counter() - t0, "queries")
+
+
+# ------------ Service suite -------------
+def _suite_ops(service: CarRentalService, ctx: dict):
+    """(name, 'point' or 'scan', call) for every CarRentalService operation.
+
+    'scan' operations touch every row, so they get fewer calls at large sizes.
+    Writes come before the operations that consume what they created.
+    """
+    def rand(kind):
+        lo, hi = ctx[kind]
+        return ctx["rng"].randint(lo, hi)
+
+    def span(days_max=14):
+        first, last = ctx["window"]
+        s = date.fromordinal(ctx["rng"].randint(first, last))
+        return s, s + timedelta(days=ctx["rng"].randrange(days_max))
+
+    def create_rental():
+        vid = ctx["free"].pop()
+        start = date(2040, 1, 1) + timedelta(days=4 * next(ctx["seq"]))
+        ctx["booked"].append(service.create_rental(rand("customers"), vid, start, start + timedelta(days=2)))
+
+    keywords = ["corolla", "x-trail", "ranger", "hilux", "mazda", "suv"]
+    return [
+        ("get_customer", "point", lambda: service.get_customer(rand("customers"))),
+        ("get_vehicle", "point", lambda: service.get_vehicle(rand("vehicles"))),
+        ("get_rental", "point", lambda: service.get_rental(rand("rentals"))),
+        ("cache_stats", "point", service.cache_stats),
+        ("add_customer", "point", lambda: service.add_customer(
+            "Suite User", f"suite{next(ctx['seq'])}@example.com", "000")),
+        ("list_customers", "scan", service.list_customers),
+        ("list_customers_page", "point", lambda: service.list_customers_page(rand("customers"), 50)),
+        ("iter_customers", "scan", lambda: sum(1 for _ in service.iter_customers())),
+        ("add_vehicle", "point", lambda: service.add_vehicle("Toyota", "Corolla", 2022, 50.0, "Economy")),
+        ("list_vehicles", "scan", service.list_vehicles),
+        ("list_vehicles_page", "point", lambda: service.list_vehicles_page(rand("vehicles"), 50)),
+        ("iter_vehicles", "scan", lambda: sum(1 for _ in service.iter_vehicles())),
+        ("search_vehicles", "point", lambda: service.search_vehicles(ctx["rng"].choice(keywords))),
+        ("quote_rental", "point", lambda: service.quote_rental(rand("vehicles"), *span())),
+        ("create_rental", "write", create_rental),
+        ("return_vehicle", "write", lambda: service.return_vehicle(ctx["booked"].pop())),
+        ("cancel_rental", "write", lambda: service.cancel_rental(ctx["booked"].pop())),
+        ("list_rentals", "scan", service.list_rentals),
+        ("list_rentals_page", "point", lambda: service.list_rentals_page(rand("rentals"), 50)),
+        ("iter_rentals", "scan", lambda: sum(1 for _ in service.iter_rentals(status="active"))),
+        ("is_vehicle_free", "point", lambda: service.is_vehicle_free(rand("vehicles"), *span())),
+        ("find_available_vehicles", "scan", lambda: service.find_available_vehicles(*span())),
+        ("rental_history", "point", lambda: service.rental_history(rand("rentals"))),
+        ("take_availability_snapshot", "point", service.take_availability_snapshot),
+        ("fleet_state_at", "point", lambda: service.fleet_state_at(
+            datetime.fromtimestamp(ctx["rng"].uniform(*ctx["generated_at"])))),
+        ("revenue_by_vehicle_type", "point", service.revenue_by_vehicle_type),
+        ("daily_utilization", "point", lambda: service.daily_utilization(*span(days_max=31))),
+        ("top_customers", "point", lambda: service.top_customers(10)),
+    ]
+
+
+def _suite_size(rentals: int, args) -> list:
+    customers, vehicles = max(rentals // 5, 100), max(rentals // 50, 500)
+    results = []
+    with temp_db():
+        t0 = time.perf_counter()
+        started = time.time()
+        datagen.generate(customers, vehicles, rentals, seed=args.seed)
+        print(f"size {rentals}: generated {customers} customers, {vehicles} vehicles, {rentals} rentals "
+              f"in {time.perf_counter() - t0:.1f}s")
+        service = CarRentalService()
+        with repo.get_conn() as conn:
+            free = [vid for (vid,) in conn.execute("SELECT id FROM vehicles WHERE available = 1 ORDER BY id")]
+        window = date(2023, 1, 1).toordinal()
+        ctx = {"rng": random.Random(args.seed), "seq": itertools.count(), "free": free, "booked": [],
+               "customers": (1, customers), "vehicles": (1, vehicles), "rentals": (1, rentals),
+               "window": (window, window + 700), "generated_at": (started, time.time())}
+        writes = min(args.calls, len(free))
+        calls = {"point": args.calls, "scan": args.scan_calls,
+                 "write": writes}
+        for name, kind, call in _suite_ops(service, ctx):
+            n = calls[kind]
+            if name == "return_vehicle":
+                n = writes // 2
+            elif name == "cancel_rental":
+                n = len(ctx["booked"])
+            samples = []
+            for _ in range(n):
+                t = time.perf_counter()
+                call()
+                samples.append(time.perf_counter() - t)
+            if not samples:
+                continue
+            row = {"size": rentals, "op": name, "calls": n,
+                   "mean_us": round(sum(samples) / n * 1e6, 1),
+                   "p50_us": round(percentile(samples, 50) * 1e6, 1),
+                   "p95_us": round(percentile(samples, 95) * 1e6, 1),
+                   "p99_us": round(percentile(samples, 99) * 1e6, 1)}
+            results.append(row)
+            print(f"  {name:<28} {n:>5} calls  p50 {row['p50_us']:>12.1f} us  p95 {row['p95_us']:>12.1f} us")
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(results: list, baseline_path: str, threshold: float) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["op"]): r for r in json.load(f)["results"]}
+    print(f"\np50 vs {baseline_path} (regression = slower than {threshold:.2f}x):")
+    for r in results:
+        old = baseline.get((r["size"], r["op"]))
+        if old and old["p50_us"]:
+            ratio = r["p50_us"] / old["p50_us"]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"  {r['size']:>9} {r['op']:<28} {old['p50_us']:>12.1f} -> {r['p50_us']:>12.1f} us  "
+                  f"{ratio:5.2f}x{flag}")
+
+
+def bench_suite(args) -> None:
+    results = []
+    for size in args.sizes:
+        results.extend(_suite_size(size, args))
+    doc = {"meta": {"created_at": datetime.now().isoformat(timespec="seconds"), "revision": _git_revision(),
+                    "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                    "platform": platform.platform(), "numpy": pricing.np is not None,
+                    "schema_version": migrations.SCHEMA_VERSION, "db_profile": repo.DB_PROFILE,
+                    "seed": args.seed, "sizes": args.sizes},
+           "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1)
+    print(f"wrote {len(results)} results to {args.out}")
+    if args.compare:
+        _compare(results, args.compare, args.threshold)
+
+
+# ------------ Instrumentation overhead -------------
+def _point_mix(service: CarRentalService, ctx: dict, calls: int) -> float:
+    """Seconds for `calls` rounds of every read-only point operation of the suite."""
+    ops = [call for name, kind, call in _suite_ops(service, ctx)
+           if kind == "point" and not name.startswith(("add_", "take_"))]
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        for call in ops:
+            call()
+    return time.perf_counter() - t0
+
+
+def bench_metrics(args) -> None:
+    customers, vehicles = args.rentals // 5, args.rentals // 50
+    with temp_db():
+        started = time.time()
+        datagen.generate(customers, vehicles, args.rentals, seed=0)
+        service = CarRentalService(cache_size=1)  # measure the queries, not cache hits
+        window = date(2023, 1, 1).toordinal()
+        ctx = {"seq": itertools.count(), "free": [], "booked": [], "customers": (1, customers),
+               "vehicles": (1, vehicles), "rentals": (1, args.rentals), "window": (window, window + 700),
+               "generated_at": (started, time.time())}
+        ctx["rng"] = random.Random(0)
+        _point_mix(service, ctx, args.calls)  # warm the page cache
+        best = {"disabled": float("inf"), "enabled": float("inf")}
+        for _ in range(args.repeat):  # alternate so drift hits both sides
+            for label in best:
+                if label == "enabled":
+                    metrics.reset()
+                    metrics.enable()
+                ctx["rng"] = random.Random(0)  # same calls every run
+                best[label] = min(best[label], _point_mix(service, ctx, args.calls))
+                metrics.disable()
+        for label, seconds in best.items():
+            report(f"point mix, metrics {label}", args.calls, seconds, "rounds")
+        print(f"overhead when enabled: {best['enabled'] / best['disabled'] - 1:+.1%}")
+        if args.out:
+            metrics.write_prometheus(args.out)
+            print(f"wrote {len(metrics.REGISTRY.sql_statements())} SQL fingerprints to {args.out}")
+
+
+# ------------ PRAGMA profiles -------------
+def _mixed_load(service: CarRentalService, vehicle_ids, customer_id: int, readers: int, writers: int,
+                seconds: float) -> dict:
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    start = date(2025, 1, 6)
+
+    def reader(seed: int):
+        rng, done, locked = random.Random(seed), 0, 0
+        while time.perf_counter() < deadline:
+            try:
+                repo.list_vehicles_page(rng.randrange(len(vehicle_ids)), 50)
+                repo.has_overlapping_rental(rng.choice(vehicle_ids), start, start + timedelta(days=3))
+                done += 1
+            except sqlite3.OperationalError:
+                locked += 1
+        with lock:
+            counts["reads"] += done
+            counts["locked"] += locked
+
+    def writer(own):
+        done, locked, i = 0, 0, 0
+        while time.perf_counter() < deadline:
+            try:
+                rid = service.create_rental(customer_id, own[i % len(own)], start, start + timedelta(days=2))
+                service.return_vehicle(rid)
+                done += 1
+            except sqlite3.OperationalError:
+                locked += 1
+            i += 1
+        with lock:
+            counts["writes"] += done
+            counts["locked"] += locked
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    # each writer books its own vehicles, so writers only contend for the lock, never for a car
+    threads += [threading.Thread(target=writer, args=(vehicle_ids[n::writers],)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def bench_profiles(args) -> None:
+    for profile in repo.DB_PROFILES:
+        with temp_db(pool_size=args.readers + args.writers, db_profile=profile):
+            service = CarRentalService()
+            customer_id = service.add_customer("Bench User", "bench@example.com", "000")
+            vehicle_ids = list(range(1, args.vehicles + 1))
+            repo.add_vehicles_bulk([("Toyota", "Corolla", 2021, 45.0, "Economy")] * args.vehicles)
+            counts = _mixed_load(service, vehicle_ids, customer_id, args.readers, args.writers, args.seconds)
+        print(f"profile {profile}:")
+        report(f"  {args.readers} readers", counts["reads"], args.seconds, "reads")
+        report(f"  {args.writers} writers", counts["writes"], args.seconds, "bookings")
+        print(f"{'':<32} 'database is locked' errors: {counts['locked']}")
+
+
+# ------------ HTTP API load test -------------
+HTTP_PATHS = [
+    "/vehicles/{vid}",
+    "/vehicles?limit=50",
+    "/vehicles/search?q=Corolla",
+    "/quote?vehicle_id={vid}&start=2025-03-07&end=2025-03-16",
+]
+
+
+def _http_client(port: int, vehicles: int, requests: int, revalidate: bool, seed: int,
+                 latencies: list, statuses: dict, lock: threading.Lock) -> None:
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port)  # one keep-alive connection per client
+    etags = {}
+    samples, counts = [], {}
+    for _ in range(requests):
+        path = rng.choice(HTTP_PATHS).format(vid=rng.randint(1, vehicles))
+        headers = {"Accept-Encoding": "gzip"}
+        if revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        t0 = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        samples.append(time.perf_counter() - t0)
+        counts[resp.status] = counts.get(resp.status, 0) + 1
+        if resp.getheader("ETag"):
+            etags[path] = resp.getheader("ETag")
+    conn.close()
+    with lock:
+        latencies.extend(samples)
+        for code, n in counts.items():
+            statuses[code] = statuses.get(code, 0) + n
+
+
+def bench_http(args) -> None:
+    with temp_db():
+        service = CarRentalService()
+        rng = random.Random(11)
+        fleet = []
+        for i in range(args.vehicles):
+            brand, models = rng.choice(FLEET)
+            fleet.append((brand, rng.choice(models), 2015 + i % 10, 40.0 + i % 60,
+                          rng.choice(["Economy", "SUV", "Truck"])))
+        repo.add_vehicles_bulk(fleet)
+        server = api.make_server(port=0, service=service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        try:
+            for revalidate in (False, True):
+                latencies, statuses, lock = [], {}, threading.Lock()
+                threads = [threading.Thread(target=_http_client, args=(
+                    port, args.vehicles, args.requests, revalidate, n, latencies, statuses, lock))
+                    for n in range(args.clients)]
+                t0 = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                elapsed = time.perf_counter() - t0
+                label = "GET with If-None-Match" if revalidate else "GET (no conditional)"
+                report(f"{label}", len(latencies), elapsed, "req")
+                print(f"{'':<32} latency p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+                      f"p99 {percentile(latencies, 99) * 1000:.2f} ms; status {dict(sorted(statuses.items()))}")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Car rental benchmarks")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("pool", help="create+return rentals: open-per-call vs pooled connections")
+    sp.add_argument("--rentals", type=int, default=2000)
+    sp.add_argument("--vehicles", type=int, default=50)
+    sp.add_argument("--pool-size", type=int, default=5)
+    sp.set_defaults(func=bench_pool)
+
+    sp = sub.add_parser("booking", help="concurrent clients racing for the same vehicles")
+    sp.add_argument("--threads", type=int, default=8)
+    sp.add_argument("--attempts", type=int, default=250, help="booking attempts per thread")
+    sp.add_argument("--vehicles", type=int, default=200)
+    sp.set_defaults(func=bench_booking)
+
+    sp = sub.add_parser("overlap", help="overlap checks against a synthetic rentals table")
+    sp.add_argument("--rentals", type=int, default=1_000_000)
+    sp.add_argument("--vehicles", type=int, default=1000)
+    sp.add_argument("--queries", type=int, default=2000)
+    sp.set_defaults(func=bench_overlap)
+
+    sp = sub.add_parser("weekend", help="weekend-discount quotes: day loop vs closed form")
+    sp.add_argument("--quotes", type=int, default=2000)
+    sp.set_defaults(func=bench_weekend)
+
+    sp = sub.add_parser("quotes", help="bulk pricing: scalar strategies vs quote_batch")
+    sp.add_argument("--quotes", type=int, default=200_000)
+    sp.set_defaults(func=bench_quotes)
+
+    sp = sub.add_parser("search", help="vehicle keyword search: LIKE scan vs FTS5")
+    sp.add_argument("--vehicles", type=int, default=500_000)
+    sp.add_argument("--queries", type=int, default=50)
+    sp.set_defaults(func=bench_search)
+
+    sp = sub.add_parser("import", help="bulk CSV import vs one add_vehicle call per row")
+    sp.add_argument("--vehicles", type=int, default=1_000_000)
+    sp.add_argument("--single-rows", type=int, default=5000, help="rows to time through add_vehicle")
+    sp.add_argument("--chunk-size", type=int, default=10_000)
+    sp.set_defaults(func=bench_import)
+
+    sp = sub.add_parser("memory", help="bytes per row: tuples vs Rental entities")
+    sp.add_argument("--rentals", type=int, default=1_000_000)
+    sp.set_defaults(func=bench_memory)
+
+    sp = sub.add_parser("async-load", help="hundreds of concurrent async booking clients")
+    sp.add_argument("--clients", type=int, default=300)
+    sp.add_argument("--requests", type=int, default=10, help="bookings per client")
+    sp.add_argument("--vehicles", type=int, default=100)
+    sp.add_argument("--workers", type=int, default=8)
+    sp.add_argument("--timeout", type=float, default=5.0)
+    sp.set_defaults(func=bench_async_load)
+
+    sp = sub.add_parser("reports", help="revenue/utilization: scanning rentals vs the rollup tables")
+    sp.add_argument("--rentals", type=int, default=200_000)
+    sp.add_argument("--vehicles", type=int, default=1000)
+    sp.add_argument("--scans", type=int, default=3)
+    sp.add_argument("--queries", type=int, default=2000)
+    sp.set_defaults(func=bench_reports)
+
+    sp = sub.add_parser("history", help="fleet state at time T: full event replay vs snapshot + tail")
+    sp.add_argument("--rentals", type=int, default=200_000)
+    sp.add_argument("--vehicles", type=int, default=1000)
+    sp.add_argument("--batch", type=int, default=5000, help="rentals between snapshots")
+    sp.add_argument("--queries", type=int, default=50)
+    sp.set_defaults(func=bench_history)
+
+    sp = sub.add_parser("suite", help="time every CarRentalService operation at several data sizes (JSON out)")
+    sp.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[10_000, 100_000],
+                    help="comma-separated rental counts, e.g. 10000,100000,1000000")
+    sp.add_argument("--calls", type=int, default=200, help="calls per point/write operation")
+    sp.add_argument("--scan-calls", type=int, default=3, help="calls per full-table operation")
+    sp.add_argument("--seed", type=int, default=0)
+    sp.add_argument("--out", default="bench_results.json")
+    sp.add_argument("--compare", help="earlier results file to diff p50 latencies against")
+    sp.add_argument("--threshold", type=float, default=1.25)
+    sp.set_defaults(func=bench_suite)
+
+    sp = sub.add_parser("profiles", help="concurrent readers and writers under each PRAGMA profile")
+    sp.add_argument("--readers", type=int, default=4)
+    sp.add_argument("--writers", type=int, default=2)
+    sp.add_argument("--vehicles", type=int, default=1000)
+    sp.add_argument("--seconds", type=float, default=5.0)
+    sp.set_defaults(func=bench_profiles)
+
+    sp = sub.add_parser("http", help="keep-alive HTTP clients against the JSON API")
+    sp.add_argument("--clients", type=int, default=16)
+    sp.add_argument("--requests", type=int, default=500, help="requests per client")
+    sp.add_argument("--vehicles", type=int, default=2000)
+    sp.set_defaults(func=bench_http)
+
+    sp = sub.add_parser("metrics", help="cost of the opt-in latency instrumentation on a read mix")
+    sp.add_argument("--rentals", type=int, default=50_000)
+    sp.add_argument("--calls", type=int, default=1000, help="rounds of the read-only point operations")
+    sp.add_argument("--repeat", type=int, default=3, help="runs per state; the fastest is reported")
+    sp.add_argument("--out", help="also write the collected metrics here (Prometheus text)")
+    sp.set_defaults(func=bench_metrics)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+
+"""Bulk import/export of customers and vehicles (CSV or JSONL).
+
+    python bulk.py import vehicles fleet.csv
+    python bulk.py import customers customers.jsonl --chunk-size 20000
+    python bulk.py export vehicles - --format jsonl > fleet.jsonl
+
+Files are streamed: rows are validated like CarRentalService does, then
+inserted with executemany, one transaction per chunk. Rejected rows are
+reported by line number instead of aborting the import.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import repository as repo
+from services import ValidationError, validate_customer, validate_vehicle
+
+CUSTOMER_FIELDS = ["name", "email", "phone"]
+VEHICLE_FIELDS = ["brand", "model", "year", "daily_rate", "vehicle_type"]
+EXPORT_FIELDS = {
+    "customers": ["id"] + CUSTOMER_FIELDS,
+    "vehicles": ["id"] + VEHICLE_FIELDS + ["available"],
+}
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected: List[Tuple[int, str]] = field(default_factory=list)  # (line number, reason)
+
+
+def detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+@contextmanager
+def _open(path: str, mode: str):
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+    else:
+        with open(path, mode, newline="", encoding="utf-8") as f:
+            yield f
+
+
+def read_records(path: str, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, record) pairs; a record is a dict, or an error string if unparsable."""
+    with _open(path, "r") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, f"Invalid JSON: {e.msg}"
+
+
+def _customer_row(record: Dict[str, Any]) -> Tuple[str, str, str]:
+    return validate_customer(*(str(record.get(k) or "") for k in CUSTOMER_FIELDS))
+
+
+def _vehicle_row(record: Dict[str, Any]) -> Tuple[str, str, int, float, str]:
+    try:
+        year = int(record.get("year"))
+        daily_rate = float(record.get("daily_rate"))
+    except (TypeError, ValueError):
+        raise ValidationError("Year and daily_rate must be numbers.") from None
+    return validate_vehicle(str(record.get("brand") or ""), str(record.get("model") or ""),
+                            year, daily_rate, str(record.get("vehicle_type") or ""))
+
+
+def _import(path: str, fmt: Optional[str], chunk_size: int,
+            to_row: Callable[[Dict[str, Any]], Tuple[Any, ...]],
+            insert: Callable[[List[Tuple[Any, ...]]], List[Tuple[int, str]]]) -> ImportReport:
+    report = ImportReport()
+    rows: List[Tuple[Any, ...]] = []
+    lines: List[int] = []
+
+    def flush():
+        failures = insert(rows)
+        report.imported += len(rows) - len(failures)
+        report.rejected.extend((lines[i], reason) for i, reason in failures)
+        rows.clear()
+        lines.clear()
+
+    for line_no, record in read_records(path, detect_format(path, fmt)):
+        if not isinstance(record, dict):
+            report.rejected.append((line_no, record if isinstance(record, str) else "Expected an object."))
+            continue
+        try:
+            rows.append(to_row(record))
+            lines.append(line_no)
+        except ValidationError as e:
+            report.rejected.append((line_no, str(e)))
+            continue
+        if len(rows) >= chunk_size:
+            flush()
+    if rows:
+        flush()
+    return report
+
+
+def import_customers(path: str, fmt: Optional[str] = None, chunk_size: int = 10_000) -> ImportReport:
+    return _import(path, fmt, chunk_size, _customer_row, repo.add_customers_bulk)
+
+
+def import_vehicles(path: str, fmt: Optional[str] = None, chunk_size: int = 10_000) -> ImportReport:
+    return _import(path, fmt, chunk_size, _vehicle_row, repo.add_vehicles_bulk)
+
+
+def export_table(entity: str, path: str, fmt: Optional[str] = None) -> int:
+    """Stream every customer or vehicle to a CSV/JSONL file; returns the row count."""
+    rows = repo.iter_customers() if entity == "customers" else repo.iter_vehicles()
+    fields = EXPORT_FIELDS[entity]
+    count = 0
+    with _open(path, "w") as f:
+        if detect_format(path, fmt) == "csv":
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow([getattr(row, name) for name in fields])
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps({name: getattr(row, name) for name in fields}) + "\n")
+                count += 1
+    return count
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Bulk import/export for the car rental database")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    for cmd in ("import", "export"):
+        sp = sub.add_parser(cmd)
+        sp.add_argument("entity", choices=["customers", "vehicles"])
+        sp.add_argument("path", help="file path, or - for stdin/stdout")
+        sp.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                        help="defaults to the file extension (.jsonl/.ndjson) or csv")
+        if cmd == "import":
+            sp.add_argument("--chunk-size", type=int, default=10_000)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repo.init_db()
+    if args.cmd == "export":
+        count = export_table(args.entity, args.path, args.format)
+        print(f"Exported {count} {args.entity}.", file=sys.stderr)
+        return
+    importer = import_customers if args.entity == "customers" else import_vehicles
+    report = importer(args.path, args.format, args.chunk_size)
+    for line_no, reason in report.rejected:
+        print(f"line {line_no}: {reason}", file=sys.stderr)
+    print(f"Imported {report.imported} {args.entity}, rejected {len(report.rejected)}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being stored."""
+    def __init__(self, maxsize: int = 10_000, ttl: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._invalidations = 0  # bumped on every invalidate/clear
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Return the cached value, or call `load()` and cache its result (None is not cached)."""
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+            seen = self._invalidations
+        value = load()
+        if value is not None:
+            with self._lock:
+                if self._invalidations != seen:
+                    return value  # a write raced with the load; don't cache what may be stale
+                self._data[key] = (now + self.ttl, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            self._invalidations += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "expired": self.expired,
+                    "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,6 +1,7 @@
 
 from __future__ import annotations
-from typing import Optional
+from typing import Any, Callable, List, Optional
+from models import Customer, Rental, Vehicle
 from services import CarRentalService, ValidationError
 from utils import input_int, input_float, input_date
 
@@ -11,22 +12,55 @@ def print_header(title: str):
     print("=" * 60)
 
 
+PAGE_SIZE = 20
+
+
+def browse(fetch_page: Callable[[int, int], List[Any]],
+           show_row: Callable[[Any], None], empty_message: str) -> None:
+    """Print rows one page at a time with next/previous navigation (keyset paging on id)."""
+    page_starts = [0]  # after_id of every page visited so far
+    while True:
+        rows = fetch_page(page_starts[-1], PAGE_SIZE + 1)  # the extra row tells us if there is a next page
+        if not rows and len(page_starts) == 1:
+            print(empty_message)
+            return
+        has_next = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+        for row in rows:
+            show_row(row)
+        options = (["[n]ext"] if has_next else []) + (["[p]revious"] if len(page_starts) > 1 else [])
+        if not options:
+            return
+        cmd = input(f"-- page {len(page_starts)}: {', '.join(options)}, Enter to stop: ").strip().lower()
+        if cmd == "n" and has_next:
+            page_starts.append(rows[-1].id)
+        elif cmd == "p" and len(page_starts) > 1:
+            page_starts.pop()
+        else:
+            return
+
+
+def print_vehicle(v: Vehicle):
+    print(f"[{v.id}] {v.brand} {v.model} ({v.year}) - ${v.daily_rate:.2f}/day - {v.vehicle_type} - "
+          f"{'Available' if v.available else 'Rented'}")
+
+
+def print_customer(c: Customer):
+    print(f"[{c.id}] {c.name} | {c.email} | {c.phone}")
+
+
+def print_rental(r: Rental):
+    print(f"[{r.id}] Customer {r.customer_id} | Vehicle {r.vehicle_id} | {r.start_date} -> {r.end_date} | "
+          f"${r.total_cost:.2f} | {r.status}")
+
+
 def list_vehicles(service: CarRentalService, only_available: bool = False):
-    items = service.list_vehicles(only_available=only_available)
-    if not items:
-        print("No vehicles found.")
-        return
-    for (vid, brand, model, year, rate, vtype, avail) in items:
-        print(f"[{vid}] {brand} {model} ({year}) - ${rate:.2f}/day - {vtype} - {'Available' if avail else 'Rented'}")
+    browse(lambda after_id, limit: service.list_vehicles_page(after_id, limit, only_available=only_available),
+           print_vehicle, "No vehicles found.")
 
 
 def list_customers(service: CarRentalService):
-    items = service.list_customers()
-    if not items:
-        print("No customers found.")
-        return
-    for (cid, name, email, phone) in items:
-        print(f"[{cid}] {name} | {email} | {phone}")
+    browse(service.list_customers_page, print_customer, "No customers found.")
 
 
 def add_vehicle(service: CarRentalService):
@@ -60,10 +94,19 @@ def create_rental(service: CarRentalService):
     print_header("Create Rental")
     list_customers(service)
     customer_id = input_int("Customer id: ")
-    list_vehicles(service, only_available=True)
-    vehicle_id = input_int("Vehicle id: ")
     start = input_date("Start date (YYYY-MM-DD): ")
     end = input_date("End date   (YYYY-MM-DD): ")
+    try:
+        free = service.find_available_vehicles(start, end)
+    except ValidationError as e:
+        print(f"Error: {e}")
+        return
+    if not free:
+        print("No vehicles free for that period.")
+        return
+    for row in free:
+        print_vehicle(row)
+    vehicle_id = input_int("Vehicle id: ")
     try:
         rid = service.create_rental(customer_id, vehicle_id, start, end)
         print(f"Rental created with id {rid}.")
@@ -73,12 +116,10 @@ def create_rental(service: CarRentalService):
 
 def return_vehicle(service: CarRentalService):
     print_header("Return Vehicle")
-    items = service.list_rentals(status="active")
-    if not items:
+    if not service.list_rentals_page(limit=1, status="active"):
         print("No active rentals.")
         return
-    for (rid, cid, vid, s, e, total, status) in items:
-        print(f"[{rid}] Customer {cid} | Vehicle {vid} | {s} -> {e} | Total ${total:.2f}")
+    list_rentals(service, status="active")
     rid = input_int("Rental id: ")
     try:
         service.return_vehicle(rid)
@@ -87,6 +128,20 @@ def return_vehicle(service: CarRentalService):
         print(f"Error: {e}")
 
 
+def cancel_rental(service: CarRentalService):
+    print_header("Cancel Rental")
+    if not service.list_rentals_page(limit=1, status="active"):
+        print("No active rentals.")
+        return
+    list_rentals(service, status="active")
+    rid = input_int("Rental id: ")
+    try:
+        service.cancel_rental(rid)
+        print("Rental cancelled.")
+    except ValidationError as e:
+        print(f"Error: {e}")
+
+
 def search_vehicles(service: CarRentalService):
     print_header("Search Vehicles")
     kw = input("Keyword (brand/model/type): ").strip()
@@ -94,17 +149,56 @@ def search_vehicles(service: CarRentalService):
     if not items:
         print("No matches.")
         return
-    for (vid, brand, model, year, rate, vtype, avail) in items:
-        print(f"[{vid}] {brand} {model} ({year}) - ${rate:.2f}/day - {vtype} - {'Available' if avail else 'Rented'}")
+    for row in items:
+        print_vehicle(row)
 
 
-def list_rentals(service: CarRentalService, status: Optional[str] = None):
-    items = service.list_rentals(status=status)
+def search_available_by_dates(service: CarRentalService):
+    print_header("Available Vehicles by Date Range")
+    start = input_date("Start date (YYYY-MM-DD): ")
+    end = input_date("End date   (YYYY-MM-DD): ")
+    try:
+        items = service.find_available_vehicles(start, end)
+    except ValidationError as e:
+        print(f"Error: {e}")
+        return
     if not items:
-        print("No rentals found.")
+        print("No vehicles free for that period.")
+        return
+    for row in items:
+        print_vehicle(row)
+
+
+def list_rentals(service: CarRentalService, status: Optional[str] = None):
+    browse(lambda after_id, limit: service.list_rentals_page(after_id, limit, status=status),
+           print_rental, "No rentals found.")
+
+
+def show_reports(service: CarRentalService):
+    print_header("Revenue by Vehicle Type")
+    by_type = service.revenue_by_vehicle_type()
+    if not by_type:
+        print("No vehicles yet.")
+    for t in by_type:
+        print(f"{t.vehicle_type:<12} vehicles {t.vehicles:>5} | rentals {t.rentals:>6} (active {t.active:>4}) "
+              f"| days {t.rented_days:>7} | revenue ${t.revenue:,.2f}")
+    print_header("Top Customers")
+    top = service.top_customers(5)
+    if not top:
+        print("No rentals yet.")
+    for c in top:
+        print(f"#{c.customer_id:<5} {c.name:<24} rentals {c.rentals:>5} | revenue ${c.revenue:,.2f}")
+    print_header("Daily Utilization")
+    start = input_date("Start date (YYYY-MM-DD): ")
+    end = input_date("End date   (YYYY-MM-DD): ")
+    try:
+        days = service.daily_utilization(start, end)
+    except ValidationError as e:
+        print(f"Error: {e}")
         return
-    for (rid, cid, vid, s, e, total, st) in items:
-        print(f"[{rid}] Customer {cid} | Vehicle {vid} | {s} -> {e} | ${total:.2f} | {st}")
+    for d in days:
+        print(f"{d.day}  {d.vehicles_out:>5}/{d.fleet:<5} out ({d.utilization:6.1%}) "
+              f"| started {d.rentals_started:>4} | revenue ${d.revenue:,.2f}")
 
 
 def seed_sample_data(service: CarRentalService):
@@ -148,6 +242,9 @@ def main_menu():
         print("10) List rentals (active)")
         print("11) List rentals (finished)")
         print("12) Seed sample data")
+        print("13) Search available vehicles by date range")
+        print("14) Reports (revenue, top customers, utilization)")
+        print("15) Cancel rental")
         print("0) Exit")
         choice = input("Choose an option: ").strip()
         if choice == "1":
@@ -174,6 +271,12 @@ def main_menu():
             list_rentals(service, status="finished")
         elif choice == "12":
             seed_sample_data(service)
+        elif choice == "13":
+            search_available_by_dates(service)
+        elif choice == "14":
+            show_reports(service)
+        elif choice == "15":
+            cancel_rental(service)
         elif choice == "0":
             print("Goodbye!")
             break
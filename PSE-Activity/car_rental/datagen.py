@@ -0,0 +1,173 @@
+
+"""Deterministic synthetic data for capacity planning and benchmarks.
+
+    python datagen.py --db /tmp/fleet.db --customers 1000000 --vehicles 100000 --rentals 3000000
+
+The same arguments and --seed always produce the same rows. Rentals follow
+the service's rules: no vehicle has overlapping bookings, and at most the
+latest booking of a vehicle is still active (its vehicle is then unavailable).
+Durations cluster around 1-4 days with weekly peaks, and a minority of
+customers account for most bookings. Rentals are loaded with
+repository.add_rentals_bulk, so report rollups, the event log and vehicle
+availability match what live bookings would have produced; event
+timestamps are the generation time, not the rental dates.
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Tuple
+
+import history
+import pricing
+import repository as repo
+
+FIRST_NAMES = ["Aroha", "Ben", "Chloe", "Daniel", "Emma", "Finn", "Grace", "Hemi", "Isla", "Jack",
+               "Kiri", "Liam", "Mia", "Noah", "Olivia", "Priya", "Quinn", "Ruby", "Sam", "Tane"]
+LAST_NAMES = ["Smith", "Williams", "Brown", "Wilson", "Taylor", "Ngata", "Patel", "Lee", "Walker", "Singh",
+              "Harris", "Martin", "Clarke", "Thompson", "Wang", "Young", "King", "Parata", "Chen", "White"]
+# (vehicle_type, share of the fleet, base daily rate, models)
+VEHICLE_MIX = [
+    ("Economy", 0.55, 45.0, [("Toyota", "Corolla"), ("Toyota", "Yaris"), ("Mazda", "Mazda3"),
+                             ("Honda", "Jazz"), ("Nissan", "Leaf"), ("Honda", "Civic")]),
+    ("SUV", 0.30, 80.0, [("Nissan", "X-Trail"), ("Toyota", "RAV4"), ("Mazda", "CX-5"), ("Honda", "CR-V")]),
+    ("Truck", 0.15, 95.0, [("Ford", "Ranger"), ("Toyota", "Hilux"), ("Nissan", "Navara"), ("Mazda", "BT-50")]),
+]
+# rental length in days -> relative frequency; weekend trips, then week/fortnight bumps
+DURATION_WEIGHTS = {1: 18, 2: 16, 3: 14, 4: 11, 5: 8, 6: 6, 7: 9, 8: 3, 9: 2, 10: 2, 11: 1, 12: 1, 13: 1, 14: 3}
+
+_DURATIONS = list(DURATION_WEIGHTS)
+_DURATION_CUM = list(itertools.accumulate(DURATION_WEIGHTS.values()))
+
+
+@dataclass
+class GeneratedCounts:
+    customers: int = 0
+    vehicles: int = 0
+    rentals: int = 0
+
+
+def _next_id(conn, table: str) -> int:
+    # AUTOINCREMENT hands out max(sqlite_sequence, MAX(id)) + 1 next
+    (seq,) = conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0)", (table,)).fetchone()
+    (top,) = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+    return max(seq, top) + 1
+
+
+def _customers(rng: random.Random, first_id: int, count: int) -> List[Tuple[str, str, str]]:
+    rows = []
+    for i in range(first_id, first_id + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        rows.append((f"{first} {last}", f"{first}.{last}.{i}@example.com".lower(),
+                     f"+64 2{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}"))
+    return rows
+
+
+def _vehicles(rng: random.Random, count: int) -> List[Tuple[str, str, int, float, str]]:
+    types = rng.choices(VEHICLE_MIX, weights=[share for _, share, _, _ in VEHICLE_MIX], k=count)
+    rows = []
+    for vehicle_type, _, base_rate, models in types:
+        brand, model = rng.choice(models)
+        year = rng.randint(2012, 2025)
+        rate = round(base_rate * rng.uniform(0.85, 1.25) + (year - 2012), 2)
+        rows.append((brand, model, year, rate, vehicle_type))
+    return rows
+
+
+def _timeline(rng: random.Random, first_day: int, days: int, count: int) -> List[Tuple[int, int]]:
+    """`count` non-overlapping (start_day, end_day) bookings spread over the window."""
+    if not count:
+        return []
+    slot = days / count
+    spans = []
+    for i in range(count):
+        lo, hi = int(i * slot), int((i + 1) * slot)
+        length = min(rng.choices(_DURATIONS, cum_weights=_DURATION_CUM)[0], hi - lo)
+        s = first_day + lo + rng.randint(0, hi - lo - length)
+        spans.append((s, s + length - 1))
+    return spans
+
+
+def generate(customers: int = 0, vehicles: int = 0, rentals: int = 0, seed: int = 0,
+             start: date = date(2023, 1, 1), days: int = 730, active_share: float = 0.3,
+             cancel_rate: float = 0.03, chunk_size: int = 5000) -> GeneratedCounts:
+    """Append synthetic customers, vehicles and rentals to the repository's database.
+
+    Rentals are booked on the vehicles created by this call, by customers created
+    by it (or, if `customers` is 0, by existing ones).
+    """
+    if vehicles and rentals and -(-rentals // vehicles) > days:
+        raise ValueError("More rentals per vehicle than days in the window; raise `days`.")
+    if rentals and not vehicles:
+        raise ValueError("Rentals need vehicles generated in the same call.")
+    repo.init_db()
+    rng = random.Random(seed)
+    counts = GeneratedCounts()
+
+    with repo.transaction() as conn:
+        first_customer = _next_id(conn, "customers")
+    for offset in range(0, customers, chunk_size):
+        n = min(chunk_size, customers - offset)
+        counts.customers += n - len(repo.add_customers_bulk(_customers(rng, first_customer + offset, n)))
+    if customers:
+        customer_ids = (first_customer, first_customer + counts.customers - 1)
+    else:
+        with repo.get_conn() as conn:
+            customer_ids = conn.execute("SELECT MIN(id), MAX(id) FROM customers").fetchone()
+        if rentals and customer_ids[0] is None:
+            raise ValueError("Rentals need customers; generate some or seed the database first.")
+
+    def pick_customer() -> int:
+        # squaring skews towards low ids: ~30% of customers make ~55% of the bookings
+        lo, hi = customer_ids
+        return lo + int((hi - lo + 1) * rng.random() ** 2)
+
+    base, extra = divmod(rentals, vehicles) if vehicles else (0, 0)
+    first_day = start.toordinal()
+    for offset in range(0, vehicles, chunk_size):
+        n = min(chunk_size, vehicles - offset)
+        fleet = _vehicles(rng, n)
+        with repo.transaction() as conn:
+            first_vehicle = _next_id(conn, "vehicles")
+        repo.add_vehicles_bulk(fleet)
+        counts.vehicles += n
+
+        bookings, rates, types = [], [], []
+        for i, (_, _, _, rate, vehicle_type) in enumerate(fleet):
+            vehicle_id = first_vehicle + i
+            spans = _timeline(rng, first_day, days, base + (offset + i < extra))
+            for k, (s, e) in enumerate(spans):
+                if k == len(spans) - 1 and rng.random() < active_share:
+                    status = 'active'
+                else:
+                    status = 'cancelled' if rng.random() < cancel_rate else 'finished'
+                bookings.append((pick_customer(), vehicle_id, s, e, status))
+                rates.append(rate)
+                types.append(vehicle_type)
+        costs = pricing.quote_batch(rates, types, [b[2] for b in bookings], [b[3] for b in bookings])
+        repo.add_rentals_bulk([(c, v, s, e, cost, status) for (c, v, s, e, status), cost in zip(bookings, costs)])
+        history.take_snapshot()  # as a live service would, every few thousand events
+        counts.rentals += len(bookings)
+    return counts
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Generate synthetic car rental data (deterministic per --seed)")
+    p.add_argument("--db", required=True, help="database file to fill (created if missing)")
+    p.add_argument("--customers", type=int, default=10_000)
+    p.add_argument("--vehicles", type=int, default=1_000)
+    p.add_argument("--rentals", type=int, default=20_000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--start", type=date.fromisoformat, default=date(2023, 1, 1), help="first day of the window")
+    p.add_argument("--days", type=int, default=730, help="length of the booking window")
+    args = p.parse_args(argv)
+    repo.configure(db_name=args.db)
+    counts = generate(args.customers, args.vehicles, args.rentals, seed=args.seed, start=args.start, days=args.days)
+    print(f"Generated {counts.customers} customers, {counts.vehicles} vehicles and {counts.rentals} rentals "
+          f"in {args.db}.")
+
+
+if __name__ == "__main__":
+    main()
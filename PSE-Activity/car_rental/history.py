@@ -0,0 +1,103 @@
+
+"""Rental event log and availability snapshots.
+
+Every rental insert and status change appends a row to `rental_events`
+(migration v6 triggers). A snapshot stores the set of active rentals once
+the log is applied up to some event id; each new snapshot starts from the
+previous one and applies only the events since. The fleet state at any time
+T is then the latest snapshot before T plus the few events between it and T.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+import repository as repo
+
+
+@dataclass(slots=True)
+class RentalEvent:
+    id: int
+    rental_id: int
+    vehicle_id: int
+    event: str  # 'created', 'returned' or 'cancelled'
+    recorded_at: float  # Unix time
+
+
+@dataclass(slots=True)
+class FleetState:
+    at: float
+    active: Dict[int, int]  # rental_id -> vehicle_id
+
+    @property
+    def vehicles_out(self) -> Set[int]:
+        return set(self.active.values())
+
+    def is_out(self, vehicle_id: int) -> bool:
+        return vehicle_id in self.active.values()
+
+
+def _apply(active: Dict[int, int], events: Iterable[Tuple[int, int, str]]) -> None:
+    for rental_id, vehicle_id, event in events:
+        if event == 'created':
+            active[rental_id] = vehicle_id
+        else:
+            active.pop(rental_id, None)
+
+
+def _latest_snapshot(conn, up_to_event: int) -> Tuple[int, Dict[int, int]]:
+    """(last_event_id, active rentals) of the newest snapshot covering at most `up_to_event`."""
+    row = conn.execute("""SELECT id, last_event_id FROM availability_snapshots
+                          WHERE last_event_id <= ? ORDER BY last_event_id DESC LIMIT 1""",
+                       (up_to_event,)).fetchone()
+    if row is None:
+        return 0, {}
+    snapshot_id, last_event_id = row
+    active = dict(conn.execute("""SELECT rental_id, vehicle_id FROM availability_snapshot_rentals
+                                  WHERE snapshot_id = ?""", (snapshot_id,)).fetchall())
+    return last_event_id, active
+
+
+def rental_events(rental_id: int) -> List[RentalEvent]:
+    with repo.get_conn() as conn:
+        rows = conn.execute("""SELECT id, rental_id, vehicle_id, event, recorded_at FROM rental_events
+                               WHERE rental_id = ? ORDER BY id""", (rental_id,)).fetchall()
+    return [RentalEvent(*row) for row in rows]
+
+
+def events_since_snapshot() -> int:
+    with repo.get_conn() as conn:
+        (count,) = conn.execute("""SELECT COUNT(*) FROM rental_events
+                                   WHERE id > (SELECT COALESCE(MAX(last_event_id), 0) FROM availability_snapshots)
+                                """).fetchone()
+    return count
+
+
+def take_snapshot() -> int:
+    """Snapshot the fleet as of the newest event; returns that event id (0 for an empty log)."""
+    with repo.transaction() as conn:
+        (head,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM rental_events").fetchone()
+        last_event_id, active = _latest_snapshot(conn, head)
+        if last_event_id == head:
+            return head
+        _apply(active, conn.execute("""SELECT rental_id, vehicle_id, event FROM rental_events
+                                       WHERE id > ? ORDER BY id""", (last_event_id,)))
+        snapshot_id = conn.execute("INSERT INTO availability_snapshots(last_event_id, taken_at) VALUES (?, ?)",
+                                   (head, time.time())).lastrowid
+        conn.executemany("""INSERT INTO availability_snapshot_rentals(snapshot_id, rental_id, vehicle_id)
+                            VALUES (?, ?, ?)""", [(snapshot_id, r, v) for r, v in active.items()])
+        return head
+
+
+def fleet_state_at(at: float) -> FleetState:
+    """Active rentals as of Unix time `at`, from the nearest snapshot plus the events after it."""
+    with repo.get_conn() as conn:
+        conn.execute("BEGIN")  # one read snapshot for the three queries below
+        row = conn.execute("""SELECT id FROM rental_events WHERE recorded_at <= ?
+                              ORDER BY recorded_at DESC, id DESC LIMIT 1""", (at,)).fetchone()
+        if row is None:
+            return FleetState(at, {})
+        last_event_id, active = _latest_snapshot(conn, row[0])
+        _apply(active, conn.execute("""SELECT rental_id, vehicle_id, event FROM rental_events
+                                       WHERE id > ? AND id <= ? ORDER BY id""", (last_event_id, row[0])))
+    return FleetState(at, active)
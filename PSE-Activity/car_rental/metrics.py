@@ -0,0 +1,347 @@
+
+"""Opt-in latency instrumentation for the service, repository, pricing and SQL.
+
+    import metrics
+    metrics.enable()          # or CAR_RENTAL_METRICS=1 with enable_from_env()
+    ...
+    metrics.write_prometheus("car_rental.prom")   # or write_json(...)
+
+enable() wraps every public CarRentalService method, every repository and
+pricing function, and swaps in a connection class whose cursors time each
+statement and the fetching of its rows, whether by fetch*() or by iteration. Statements are grouped by a fingerprint of their normalized SQL
+text. disable() puts the original objects back. While disabled nothing is
+wrapped, so the only cost is not having the numbers.
+"""
+from __future__ import annotations
+import bisect
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pricing
+import repository as repo
+from services import CarRentalService
+
+# upper bounds in seconds, as in Prometheus histograms; +Inf is implicit
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# repository helpers that are not queries of their own
+_REPO_SKIP = {"configure", "get_pool", "close_pool", "get_conn", "transaction"}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "errors", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+            if error:
+                self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (inf if past the last bucket)."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank and seen:
+                return bound
+        return 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            cumulative += n
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+        return {"count": self.count, "sum": round(self.sum, 6), "errors": self.errors,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99),
+                "buckets": buckets}
+
+
+class Registry:
+    """Histograms keyed by (metric, labels); labels are (name, value) tuples."""
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._sql: Dict[str, str] = {}  # fingerprint -> normalized SQL
+        self._lock = threading.Lock()
+
+    def histogram(self, metric: str, **labels: str) -> Histogram:
+        return self.get((metric, tuple(sorted(labels.items()))))
+
+    def get(self, key: Tuple[str, Tuple[Tuple[str, str], ...]]) -> Histogram:
+        h = self._histograms.get(key)
+        if h is None:
+            with self._lock:
+                h = self._histograms.setdefault(key, Histogram())
+        return h
+
+    def note_sql(self, fingerprint: str, text: str) -> None:
+        self._sql.setdefault(fingerprint, text)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._sql.clear()
+
+    def items(self) -> List[Tuple[str, Dict[str, str], Histogram]]:
+        with self._lock:
+            return [(metric, dict(labels), h) for (metric, labels), h in sorted(self._histograms.items())]
+
+    def sql_statements(self) -> Dict[str, str]:
+        return dict(self._sql)
+
+
+REGISTRY = Registry()
+_originals: List[Tuple[Any, str, Any]] = []  # (owner, attribute, original value) while enabled
+
+
+# -------- SQL fingerprints --------
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> Tuple[str, str]:
+    """(short id, normalized text): literals become ?, whitespace is collapsed, IN lists folded."""
+    text = _NUMBER.sub("?", _STRING.sub("?", " ".join(sql.split())))
+    text = _IN_LIST.sub("(?...)", text)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], text
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times execute/executemany and the fetches that follow, per statement fingerprint.
+
+    fetchone/fetchmany/fetchall are one observation each. Iterating the cursor
+    (`for row in conn.execute(...)`) adds up the time spent in every step and records
+    it as one fetch when the rows run out, the cursor is re-executed or it is closed.
+    """
+    _execute_key = _fetch_key = ("sql", (("fingerprint", ""), ("phase", "fetch")))
+    _iter_seconds = 0.0  # time spent iterating since the last observation
+
+    def _start(self, sql: str) -> None:
+        self._flush_iteration()
+        fp, text = fingerprint(sql)
+        REGISTRY.note_sql(fp, text)
+        self._execute_key = ("sql", (("fingerprint", fp), ("phase", "execute")))
+        self._fetch_key = ("sql", (("fingerprint", fp), ("phase", "fetch")))
+
+    def execute(self, sql, parameters=()):
+        self._start(sql)
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except Exception:
+            REGISTRY.get(self._execute_key).observe(time.perf_counter() - start, error=True)
+            raise
+        REGISTRY.get(self._execute_key).observe(time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql)
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except Exception:
+            REGISTRY.get(self._execute_key).observe(time.perf_counter() - start, error=True)
+            raise
+        REGISTRY.get(self._execute_key).observe(time.perf_counter() - start)
+        return self
+
+    def _fetch(self, fetch: Callable[..., Any], *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            rows = fetch(*args)
+        except Exception:
+            REGISTRY.get(self._fetch_key).observe(time.perf_counter() - start, error=True)
+            raise
+        REGISTRY.get(self._fetch_key).observe(time.perf_counter() - start)
+        return rows
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._iter_seconds += time.perf_counter() - start
+            self._flush_iteration()
+            raise
+        except Exception:
+            self._iter_seconds += time.perf_counter() - start
+            self._flush_iteration(error=True)
+            raise
+        self._iter_seconds += time.perf_counter() - start
+        return row
+
+    def _flush_iteration(self, error: bool = False) -> None:
+        if self._iter_seconds or error:
+            REGISTRY.get(self._fetch_key).observe(self._iter_seconds, error=error)
+            self._iter_seconds = 0.0
+
+    def close(self):
+        self._flush_iteration()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # the C shortcuts build a plain cursor without going through self.cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# -------- Wrapping --------
+def _timed_callable(metric: str, label: str, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    # looked up per call rather than captured, so reset() never leaves a wrapper on a stale histogram
+    key = (metric, ((label, name),))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            REGISTRY.get(key).observe(time.perf_counter() - start, error=True)
+            raise
+        REGISTRY.get(key).observe(time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+def _patch(owner: Any, name: str, value: Any) -> None:
+    _originals.append((owner, name, getattr(owner, name)))
+    setattr(owner, name, value)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    """Install the wrappers. Pooled connections are reopened so they use the timed cursors."""
+    if is_enabled():
+        return
+    for name, fn in inspect.getmembers(CarRentalService, inspect.isfunction):
+        if not name.startswith("_"):
+            _patch(CarRentalService, name, _timed_callable("service", "method", name, fn))
+    for name, fn in inspect.getmembers(repo, inspect.isfunction):
+        if not name.startswith("_") and name not in _REPO_SKIP and fn.__module__ == repo.__name__:
+            _patch(repo, name, _timed_callable("repository", "function", name, fn))
+    for name in ("quote", "quote_batch"):
+        _patch(pricing, name, _timed_callable("pricing", "function", name, getattr(pricing, name)))
+    _patch(repo, "CONNECTION_FACTORY", InstrumentedConnection)
+    repo.close_pool()
+
+
+def disable() -> None:
+    """Restore the original functions and plain connections; recorded data is kept."""
+    while _originals:
+        owner, name, value = _originals.pop()
+        setattr(owner, name, value)
+    repo.close_pool()
+
+
+def enable_from_env() -> bool:
+    if os.environ.get("CAR_RENTAL_METRICS", "").lower() in ("1", "true", "yes"):
+        enable()
+    return is_enabled()
+
+
+def reset() -> None:
+    REGISTRY.reset()
+
+
+# -------- Export --------
+_HELP = {
+    "service": "CarRentalService method latency",
+    "repository": "repository function latency",
+    "pricing": "pricing function latency",
+    "sql": "SQL statement latency by fingerprint and phase",
+}
+
+
+def _labels(labels: Dict[str, str], **extra: str) -> str:
+    merged = dict(labels, **extra)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in merged.items()) + "}"
+
+
+def export_prometheus() -> str:
+    lines: List[str] = []
+    by_metric: Dict[str, List[Tuple[Dict[str, str], Histogram]]] = {}
+    for metric, labels, h in REGISTRY.items():
+        by_metric.setdefault(metric, []).append((labels, h))
+    for metric, series in by_metric.items():
+        name = f"car_rental_{metric}_seconds"
+        lines += [f"# HELP {name} {_HELP.get(metric, metric)}", f"# TYPE {name} histogram"]
+        for labels, h in series:
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), h.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        errors = f"car_rental_{metric}_errors_total"
+        lines += [f"# HELP {errors} calls that raised", f"# TYPE {errors} counter"]
+        lines += [f"{errors}{_labels(labels)} {h.errors}" for labels, h in series]
+    statements = REGISTRY.sql_statements()
+    if statements:
+        lines += ["# HELP car_rental_sql_statement_info normalized SQL text for each fingerprint",
+                  "# TYPE car_rental_sql_statement_info gauge"]
+        for fp, text in sorted(statements.items()):
+            escaped = text.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'car_rental_sql_statement_info{{fingerprint="{fp}",sql="{escaped}"}} 1')
+    return "\n".join(lines) + "\n"
+
+
+def export_json() -> Dict[str, Any]:
+    doc: Dict[str, Any] = {"enabled": is_enabled(), "buckets": list(BUCKETS)}
+    statements = REGISTRY.sql_statements()
+    for metric, labels, h in REGISTRY.items():
+        if metric == "sql":
+            entry = doc.setdefault("sql", {}).setdefault(labels["fingerprint"],
+                                                         {"sql": statements.get(labels["fingerprint"], "")})
+            entry[labels["phase"]] = h.to_dict()
+        else:
+            doc.setdefault(metric, {})[next(iter(labels.values()))] = h.to_dict()
+    return doc
+
+
+def write_prometheus(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(export_prometheus())
+
+
+def write_json(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(export_json(), f, indent=1)
@@ -0,0 +1,319 @@
+
+"""Versioned schema migrations.
+
+The schema version lives in `PRAGMA user_version`. Migration N (1-based) in
+MIGRATIONS moves a database from version N-1 to N; `migrate()` applies every
+pending step in order inside the caller's transaction.
+"""
+from __future__ import annotations
+import sqlite3
+from typing import Callable, List
+
+
+def _v1_base_tables(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS customers(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT NOT NULL
+        );""")
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS vehicles(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            brand TEXT NOT NULL,
+            model TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            daily_rate REAL NOT NULL,
+            vehicle_type TEXT NOT NULL,
+            available INTEGER NOT NULL DEFAULT 1
+        );""")
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS rentals(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            vehicle_id INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            total_cost REAL NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('active','finished')),
+            FOREIGN KEY(customer_id) REFERENCES customers(id),
+            FOREIGN KEY(vehicle_id) REFERENCES vehicles(id)
+        );""")
+
+
+def _v2_lookup_indexes(cur: sqlite3.Cursor) -> None:
+    # overlap checks: vehicle_id + status equality, then the date range
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_rentals_vehicle_status_dates
+                   ON rentals(vehicle_id, status, start_date, end_date)""")
+    # list_rentals(status=...) ordered by id
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rentals_status_id ON rentals(status, id)")
+    # list_vehicles(only_available=True) ordered by id
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vehicles_available_id ON vehicles(available, id)")
+
+
+def _v3_integer_day_columns(cur: sqlite3.Cursor) -> None:
+    # start_day/end_day hold date.toordinal() values next to the ISO text columns,
+    # so overlap checks compare plain integers and can range-scan an index.
+    # julianday('0001-01-01') is 1721425.5 and that date's ordinal is 1.
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(rentals)").fetchall()}
+    for column in ("start_day", "end_day"):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE rentals ADD COLUMN {column} INTEGER")
+    cur.execute("""UPDATE rentals
+                   SET start_day = CAST(julianday(start_date) - 1721424.5 AS INTEGER),
+                       end_day = CAST(julianday(end_date) - 1721424.5 AS INTEGER)""")
+    cur.execute("DROP INDEX IF EXISTS idx_rentals_vehicle_status_dates")
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_rentals_vehicle_status_days
+                   ON rentals(vehicle_id, status, start_day, end_day)""")
+
+
+def fts5_available(cur: sqlite3.Cursor) -> bool:
+    try:
+        cur.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        cur.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _v4_vehicle_search_index(cur: sqlite3.Cursor) -> None:
+    # Without FTS5 this step is a no-op and search_vehicles() keeps using LIKE.
+    if not fts5_available(cur):
+        return
+    cur.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS vehicles_fts USING fts5(
+                       brand, model, vehicle_type, content='vehicles', content_rowid='id')""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS vehicles_fts_ai AFTER INSERT ON vehicles BEGIN
+                       INSERT INTO vehicles_fts(rowid, brand, model, vehicle_type)
+                       VALUES (new.id, new.brand, new.model, new.vehicle_type);
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS vehicles_fts_ad AFTER DELETE ON vehicles BEGIN
+                       INSERT INTO vehicles_fts(vehicles_fts, rowid, brand, model, vehicle_type)
+                       VALUES ('delete', old.id, old.brand, old.model, old.vehicle_type);
+                   END""")
+    # only text changes touch the index; availability flips do not
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS vehicles_fts_au AFTER UPDATE OF brand, model, vehicle_type ON vehicles BEGIN
+                       INSERT INTO vehicles_fts(vehicles_fts, rowid, brand, model, vehicle_type)
+                       VALUES ('delete', old.id, old.brand, old.model, old.vehicle_type);
+                       INSERT INTO vehicles_fts(rowid, brand, model, vehicle_type)
+                       VALUES (new.id, new.brand, new.model, new.vehicle_type);
+                   END""")
+    cur.execute("INSERT INTO vehicles_fts(vehicles_fts) VALUES ('rebuild')")
+
+
+# Longest rental the daily rollup can spread over its days (100 years).
+MAX_REPORT_DAYS = 36_525
+
+
+def _v5_reporting_rollups(cur: sqlite3.Cursor) -> None:
+    # Summary tables for reports.py, kept current by triggers in the same transaction as
+    # the rental/vehicle writes, so reports never scan rentals.
+    cur.execute("""CREATE TABLE IF NOT EXISTS report_by_type(
+                       vehicle_type TEXT PRIMARY KEY,
+                       vehicles INTEGER NOT NULL DEFAULT 0,
+                       rentals INTEGER NOT NULL DEFAULT 0,
+                       active INTEGER NOT NULL DEFAULT 0,
+                       revenue REAL NOT NULL DEFAULT 0,
+                       rented_days INTEGER NOT NULL DEFAULT 0)""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS report_by_customer(
+                       customer_id INTEGER PRIMARY KEY REFERENCES customers(id),
+                       rentals INTEGER NOT NULL DEFAULT 0,
+                       revenue REAL NOT NULL DEFAULT 0)""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_report_by_customer_revenue ON report_by_customer(revenue DESC)")
+    # day = date.toordinal(); revenue is booked on the rental's first day
+    cur.execute("""CREATE TABLE IF NOT EXISTS report_daily(
+                       day INTEGER PRIMARY KEY,
+                       vehicles_out INTEGER NOT NULL DEFAULT 0,
+                       rentals_started INTEGER NOT NULL DEFAULT 0,
+                       revenue REAL NOT NULL DEFAULT 0)""")
+    # triggers cannot use recursive CTEs, so spreading a rental over its days joins this
+    cur.execute("CREATE TABLE IF NOT EXISTS report_day_offsets(n INTEGER PRIMARY KEY)")
+    cur.execute("""WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+                   INSERT OR IGNORE INTO report_day_offsets(n) SELECT n FROM seq""", (MAX_REPORT_DAYS - 1,))
+
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS vehicles_report_ai AFTER INSERT ON vehicles BEGIN
+                       INSERT INTO report_by_type(vehicle_type, vehicles) VALUES (new.vehicle_type, 1)
+                       ON CONFLICT(vehicle_type) DO UPDATE SET vehicles = vehicles + 1;
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS vehicles_report_ad AFTER DELETE ON vehicles BEGIN
+                       UPDATE report_by_type SET vehicles = vehicles - 1 WHERE vehicle_type = old.vehicle_type;
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS vehicles_report_au AFTER UPDATE OF vehicle_type ON vehicles
+                   WHEN old.vehicle_type IS NOT new.vehicle_type BEGIN
+                       UPDATE report_by_type SET vehicles = vehicles - 1 WHERE vehicle_type = old.vehicle_type;
+                       INSERT INTO report_by_type(vehicle_type, vehicles) VALUES (new.vehicle_type, 1)
+                       ON CONFLICT(vehicle_type) DO UPDATE SET vehicles = vehicles + 1;
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS rentals_report_ai AFTER INSERT ON rentals BEGIN
+                       INSERT INTO report_by_type(vehicle_type, rentals, active, revenue, rented_days)
+                       SELECT vehicle_type, 1, new.status = 'active', new.total_cost, new.end_day - new.start_day + 1
+                       FROM vehicles WHERE id = new.vehicle_id
+                       ON CONFLICT(vehicle_type) DO UPDATE SET
+                           rentals = rentals + 1, active = active + excluded.active,
+                           revenue = revenue + excluded.revenue, rented_days = rented_days + excluded.rented_days;
+                       INSERT INTO report_by_customer(customer_id, rentals, revenue) VALUES (new.customer_id, 1, new.total_cost)
+                       ON CONFLICT(customer_id) DO UPDATE SET rentals = rentals + 1, revenue = revenue + excluded.revenue;
+                       INSERT INTO report_daily(day, rentals_started, revenue) VALUES (new.start_day, 1, new.total_cost)
+                       ON CONFLICT(day) DO UPDATE SET rentals_started = rentals_started + 1, revenue = revenue + excluded.revenue;
+                       INSERT INTO report_daily(day, vehicles_out)
+                       SELECT new.start_day + n, 1 FROM report_day_offsets WHERE n <= new.end_day - new.start_day
+                       ON CONFLICT(day) DO UPDATE SET vehicles_out = vehicles_out + 1;
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS rentals_report_au AFTER UPDATE OF status ON rentals
+                   WHEN old.status = 'active' AND new.status <> 'active' BEGIN
+                       UPDATE report_by_type SET active = active - 1
+                       WHERE vehicle_type = (SELECT vehicle_type FROM vehicles WHERE id = new.vehicle_id);
+                   END""")
+
+    # backfill from whatever is already there
+    cur.execute("""INSERT INTO report_by_type(vehicle_type, vehicles)
+                   SELECT vehicle_type, COUNT(*) FROM vehicles WHERE true GROUP BY vehicle_type
+                   ON CONFLICT(vehicle_type) DO UPDATE SET vehicles = excluded.vehicles""")
+    cur.execute("""UPDATE report_by_type SET (rentals, active, revenue, rented_days) = (
+                       SELECT COUNT(*), TOTAL(r.status = 'active'), TOTAL(r.total_cost),
+                              TOTAL(r.end_day - r.start_day + 1)
+                       FROM rentals r JOIN vehicles v ON v.id = r.vehicle_id
+                       WHERE v.vehicle_type = report_by_type.vehicle_type)""")
+    cur.execute("""INSERT OR REPLACE INTO report_by_customer(customer_id, rentals, revenue)
+                   SELECT customer_id, COUNT(*), TOTAL(total_cost) FROM rentals GROUP BY customer_id""")
+    cur.execute("DELETE FROM report_daily")
+    cur.execute("""INSERT INTO report_daily(day, rentals_started, revenue)
+                   SELECT start_day, COUNT(*), TOTAL(total_cost) FROM rentals GROUP BY start_day""")
+    cur.execute("""INSERT INTO report_daily(day, vehicles_out)
+                   SELECT r.start_day + o.n AS day, COUNT(*) FROM rentals r
+                   JOIN report_day_offsets o ON o.n <= r.end_day - r.start_day
+                   WHERE true GROUP BY day
+                   ON CONFLICT(day) DO UPDATE SET vehicles_out = excluded.vehicles_out""")
+
+
+# Unix time in SQL, rounded to the milliseconds julianday('now') actually resolves;
+# unixepoch('subsec') would need SQLite 3.42.
+SQL_NOW = "ROUND((julianday('now') - 2440587.5) * 86400.0, 3)"
+
+
+def _v6_rental_events(cur: sqlite3.Cursor) -> None:
+    # SQLite cannot alter a CHECK constraint, so rentals is rebuilt to allow 'cancelled';
+    # its indexes and triggers are recreated from their stored SQL.
+    dependents = cur.execute("""SELECT name, sql FROM sqlite_master
+                                WHERE tbl_name = 'rentals' AND type IN ('index', 'trigger')
+                                AND sql IS NOT NULL""").fetchall()
+    cur.execute("""CREATE TABLE rentals_new(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            vehicle_id INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            total_cost REAL NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('active','finished','cancelled')),
+            start_day INTEGER,
+            end_day INTEGER,
+            FOREIGN KEY(customer_id) REFERENCES customers(id),
+            FOREIGN KEY(vehicle_id) REFERENCES vehicles(id)
+        )""")
+    cur.execute("""INSERT INTO rentals_new(id, customer_id, vehicle_id, start_date, end_date, total_cost,
+                                           status, start_day, end_day)
+                   SELECT id, customer_id, vehicle_id, start_date, end_date, total_cost, status, start_day, end_day
+                   FROM rentals""")
+    cur.execute("DROP TABLE rentals")
+    cur.execute("ALTER TABLE rentals_new RENAME TO rentals")
+    for name, sql in dependents:
+        if name != "rentals_report_au":  # replaced below
+            cur.execute(sql)
+
+    # finishing only closes the rental; cancelling also takes back its revenue and days
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS rentals_report_finish AFTER UPDATE OF status ON rentals
+                   WHEN old.status = 'active' AND new.status = 'finished' BEGIN
+                       UPDATE report_by_type SET active = active - 1
+                       WHERE vehicle_type = (SELECT vehicle_type FROM vehicles WHERE id = new.vehicle_id);
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS rentals_report_cancel AFTER UPDATE OF status ON rentals
+                   WHEN old.status = 'active' AND new.status = 'cancelled' BEGIN
+                       UPDATE report_by_type SET active = active - 1, rentals = rentals - 1,
+                           revenue = revenue - new.total_cost, rented_days = rented_days - (new.end_day - new.start_day + 1)
+                       WHERE vehicle_type = (SELECT vehicle_type FROM vehicles WHERE id = new.vehicle_id);
+                       UPDATE report_by_customer SET rentals = rentals - 1, revenue = revenue - new.total_cost
+                       WHERE customer_id = new.customer_id;
+                       UPDATE report_daily SET rentals_started = rentals_started - 1, revenue = revenue - new.total_cost
+                       WHERE day = new.start_day;
+                       UPDATE report_daily SET vehicles_out = vehicles_out - 1
+                       WHERE day BETWEEN new.start_day AND new.end_day;
+                   END""")
+
+    # append-only history, written by triggers in the same transaction as the rental change
+    cur.execute("""CREATE TABLE IF NOT EXISTS rental_events(
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       rental_id INTEGER NOT NULL REFERENCES rentals(id),
+                       vehicle_id INTEGER NOT NULL,
+                       event TEXT NOT NULL CHECK(event IN ('created','returned','cancelled')),
+                       recorded_at REAL NOT NULL)""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rental_events_rental ON rental_events(rental_id, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rental_events_recorded_at ON rental_events(recorded_at, id)")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS rental_events_no_update BEFORE UPDATE ON rental_events BEGIN
+                       SELECT RAISE(ABORT, 'rental_events is append-only');
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS rental_events_no_delete BEFORE DELETE ON rental_events BEGIN
+                       SELECT RAISE(ABORT, 'rental_events is append-only');
+                   END""")
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS rentals_event_created AFTER INSERT ON rentals BEGIN
+                        INSERT INTO rental_events(rental_id, vehicle_id, event, recorded_at)
+                        VALUES (new.id, new.vehicle_id, 'created', {SQL_NOW});
+                    END""")
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS rentals_event_closed AFTER UPDATE OF status ON rentals
+                    WHEN old.status = 'active' AND new.status <> 'active' BEGIN
+                        INSERT INTO rental_events(rental_id, vehicle_id, event, recorded_at)
+                        VALUES (new.id, new.vehicle_id,
+                                CASE new.status WHEN 'finished' THEN 'returned' ELSE 'cancelled' END, {SQL_NOW});
+                    END""")
+    # Rentals that predate the log get events at midnight UTC of their start day and,
+    # if finished, of their end day. That is the best available approximation, capped at
+    # the migration time: the log is read in id order, so no backfilled event may be
+    # stamped after the live ones that follow it.
+    cur.execute(f"""INSERT INTO rental_events(rental_id, vehicle_id, event, recorded_at)
+                    SELECT id, vehicle_id, event, MIN(at, {SQL_NOW}) FROM (
+                        SELECT id, vehicle_id, 'created' AS event, (start_day - 719163) * 86400.0 AS at, 0 AS seq
+                        FROM rentals
+                        UNION ALL
+                        SELECT id, vehicle_id, 'returned', (end_day - 719163) * 86400.0, 1
+                        FROM rentals WHERE status = 'finished')
+                    ORDER BY at, seq, id""")
+
+    # fleet state (active rental -> vehicle) once every event up to `last_event_id` is applied
+    cur.execute("""CREATE TABLE IF NOT EXISTS availability_snapshots(
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       last_event_id INTEGER NOT NULL UNIQUE,
+                       taken_at REAL NOT NULL)""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS availability_snapshot_rentals(
+                       snapshot_id INTEGER NOT NULL REFERENCES availability_snapshots(id),
+                       rental_id INTEGER NOT NULL,
+                       vehicle_id INTEGER NOT NULL,
+                       PRIMARY KEY(snapshot_id, rental_id)) WITHOUT ROWID""")
+
+
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _v1_base_tables,
+    _v2_lookup_indexes,
+    _v3_integer_day_columns,
+    _v4_vehicle_search_index,
+    _v5_reporting_rollups,
+    _v6_rental_events,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    return version
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    version = current_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema v{version} is newer than this code (v{SCHEMA_VERSION}).")
+    cur = conn.cursor()
+    for step in MIGRATIONS[version:]:
+        step(cur)
+        version += 1
+        cur.execute(f"PRAGMA user_version = {version}")
+    return version
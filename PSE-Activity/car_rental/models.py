@@ -1,21 +1,41 @@
 
 from __future__ import annotations
+import sys
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from dataclasses import dataclass
 from datetime import date
-from typing import Optional
+from typing import Any, Dict, Optional, Sequence, Type
 
 
 class Vehicle(ABC):
     """Abstract base class for all vehicles."""
-    def __init__(self, brand: str, model: str, year: int, daily_rate: float):
+    # slots keep row-built vehicles compact (no per-instance __dict__)
+    __slots__ = ("_id", "_brand", "_model", "_year", "_daily_rate", "_available")
+
+    def __init__(self, brand: str, model: str, year: int, daily_rate: float,
+                 id: Optional[int] = None, available: bool = True):
+        self._id = id
         self._brand = brand
         self._model = model
         self._year = year
         self._daily_rate = daily_rate
-        self._available = True  # encapsulated availability
+        self._available = bool(available)  # encapsulated availability
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "Vehicle":
+        """Build the right subclass from a (id, brand, model, year, rate, type, available) row."""
+        vid, brand, model, year, daily_rate, vehicle_type, available = row
+        vehicle_cls = VEHICLE_TYPES.get(vehicle_type)
+        if vehicle_cls is None:
+            return OtherVehicle(vehicle_type, brand, model, year, daily_rate, id=vid, available=available)
+        return vehicle_cls(brand, model, year, daily_rate, id=vid, available=available)
 
     # Encapsulation via properties
+    @property
+    def id(self) -> Optional[int]:
+        return self._id
+
     @property
     def brand(self) -> str:
         return self._brand
@@ -56,32 +76,58 @@ class Vehicle(ABC):
 
 
 class EconomyCar(Vehicle):
+    __slots__ = ()
+
     @property
     def vehicle_type(self) -> str:
         return "Economy"
 
 
 class SUV(Vehicle):
+    __slots__ = ()
+
     @property
     def vehicle_type(self) -> str:
         return "SUV"
 
 
 class Truck(Vehicle):
+    __slots__ = ()
+
     @property
     def vehicle_type(self) -> str:
         return "Truck"
 
 
-@dataclass
+class OtherVehicle(Vehicle):
+    """A stored vehicle whose type has no dedicated subclass."""
+    __slots__ = ("_vehicle_type",)
+
+    def __init__(self, vehicle_type: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._vehicle_type = vehicle_type
+
+    @property
+    def vehicle_type(self) -> str:
+        return self._vehicle_type
+
+
+VEHICLE_TYPES: Dict[str, Type[Vehicle]] = {"Economy": EconomyCar, "SUV": SUV, "Truck": Truck}
+
+
+@dataclass(slots=True)
 class Customer:
     id: Optional[int]
     name: str
     email: str
     phone: str
 
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "Customer":
+        return cls(*row)
 
-@dataclass
+
+@dataclass(slots=True)
 class Rental:
     id: Optional[int]
     customer_id: int
@@ -89,4 +135,14 @@ class Rental:
     start_date: date
     end_date: date
     total_cost: float
-    status: str  # 'active' or 'finished'
+    status: str  # 'active', 'finished' or 'cancelled'
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "Rental":
+        rid, customer_id, vehicle_id, start, end, total_cost, status = row
+        # rentals share a small set of dates/statuses; reuse those objects instead of one per row
+        return cls(rid, customer_id, vehicle_id, _parse_day(start), _parse_day(end),
+                   total_cost, sys.intern(status))
+
+
+_parse_day = lru_cache(maxsize=8192)(date.fromisoformat)
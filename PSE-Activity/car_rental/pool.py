@@ -0,0 +1,113 @@
+
+from __future__ import annotations
+import queue
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+
+class PoolClosedError(Exception):
+    pass
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to `size`, handed to one thread at a time
+    and returned after use instead of being closed.
+    """
+    def __init__(self, db_name: str, size: int = 5, timeout: float = 10.0,
+                 health_check: bool = True,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 factory: type = sqlite3.Connection):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self._on_connect = on_connect
+        self._factory = factory
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # -------- Lifecycle --------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, factory=self._factory)
+        if self._on_connect:
+            self._on_connect(conn)
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise PoolClosedError("Connection pool is closed.")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.size:
+                    conn = self._connect()
+                    self._all.append(conn)
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeoutError(f"No connection available after {self.timeout}s.") from None
+        if self.health_check and not self._is_healthy(conn):
+            self._discard(conn)
+            return self.acquire()
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            self._discard(conn)
+            return
+        if conn.in_transaction:
+            # never hand out a connection with a half-finished transaction
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        self._idle.put_nowait(conn)
+
+    def close(self) -> None:
+        """Close every connection; connections still checked out are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def open_connections(self) -> int:
+        return len(self._all)
@@ -1,8 +1,29 @@
 
 from __future__ import annotations
+import threading
 from abc import ABC, abstractmethod
-from datetime import date, timedelta
-from typing import List
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:  # optional: only the batch quote engine uses it
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+
+def _weekend_days_before(ordinal: int) -> int:
+    """Saturdays/Sundays among ordinals 1..ordinal (ordinal 1 is a Monday)."""
+    weeks, rest = divmod(ordinal, 7)
+    return 2 * weeks + max(0, rest - 5)
+
+
+def count_days(start: date, end: date) -> Tuple[int, int]:
+    """(weekdays, weekend_days) in the inclusive range [start, end], in O(1)."""
+    if end < start:
+        return 0, 0
+    weekend = _weekend_days_before(end.toordinal()) - _weekend_days_before(start.toordinal() - 1)
+    return (end - start).days + 1 - weekend, weekend
 
 
 class PricingStrategy(ABC):
@@ -26,13 +47,23 @@ class SUVPremiumPricing(PricingStrategy):
 class WeekendDiscountPricing(PricingStrategy):
     """10% off for weekend days (Sat/Sun)."""
     def compute_cost(self, days: int, base_daily_rate: float, start: date, end: date) -> float:
-        d = start
-        total = 0.0
-        while d <= end:
-            rate = base_daily_rate * 0.9 if d.weekday() >= 5 else base_daily_rate  # 5=Sat,6=Sun
-            total += rate
-            d += timedelta(days=1)
-        return round(total, 2)
+        weekdays, weekend = count_days(start, end)
+        return round(weekdays * base_daily_rate + weekend * (base_daily_rate * 0.9), 2)
+
+
+# Strategies are stateless, so one shared instance of each is enough.
+STRATEGIES: Dict[str, PricingStrategy] = {
+    "standard": StandardPricing(),
+    "suv_premium": SUVPremiumPricing(),
+    "weekend_discount": WeekendDiscountPricing(),
+}
+
+
+def get_strategy(name: str) -> PricingStrategy:
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown pricing strategy '{name}'.") from None
 
 
 class PricingContext:
@@ -45,9 +76,125 @@ class PricingContext:
         # - SUV gets a premium strategy
         # - For all vehicles, if the rental includes weekend days, apply weekend discount strategy
         # - Otherwise standard
-        includes_weekend = any(((start.toordinal() + i) % 7) in (5, 6) for i in range((end - start).days + 1))
         if self.vehicle_type == "SUV":
-            return SUVPremiumPricing()
-        if includes_weekend:
-            return WeekendDiscountPricing()
-        return StandardPricing()
+            return STRATEGIES["suv_premium"]
+        if count_days(start, end)[1] > 0:
+            return STRATEGIES["weekend_discount"]
+        return STRATEGIES["standard"]
+
+
+# ------------ Quote cache -------------
+QuoteKey = Tuple[str, float, date, date]
+
+
+class QuoteCache:
+    """Bounded LRU cache of totals keyed on (vehicle_type, daily_rate, start, end)."""
+    def __init__(self, maxsize: int = 4096):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1.")
+        self.maxsize = maxsize
+        self._data: "OrderedDict[QuoteKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: QuoteKey, compute: Callable[[], float]) -> float:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, vehicle_type: Optional[str] = None, daily_rate: Optional[float] = None) -> int:
+        """Drop entries matching the given type and/or rate (all entries if neither is given)."""
+        with self._lock:
+            if vehicle_type is None and daily_rate is None:
+                dropped = len(self._data)
+                self._data.clear()
+                return dropped
+            stale = [k for k in self._data
+                     if (vehicle_type is None or k[0] == vehicle_type)
+                     and (daily_rate is None or k[1] == daily_rate)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+quote_cache = QuoteCache()
+
+
+def quote(vehicle_type: str, daily_rate: float, start: date, end: date) -> float:
+    """Total cost of renting a vehicle of this type/rate for [start, end], memoized."""
+    def compute() -> float:
+        days = (end - start).days + 1
+        return PricingContext(vehicle_type).choose(start, end).compute_cost(days, daily_rate, start, end)
+    return quote_cache.get_or_compute((vehicle_type, float(daily_rate), start, end), compute)
+
+
+# ------------ Batch quotes -------------
+def _quote_batch_python(daily_rates, vehicle_types, start_ordinals, end_ordinals) -> List[float]:
+    costs = []
+    for rate, vtype, s, e in zip(daily_rates, vehicle_types, start_ordinals, end_ordinals):
+        days = e - s + 1
+        rate = float(rate)
+        if vtype == "SUV":
+            costs.append(round(days * rate * 1.20, 2))
+            continue
+        weekend = _weekend_days_before(e) - _weekend_days_before(s - 1)
+        if weekend > 0:
+            costs.append(round((days - weekend) * rate + weekend * (rate * 0.9), 2))
+        else:
+            costs.append(round(days * rate, 2))
+    return costs
+
+
+def _quote_batch_numpy(daily_rates, vehicle_types, start_ordinals, end_ordinals) -> List[float]:
+    rates = np.asarray(daily_rates, dtype=np.float64)
+    starts = np.asarray(start_ordinals, dtype=np.int64)
+    ends = np.asarray(end_ordinals, dtype=np.int64)
+    is_suv = np.asarray(vehicle_types, dtype=object) == "SUV"
+
+    def weekend_before(n):
+        return 2 * (n // 7) + np.maximum(0, n % 7 - 5)
+
+    days = ends - starts + 1
+    weekend = weekend_before(ends) - weekend_before(starts - 1)
+    # same float operations, in the same order, as the scalar strategies
+    standard = days * rates
+    suv = days * rates * 1.20
+    discounted = (days - weekend) * rates + weekend * (rates * 0.9)
+    costs = np.where(is_suv, suv, np.where(weekend > 0, discounted, standard))
+    # Python's round() so results match the scalar path to the cent (np.round can differ on ties)
+    return [round(c, 2) for c in costs.tolist()]
+
+
+def quote_batch(daily_rates: Sequence[float], vehicle_types: Sequence[str],
+                start_ordinals: Sequence[int], end_ordinals: Sequence[int]) -> List[float]:
+    """Price many (rate, type, start, end) rentals in one pass.
+
+    Dates are date.toordinal() values (inclusive). Gives the same totals as
+    PricingContext(type).choose(start, end).compute_cost(...) for each item.
+    Uses NumPy when it is installed, a plain loop otherwise.
+    """
+    n = len(daily_rates)
+    if not (len(vehicle_types) == len(start_ordinals) == len(end_ordinals) == n):
+        raise ValueError("All batch inputs must have the same length.")
+    if np is None:
+        return _quote_batch_python(daily_rates, vehicle_types, start_ordinals, end_ordinals)
+    return _quote_batch_numpy(daily_rates, vehicle_types, start_ordinals, end_ordinals)
@@ -0,0 +1,77 @@
+
+"""Revenue and utilization reports served from the rollup tables.
+
+The report_* tables (migration v5) are updated by triggers whenever a vehicle
+or rental is written, so every query here reads a handful of summary rows
+instead of scanning `rentals`.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from typing import List
+
+import repository as repo
+
+
+@dataclass(slots=True)
+class VehicleTypeReport:
+    vehicle_type: str
+    vehicles: int
+    rentals: int
+    active: int
+    revenue: float
+    rented_days: int
+
+
+@dataclass(slots=True)
+class DailyUtilization:
+    day: date
+    vehicles_out: int
+    fleet: int
+    rentals_started: int
+    revenue: float
+
+    @property
+    def utilization(self) -> float:
+        return self.vehicles_out / self.fleet if self.fleet else 0.0
+
+
+@dataclass(slots=True)
+class CustomerRevenue:
+    customer_id: int
+    name: str
+    rentals: int
+    revenue: float
+
+
+def revenue_by_vehicle_type() -> List[VehicleTypeReport]:
+    with repo.get_conn() as conn:
+        rows = conn.execute("""SELECT vehicle_type, vehicles, rentals, active, revenue, rented_days
+                               FROM report_by_type ORDER BY revenue DESC, vehicle_type""").fetchall()
+    return [VehicleTypeReport(*row) for row in rows]
+
+
+def daily_utilization(start: date, end: date) -> List[DailyUtilization]:
+    """One entry per day in [start, end]; days nobody rented show zeros.
+
+    `fleet` is today's fleet size, so past days are measured against the current fleet.
+    """
+    s, e = start.toordinal(), end.toordinal()
+    with repo.get_conn() as conn:
+        (fleet,) = conn.execute("SELECT COALESCE(SUM(vehicles), 0) FROM report_by_type").fetchone()
+        rows = conn.execute("""SELECT day, vehicles_out, rentals_started, revenue FROM report_daily
+                               WHERE day BETWEEN ? AND ?""", (s, e)).fetchall()
+    by_day = {day: (out, started, revenue) for day, out, started, revenue in rows}
+    report = []
+    for day in range(s, e + 1):
+        out, started, revenue = by_day.get(day, (0, 0, 0.0))
+        report.append(DailyUtilization(date.fromordinal(day), out, fleet, started, revenue))
+    return report
+
+
+def top_customers(limit: int = 10) -> List[CustomerRevenue]:
+    with repo.get_conn() as conn:
+        rows = conn.execute("""SELECT r.customer_id, c.name, r.rentals, r.revenue
+                               FROM report_by_customer r JOIN customers c ON c.id = r.customer_id
+                               ORDER BY r.revenue DESC LIMIT ?""", (limit,)).fetchall()
+    return [CustomerRevenue(*row) for row in rows]
@@ -1,58 +1,174 @@
-
+import atexit
+import os
+import re
 import sqlite3
 from contextlib import contextmanager
 from datetime import date
-from typing import List, Optional, Tuple, Any
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+import migrations
+from models import Customer, Rental, Vehicle
+from pool import ConnectionPool
 
 DB_NAME = "car_rental.db"
+# 0 disables pooling and opens a fresh connection per call (the original behaviour)
+POOL_SIZE = int(os.environ.get("CAR_RENTAL_POOL_SIZE", "5"))
+
+# PRAGMAs applied to every new connection, by profile. journal_mode is stored in the
+# database file; the rest are per connection.
+DB_PROFILES: Dict[str, Dict[str, Any]] = {
+    # SQLite's defaults: rollback journal, fsync on every commit; a commit waits for readers
+    "rollback": {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000},
+    # readers and the writer no longer block each other; fsync only at checkpoints
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000,
+            "cache_size": -16_000,         # KiB, i.e. 16 MiB of page cache per connection
+            "mmap_size": 256 * 1024 ** 2,  # read pages straight from the OS page cache
+            "temp_store": "MEMORY"},
+}
+
+
+def _check_profile(name: str) -> str:
+    if name not in DB_PROFILES:
+        raise ValueError(f"Unknown DB profile '{name}'; choose from {', '.join(DB_PROFILES)}.")
+    return name
+
+
+# a typo in the environment fails at import, not on the first connection
+DB_PROFILE = _check_profile(os.environ.get("CAR_RENTAL_DB_PROFILE", "wal"))
+
+# sqlite3.Connection subclass used for new connections (metrics.enable() swaps in its own)
+CONNECTION_FACTORY: type = sqlite3.Connection
+
+_pool: Optional[ConnectionPool] = None
+_vehicle_fts: Dict[str, bool] = {}  # DB_NAME -> whether the vehicles_fts index exists
+
+
+def _setup_connection(conn: sqlite3.Connection) -> None:
+    for name, value in DB_PROFILES[DB_PROFILE].items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    conn.execute("PRAGMA foreign_keys = ON;")
+
+
+def configure(db_name: Optional[str] = None, pool_size: Optional[int] = None,
+              db_profile: Optional[str] = None) -> None:
+    """Point the repository at another database, resize the pool and/or switch PRAGMA profile."""
+    global DB_NAME, POOL_SIZE, DB_PROFILE
+    if db_profile is not None:
+        _check_profile(db_profile)
+    close_pool()
+    _vehicle_fts.clear()
+    if db_name is not None:
+        DB_NAME = db_name
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if db_profile is not None:
+        DB_PROFILE = db_profile
+
+
+def get_pool() -> Optional[ConnectionPool]:
+    global _pool
+    if POOL_SIZE <= 0:
+        return None
+    if _pool is None or _pool.closed or _pool.db_name != DB_NAME:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(DB_NAME, size=POOL_SIZE, on_connect=_setup_connection, factory=CONNECTION_FACTORY)
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
+# sqlite3 row factories: queries build entity objects directly instead of tuples
+def _customer_row(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Customer:
+    return Customer(*row)
+
+
+def _vehicle_row(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Vehicle:
+    return Vehicle.from_row(row)
+
+
+def _rental_row(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Rental:
+    return Rental.from_row(row)
+
+
+class BookingRejected(Exception):
+    """A booking rule failed inside book_rental(); the transaction was rolled back."""
 
 
 @contextmanager
 def get_conn():
-    conn = sqlite3.connect(DB_NAME)
+    pool = get_pool()
+    if pool is None:
+        conn = sqlite3.connect(DB_NAME, factory=CONNECTION_FACTORY)
+        _setup_connection(conn)
+    else:
+        conn = pool.acquire()
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
         yield conn
         conn.commit()
     except Exception:
         conn.rollback()
         raise
     finally:
-        conn.close()
+        if pool is None:
+            conn.close()
+        else:
+            pool.release(conn)
 
 
-def init_db() -> None:
+@contextmanager
+def transaction():
+    """Like get_conn(), but takes the write lock up front with BEGIN IMMEDIATE."""
     with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """CREATE TABLE IF NOT EXISTS customers(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL UNIQUE,
-                phone TEXT NOT NULL
-            );""")
-        cur.execute(
-            """CREATE TABLE IF NOT EXISTS vehicles(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                brand TEXT NOT NULL,
-                model TEXT NOT NULL,
-                year INTEGER NOT NULL,
-                daily_rate REAL NOT NULL,
-                vehicle_type TEXT NOT NULL,
-                available INTEGER NOT NULL DEFAULT 1
-            );""")
-        cur.execute(
-            """CREATE TABLE IF NOT EXISTS rentals(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER NOT NULL,
-                vehicle_id INTEGER NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                total_cost REAL NOT NULL,
-                status TEXT NOT NULL CHECK(status IN ('active','finished')),
-                FOREIGN KEY(customer_id) REFERENCES customers(id),
-                FOREIGN KEY(vehicle_id) REFERENCES vehicles(id)
-            );""")
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+
+def _iter_pages(fetch_page: Callable[[int, int], List[Any]], batch_size: int) -> Iterator[Any]:
+    """Stream rows page by page; only one page is in memory and no connection is held between pages."""
+    after_id = 0
+    while True:
+        page = fetch_page(after_id, batch_size)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after_id = page[-1].id
+
+
+def _insert_many(conn: sqlite3.Connection, sql: str, rows: List[Tuple[Any, ...]]) -> List[Tuple[int, str]]:
+    """executemany a chunk inside the caller's transaction.
+
+    If a constraint fails, the chunk is undone and replayed row by row so only the
+    offending rows are skipped. Returns (index in rows, error) for each of them.
+    """
+    conn.execute("SAVEPOINT chunk")
+    try:
+        conn.executemany(sql, rows)
+        conn.execute("RELEASE chunk")
+        return []
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO chunk")
+        conn.execute("RELEASE chunk")
+    failures = []
+    for i, row in enumerate(rows):
+        try:
+            conn.execute(sql, row)
+        except sqlite3.IntegrityError as e:
+            failures.append((i, str(e)))
+    return failures
+
+
+def init_db() -> None:
+    with transaction() as conn:
+        migrations.migrate(conn)
 
 
 # ------------ Customers -------------
@@ -63,16 +179,37 @@ def add_customer(name: str, email: str, phone: str) -> int:
         return cur.lastrowid
 
 
-def list_customers() -> List[Tuple[Any, ...]]:
+def add_customers_bulk(rows: List[Tuple[str, str, str]]) -> List[Tuple[int, str]]:
+    """Insert (name, email, phone) rows; returns the rows rejected by constraints."""
+    with transaction() as conn:
+        return _insert_many(conn, "INSERT INTO customers(name, email, phone) VALUES (?,?,?)", rows)
+
+
+def list_customers() -> List[Customer]:
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _customer_row
         cur.execute("SELECT id, name, email, phone FROM customers ORDER BY id")
         return cur.fetchall()
 
 
-def get_customer(customer_id: int) -> Optional[Tuple[Any, ...]]:
+def list_customers_page(after_id: int = 0, limit: int = 50) -> List[Customer]:
+    """Up to `limit` customers with id > after_id (keyset pagination)."""
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _customer_row
+        cur.execute("SELECT id, name, email, phone FROM customers WHERE id>? ORDER BY id LIMIT ?", (after_id, limit))
+        return cur.fetchall()
+
+
+def iter_customers(batch_size: int = 500) -> Iterator[Customer]:
+    return _iter_pages(list_customers_page, batch_size)
+
+
+def get_customer(customer_id: int) -> Optional[Customer]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = _customer_row
         cur.execute("SELECT id, name, email, phone FROM customers WHERE id=?", (customer_id,))
         return cur.fetchone()
 
@@ -88,9 +225,41 @@ def add_vehicle(brand: str, model: str, year: int, daily_rate: float, vehicle_ty
         return cur.lastrowid
 
 
-def list_vehicles(only_available: bool = False) -> List[Tuple[Any, ...]]:
+# per-row INSERT triggers on vehicles -> the set-based statement that does the same work
+# for every vehicle with id > ?
+_VEHICLE_INSERT_TRIGGERS = {
+    "vehicles_fts_ai": """INSERT INTO vehicles_fts(rowid, brand, model, vehicle_type)
+                          SELECT id, brand, model, vehicle_type FROM vehicles WHERE id > ?""",
+    "vehicles_report_ai": """INSERT INTO report_by_type(vehicle_type, vehicles)
+                             SELECT vehicle_type, COUNT(*) FROM vehicles WHERE id > ? GROUP BY vehicle_type
+                             ON CONFLICT(vehicle_type) DO UPDATE SET vehicles = vehicles + excluded.vehicles""",
+}
+
+
+def add_vehicles_bulk(rows: List[Tuple[str, str, int, float, str]]) -> List[Tuple[int, str]]:
+    """Insert (brand, model, year, daily_rate, vehicle_type) rows; returns the rejected ones."""
+    with transaction() as conn:
+        # Firing the insert triggers per row dominates the load time, so within this
+        # transaction they are swapped out and the new id range processed in one go.
+        triggers = conn.execute(
+            f"""SELECT name, sql FROM sqlite_master WHERE type='trigger'
+                AND name IN ({",".join("?" * len(_VEHICLE_INSERT_TRIGGERS))})""",
+            list(_VEHICLE_INSERT_TRIGGERS)).fetchall()
+        (last_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vehicles").fetchone()
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+        failures = _insert_many(conn, """INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type, available)
+                                         VALUES (?,?,?,?,?,1)""", rows)
+        for name, sql in triggers:
+            conn.execute(_VEHICLE_INSERT_TRIGGERS[name], (last_id,))
+            conn.execute(sql)
+        return failures
+
+
+def list_vehicles(only_available: bool = False) -> List[Vehicle]:
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _vehicle_row
         if only_available:
             cur.execute("""SELECT id, brand, model, year, daily_rate, vehicle_type, available
                            FROM vehicles WHERE available=1 ORDER BY id""")
@@ -100,10 +269,59 @@ def list_vehicles(only_available: bool = False) -> List[Tuple[Any, ...]]:
         return cur.fetchall()
 
 
-def search_vehicles(keyword: str) -> List[Tuple[Any, ...]]:
+def list_vehicles_page(after_id: int = 0, limit: int = 50, only_available: bool = False) -> List[Vehicle]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = _vehicle_row
+        if only_available:
+            cur.execute("""SELECT id, brand, model, year, daily_rate, vehicle_type, available
+                           FROM vehicles WHERE available=1 AND id>? ORDER BY id LIMIT ?""", (after_id, limit))
+        else:
+            cur.execute("""SELECT id, brand, model, year, daily_rate, vehicle_type, available
+                           FROM vehicles WHERE id>? ORDER BY id LIMIT ?""", (after_id, limit))
+        return cur.fetchall()
+
+
+def iter_vehicles(only_available: bool = False, batch_size: int = 500) -> Iterator[Vehicle]:
+    return _iter_pages(lambda after_id, limit: list_vehicles_page(after_id, limit, only_available), batch_size)
+
+
+def has_vehicle_fts() -> bool:
+    if DB_NAME not in _vehicle_fts:
+        with get_conn() as conn:
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='vehicles_fts'").fetchone()
+        _vehicle_fts[DB_NAME] = row is not None
+    return _vehicle_fts[DB_NAME]
+
+
+def search_vehicles(keyword: str) -> List[Vehicle]:
+    """Match every word of `keyword` as a prefix of brand/model/type, best matches first.
+
+    Falls back to a substring LIKE scan when SQLite was built without FTS5.
+    """
+    tokens = re.findall(r"\w+", keyword.lower())
+    if tokens and has_vehicle_fts():
+        return _search_vehicles_fts(tokens)
+    return _search_vehicles_like(keyword)
+
+
+def _search_vehicles_fts(tokens: List[str]) -> List[Vehicle]:
+    query = " ".join(f'"{t}"*' for t in tokens)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = _vehicle_row
+        cur.execute("""SELECT v.id, v.brand, v.model, v.year, v.daily_rate, v.vehicle_type, v.available
+                       FROM vehicles_fts JOIN vehicles v ON v.id = vehicles_fts.rowid
+                       WHERE vehicles_fts MATCH ?
+                       ORDER BY vehicles_fts.rank, v.id""", (query,))
+        return cur.fetchall()
+
+
+def _search_vehicles_like(keyword: str) -> List[Vehicle]:
     like = f"%{keyword.lower()}%"
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _vehicle_row
         cur.execute("""SELECT id, brand, model, year, daily_rate, vehicle_type, available
                        FROM vehicles
                        WHERE lower(brand) LIKE ? OR lower(model) LIKE ? OR lower(vehicle_type) LIKE ?
@@ -111,9 +329,10 @@ def search_vehicles(keyword: str) -> List[Tuple[Any, ...]]:
         return cur.fetchall()
 
 
-def get_vehicle(vehicle_id: int) -> Optional[Tuple[Any, ...]]:
+def get_vehicle(vehicle_id: int) -> Optional[Vehicle]:
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _vehicle_row
         cur.execute("""SELECT id, brand, model, year, daily_rate, vehicle_type, available
                        FROM vehicles WHERE id=?""", (vehicle_id,))
         return cur.fetchone()
@@ -130,15 +349,92 @@ def add_rental(customer_id: int, vehicle_id: int, start_date: date, end_date: da
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
-            INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, total_cost, status)
-            VALUES (?,?,?,?,?, 'active')
-        """, (customer_id, vehicle_id, start_date.isoformat(), end_date.isoformat(), total_cost))
+            INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, start_day, end_day, total_cost, status)
+            VALUES (?,?,?,?,?,?,?, 'active')
+        """, (customer_id, vehicle_id, start_date.isoformat(), end_date.isoformat(),
+              start_date.toordinal(), end_date.toordinal(), total_cost))
         return cur.lastrowid
 
 
-def list_rentals(status: Optional[str] = None) -> List[Tuple[Any, ...]]:
+# per-row triggers on rentals -> set-based statements doing the same work for every
+# rental with id > ? (already in its final status)
+_RENTAL_INSERT_TRIGGERS = {
+    "rentals_report_ai": [
+        """INSERT INTO report_by_type(vehicle_type, rentals, active, revenue, rented_days)
+           SELECT v.vehicle_type, COUNT(*), SUM(r.status = 'active'), TOTAL(r.total_cost),
+                  SUM(r.end_day - r.start_day + 1)
+           FROM rentals r JOIN vehicles v ON v.id = r.vehicle_id
+           WHERE r.id > ? AND r.status <> 'cancelled' GROUP BY v.vehicle_type
+           ON CONFLICT(vehicle_type) DO UPDATE SET
+               rentals = rentals + excluded.rentals, active = active + excluded.active,
+               revenue = revenue + excluded.revenue, rented_days = rented_days + excluded.rented_days""",
+        """INSERT INTO report_by_customer(customer_id, rentals, revenue)
+           SELECT customer_id, COUNT(*), TOTAL(total_cost) FROM rentals
+           WHERE id > ? AND status <> 'cancelled' GROUP BY customer_id
+           ON CONFLICT(customer_id) DO UPDATE SET
+               rentals = rentals + excluded.rentals, revenue = revenue + excluded.revenue""",
+        """INSERT INTO report_daily(day, rentals_started, revenue)
+           SELECT start_day, COUNT(*), TOTAL(total_cost) FROM rentals
+           WHERE id > ? AND status <> 'cancelled' GROUP BY start_day
+           ON CONFLICT(day) DO UPDATE SET
+               rentals_started = rentals_started + excluded.rentals_started, revenue = revenue + excluded.revenue""",
+        """INSERT INTO report_daily(day, vehicles_out)
+           SELECT r.start_day + o.n AS day, COUNT(*) FROM rentals r
+           JOIN report_day_offsets o ON o.n <= r.end_day - r.start_day
+           WHERE r.id > ? AND r.status <> 'cancelled' GROUP BY day
+           ON CONFLICT(day) DO UPDATE SET vehicles_out = vehicles_out + excluded.vehicles_out""",
+    ],
+    "rentals_report_finish": [],  # covered above: rows arrive in their final status
+    "rentals_report_cancel": [],
+    "rentals_event_created": [
+        f"""INSERT INTO rental_events(rental_id, vehicle_id, event, recorded_at)
+            SELECT id, vehicle_id, 'created', {migrations.SQL_NOW} FROM rentals WHERE id > ? ORDER BY id""",
+    ],
+    "rentals_event_closed": [
+        f"""INSERT INTO rental_events(rental_id, vehicle_id, event, recorded_at)
+            SELECT id, vehicle_id, CASE status WHEN 'finished' THEN 'returned' ELSE 'cancelled' END,
+                   {migrations.SQL_NOW}
+            FROM rentals WHERE id > ? AND status <> 'active' ORDER BY id""",
+    ],
+}
+
+
+def add_rentals_bulk(rows: List[Tuple[int, int, int, int, float, str]]) -> None:
+    """Load (customer_id, vehicle_id, start_day, end_day, total_cost, status) rows as they are.
+
+    For imports and generated data: booking rules (overlaps, availability) are the
+    caller's job. Rollups, the event log and the vehicles' available flags end up as
+    if each rental had been booked and then finished/cancelled.
+    """
+    with transaction() as conn:
+        triggers = conn.execute(
+            f"""SELECT name, sql FROM sqlite_master WHERE type='trigger'
+                AND name IN ({",".join("?" * len(_RENTAL_INSERT_TRIGGERS))})""",
+            list(_RENTAL_INSERT_TRIGGERS)).fetchall()
+        (last_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM rentals").fetchone()
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.executemany(
+            """INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, start_day, end_day, total_cost, status)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            ((c, v, date.fromordinal(s).isoformat(), date.fromordinal(e).isoformat(), s, e, cost, status)
+             for c, v, s, e, cost, status in rows))
+        dropped = dict(triggers)
+        # in _RENTAL_INSERT_TRIGGERS order, so 'created' events precede 'returned'/'cancelled'
+        for name, statements in _RENTAL_INSERT_TRIGGERS.items():
+            if name in dropped:
+                for catch_up in statements:
+                    conn.execute(catch_up, (last_id,))
+                conn.execute(dropped[name])
+        conn.execute("""UPDATE vehicles SET available = 0
+                        WHERE id IN (SELECT vehicle_id FROM rentals WHERE id > ? AND status = 'active')""",
+                     (last_id,))
+
+
+def list_rentals(status: Optional[str] = None) -> List[Rental]:
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _rental_row
         if status:
             cur.execute("""SELECT id, customer_id, vehicle_id, start_date, end_date, total_cost, status
                            FROM rentals WHERE status=? ORDER BY id""", (status,))
@@ -148,30 +444,120 @@ def list_rentals(status: Optional[str] = None) -> List[Tuple[Any, ...]]:
         return cur.fetchall()
 
 
-def get_rental(rental_id: int) -> Optional[Tuple[Any, ...]]:
+def list_rentals_page(after_id: int = 0, limit: int = 50, status: Optional[str] = None) -> List[Rental]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = _rental_row
+        if status:
+            cur.execute("""SELECT id, customer_id, vehicle_id, start_date, end_date, total_cost, status
+                           FROM rentals WHERE status=? AND id>? ORDER BY id LIMIT ?""", (status, after_id, limit))
+        else:
+            cur.execute("""SELECT id, customer_id, vehicle_id, start_date, end_date, total_cost, status
+                           FROM rentals WHERE id>? ORDER BY id LIMIT ?""", (after_id, limit))
+        return cur.fetchall()
+
+
+def iter_rentals(status: Optional[str] = None, batch_size: int = 500) -> Iterator[Rental]:
+    return _iter_pages(lambda after_id, limit: list_rentals_page(after_id, limit, status), batch_size)
+
+
+def get_rental(rental_id: int) -> Optional[Rental]:
     with get_conn() as conn:
         cur = conn.cursor()
+        cur.row_factory = _rental_row
         cur.execute("""SELECT id, customer_id, vehicle_id, start_date, end_date, total_cost, status
                        FROM rentals WHERE id=?""", (rental_id,))
         return cur.fetchone()
 
 
-def finish_rental(rental_id: int) -> None:
+def active_rental_days() -> Tuple[int, List[Tuple[int, int, int, int]]]:
+    """(newest rental_events id, (id, vehicle_id, start_day, end_day) for every active rental).
+
+    Both come from one read snapshot, so rental_changes_since() with that id picks up
+    exactly the changes made after the list was read.
+    """
     with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("UPDATE rentals SET status='finished' WHERE id=?", (rental_id,))
+        conn.execute("BEGIN")
+        (head,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM rental_events").fetchone()
+        rows = conn.execute("""SELECT id, vehicle_id, start_day, end_day
+                               FROM rentals WHERE status='active' ORDER BY id""").fetchall()
+    return head, rows
+
+
+def rental_changes_since(event_id: int) -> List[Tuple[int, int, int, str, int, int]]:
+    """(event id, rental_id, vehicle_id, event, start_day, end_day) for each rental event after `event_id`."""
+    with get_conn() as conn:
+        return conn.execute("""SELECT e.id, e.rental_id, e.vehicle_id, e.event, r.start_day, r.end_day
+                               FROM rental_events e JOIN rentals r ON r.id = e.rental_id
+                               WHERE e.id > ? ORDER BY e.id""", (event_id,)).fetchall()
+
+
+def close_rental(rental_id: int, status: str = 'finished') -> Optional[int]:
+    """Finish or cancel an active rental in one transaction.
+
+    The vehicle's available flag is set again once it has no other active rental.
+    Returns the vehicle id, or None if the rental was not active (any more).
+    """
+    with transaction() as conn:
+        row = conn.execute("UPDATE rentals SET status=? WHERE id=? AND status='active' RETURNING vehicle_id",
+                           (status, rental_id)).fetchone()
+        if row is None:
+            return None
+        conn.execute("""UPDATE vehicles SET available =
+                            NOT EXISTS(SELECT 1 FROM rentals WHERE vehicle_id=? AND status='active')
+                        WHERE id=?""", (row[0], row[0]))
+        return row[0]
 
 
 def has_overlapping_rental(vehicle_id: int, start_date: date, end_date: date) -> bool:
     with get_conn() as conn:
         cur = conn.cursor()
-        # Check for any active rental that overlaps the requested period
+        # Check for any active rental that overlaps the requested period.
+        # Plain comparisons on the ordinal columns let SQLite range-scan the index.
+        cur.execute("""
+            SELECT EXISTS(
+                SELECT 1 FROM rentals
+                WHERE vehicle_id=? AND status='active' AND start_day <= ? AND end_day >= ?
+            )
+        """, (vehicle_id, end_date.toordinal(), start_date.toordinal()))
+        (found,) = cur.fetchone()
+        return bool(found)
+
+
+def book_rental(customer_id: int, vehicle_id: int, start_date: date, end_date: date,
+                quote: Callable[[str, float], float]) -> int:
+    """Validate and book a rental in one BEGIN IMMEDIATE unit of work.
+
+    `quote(vehicle_type, daily_rate)` prices the rental once the vehicle row is read.
+    Raises BookingRejected if the customer/vehicle is missing or an active rental
+    overlaps the period. A vehicle may hold several active rentals for disjoint
+    periods; its available flag only says whether it has any.
+    """
+    with transaction() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT EXISTS(SELECT 1 FROM customers WHERE id=?), v.daily_rate, v.vehicle_type
+            FROM (SELECT 1) LEFT JOIN vehicles v ON v.id=?
+        """, (customer_id, vehicle_id))
+        has_customer, daily_rate, vehicle_type = cur.fetchone()
+        if not has_customer:
+            raise BookingRejected(f"Customer {customer_id} does not exist.")
+        if daily_rate is None:
+            raise BookingRejected(f"Vehicle {vehicle_id} does not exist.")
+        total_cost = quote(vehicle_type, float(daily_rate))
+        start_day, end_day = start_date.toordinal(), end_date.toordinal()
+        # The overlap guard lives in the INSERT itself, so no other writer can slip in between
         cur.execute("""
-            SELECT COUNT(*)
-            FROM rentals
-            WHERE vehicle_id=? AND status='active' AND NOT (
-                date(end_date) < date(?) OR date(start_date) > date(?)
+            INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, start_day, end_day, total_cost, status)
+            SELECT ?,?,?,?,?,?,?, 'active'
+            WHERE NOT EXISTS (
+                SELECT 1 FROM rentals
+                WHERE vehicle_id=? AND status='active' AND start_day <= ? AND end_day >= ?
             )
-        """, (vehicle_id, start_date.isoformat(), end_date.isoformat()))
-        (count,) = cur.fetchone()
-        return count > 0
+        """, (customer_id, vehicle_id, start_date.isoformat(), end_date.isoformat(), start_day, end_day,
+              total_cost, vehicle_id, end_day, start_day))
+        if cur.rowcount == 0:
+            raise BookingRejected("Vehicle already has an overlapping active rental.")
+        rental_id = cur.lastrowid
+        cur.execute("UPDATE vehicles SET available=0 WHERE id=?", (vehicle_id,))
+        return rental_id
@@ -1,85 +1,239 @@
 
 from __future__ import annotations
-from datetime import date, timedelta
-from typing import Optional, List, Tuple, Any
+import math
+import threading
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Iterator, List, Tuple, Any
 
 import repository as repo
-from pricing import PricingContext
+from availability import AvailabilityIndex
+from cache import TTLCache
+import history
+from models import Customer, Rental, Vehicle
+import pricing
+import reports
 
 
 class ValidationError(Exception):
     pass
 
 
+MAX_PAGE_SIZE = 1000
+RENTAL_STATUSES = ('active', 'finished', 'cancelled')
+
+
+def _check_status(status: Optional[str]) -> None:
+    if status and status not in RENTAL_STATUSES:
+        raise ValidationError("Status must be 'active', 'finished' or 'cancelled'.")
+
+
+def _check_page(after_id: int, limit: int) -> None:
+    if after_id < 0:
+        raise ValidationError("after_id cannot be negative.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"Page size must be between 1 and {MAX_PAGE_SIZE}.")
+
+
+def validate_customer(name: str, email: str, phone: str) -> Tuple[str, str, str]:
+    """Check a customer's fields and return them normalized for storage."""
+    if not name or not email or not phone:
+        raise ValidationError("Name, email, and phone are required.")
+    return name.strip(), email.strip().lower(), phone.strip()
+
+
+def validate_vehicle(brand: str, model: str, year: int, daily_rate: float,
+                     vehicle_type: str) -> Tuple[str, str, int, float, str]:
+    """Check a vehicle's fields and return them normalized for storage."""
+    if not all([brand, model, vehicle_type]):
+        raise ValidationError("Brand, model, and vehicle_type are required.")
+    if year < 1980 or year > date.today().year + 1:
+        raise ValidationError("Year is out of valid range.")
+    if not math.isfinite(daily_rate):
+        raise ValidationError("Daily rate must be a finite number.")
+    if daily_rate <= 0:
+        raise ValidationError("Daily rate must be positive.")
+    return brand.strip(), model.strip(), year, float(daily_rate), vehicle_type.strip()
+
+
 class CarRentalService:
-    def __init__(self):
+    def __init__(self, cache_size: int = 10_000, cache_ttl: float = 30.0, snapshot_every: int = 1000):
         repo.init_db()
+        self._availability: Optional[AvailabilityIndex] = None
+        self._availability_event = 0  # last rental_events id applied to the index
+        self._availability_lock = threading.Lock()
+        # read-through cache of Customer/Vehicle/Rental objects keyed by (kind, id)
+        self._entities = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # take an availability snapshot after this many rental events from this service
+        self.snapshot_every = snapshot_every
+        self._events_since_snapshot = 0
+
+    # -------- Cached lookups --------
+    def get_customer(self, customer_id: int) -> Optional[Customer]:
+        return self._entities.get_or_load(("customer", customer_id), lambda: repo.get_customer(customer_id))
+
+    def get_vehicle(self, vehicle_id: int) -> Optional[Vehicle]:
+        return self._entities.get_or_load(("vehicle", vehicle_id), lambda: repo.get_vehicle(vehicle_id))
+
+    def get_rental(self, rental_id: int) -> Optional[Rental]:
+        return self._entities.get_or_load(("rental", rental_id), lambda: repo.get_rental(rental_id))
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._entities.stats()
 
     # -------- Customers --------
     def add_customer(self, name: str, email: str, phone: str) -> int:
-        if not name or not email or not phone:
-            raise ValidationError("Name, email, and phone are required.")
-        return repo.add_customer(name.strip(), email.strip().lower(), phone.strip())
+        return repo.add_customer(*validate_customer(name, email, phone))
 
-    def list_customers(self) -> List[Tuple[Any, ...]]:
+    def list_customers(self) -> List[Customer]:
         return repo.list_customers()
 
+    def list_customers_page(self, after_id: int = 0, limit: int = 50) -> List[Customer]:
+        _check_page(after_id, limit)
+        return repo.list_customers_page(after_id, limit)
+
+    def iter_customers(self) -> Iterator[Customer]:
+        return repo.iter_customers()
+
     # -------- Vehicles --------
     def add_vehicle(self, brand: str, model: str, year: int, daily_rate: float, vehicle_type: str) -> int:
-        if not all([brand, model, vehicle_type]):
-            raise ValidationError("Brand, model, and vehicle_type are required.")
-        if year < 1980 or year > date.today().year + 1:
-            raise ValidationError("Year is out of valid range.")
-        if daily_rate <= 0:
-            raise ValidationError("Daily rate must be positive.")
-        return repo.add_vehicle(brand.strip(), model.strip(), year, float(daily_rate), vehicle_type.strip())
-
-    def list_vehicles(self, only_available: bool = False) -> List[Tuple[Any, ...]]:
+        return repo.add_vehicle(*validate_vehicle(brand, model, year, daily_rate, vehicle_type))
+
+    def list_vehicles(self, only_available: bool = False) -> List[Vehicle]:
         return repo.list_vehicles(only_available=only_available)
 
-    def search_vehicles(self, keyword: str) -> List[Tuple[Any, ...]]:
+    def list_vehicles_page(self, after_id: int = 0, limit: int = 50,
+                           only_available: bool = False) -> List[Vehicle]:
+        _check_page(after_id, limit)
+        return repo.list_vehicles_page(after_id, limit, only_available=only_available)
+
+    def iter_vehicles(self, only_available: bool = False) -> Iterator[Vehicle]:
+        return repo.iter_vehicles(only_available=only_available)
+
+    def search_vehicles(self, keyword: str) -> List[Vehicle]:
         return repo.search_vehicles(keyword.strip())
 
     # -------- Rentals --------
     def create_rental(self, customer_id: int, vehicle_id: int, start: date, end: date) -> int:
-        # validate foreign keys
-        customer = repo.get_customer(customer_id)
-        if not customer:
-            raise ValidationError(f"Customer {customer_id} does not exist.")
-        vehicle = repo.get_vehicle(vehicle_id)
-        if not vehicle:
-            raise ValidationError(f"Vehicle {vehicle_id} does not exist.")
-
-        _, brand, model, year, daily_rate, vehicle_type, available = vehicle
-
         if start > end:
             raise ValidationError("Start date cannot be after end date.")
         if (end - start).days + 1 <= 0:
             raise ValidationError("Invalid rental duration.")
-        if not available:
-            raise ValidationError("Vehicle is currently not available.")
-        if repo.has_overlapping_rental(vehicle_id, start, end):
-            raise ValidationError("Vehicle already has an overlapping active rental.")
 
-        days = (end - start).days + 1
-        strategy = PricingContext(vehicle_type).choose(start, end)
-        total_cost = strategy.compute_cost(days, float(daily_rate), start, end)
+        def quote(vehicle_type: str, daily_rate: float) -> float:
+            return pricing.quote(vehicle_type, daily_rate, start, end)
 
-        rental_id = repo.add_rental(customer_id, vehicle_id, start, end, total_cost)
-        repo.set_vehicle_availability(vehicle_id, False)
+        # customer/vehicle/availability/overlap checks and the writes share one transaction
+        try:
+            rental_id = repo.book_rental(customer_id, vehicle_id, start, end, quote)
+        except repo.BookingRejected as e:
+            raise ValidationError(str(e)) from e
+        self._entities.invalidate(("vehicle", vehicle_id))
+        self._note_event()
         return rental_id
 
-    def return_vehicle(self, rental_id: int) -> None:
-        rental = repo.get_rental(rental_id)
+    def quote_rental(self, vehicle_id: int, start: date, end: date) -> float:
+        if start > end:
+            raise ValidationError("Start date cannot be after end date.")
+        vehicle = self.get_vehicle(vehicle_id)
+        if not vehicle:
+            raise ValidationError(f"Vehicle {vehicle_id} does not exist.")
+        return pricing.quote(vehicle.vehicle_type, float(vehicle.daily_rate), start, end)
+
+    def _close_rental(self, rental_id: int, status: str) -> None:
+        rental = self.get_rental(rental_id)
         if not rental:
             raise ValidationError(f"Rental {rental_id} does not exist.")
-        _id, customer_id, vehicle_id, start_date, end_date, total_cost, status = rental
-        if status != 'active':
-            raise ValidationError("Rental is already finished.")
-        repo.finish_rental(rental_id)
-        repo.set_vehicle_availability(vehicle_id, True)
-
-    def list_rentals(self, status: Optional[str] = None) -> List[Tuple[Any, ...]]:
-        if status and status not in ('active', 'finished'):
-            raise ValidationError("Status must be 'active' or 'finished'.")
+        # the status change, the availability flag and the event are one transaction
+        vehicle_id = repo.close_rental(rental_id, status) if rental.status == 'active' else None
+        if vehicle_id is None:
+            self._entities.invalidate(("rental", rental_id))
+            raise ValidationError(f"Rental {rental_id} is no longer active.")
+        self._entities.invalidate(("rental", rental_id), ("vehicle", vehicle_id))
+        self._note_event()
+
+    def return_vehicle(self, rental_id: int) -> None:
+        self._close_rental(rental_id, 'finished')
+
+    def cancel_rental(self, rental_id: int) -> None:
+        """Cancel an active rental: frees the vehicle and removes it from revenue reports."""
+        self._close_rental(rental_id, 'cancelled')
+
+    def list_rentals(self, status: Optional[str] = None) -> List[Rental]:
+        _check_status(status)
         return repo.list_rentals(status=status)
+
+    def list_rentals_page(self, after_id: int = 0, limit: int = 50,
+                          status: Optional[str] = None) -> List[Rental]:
+        _check_status(status)
+        _check_page(after_id, limit)
+        return repo.list_rentals_page(after_id, limit, status=status)
+
+    def iter_rentals(self, status: Optional[str] = None) -> Iterator[Rental]:
+        _check_status(status)
+        return repo.iter_rentals(status=status)
+
+    # -------- Event log --------
+    def _note_event(self) -> None:
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self.snapshot_every:
+            self.take_availability_snapshot()
+
+    def take_availability_snapshot(self) -> int:
+        self._events_since_snapshot = 0
+        return history.take_snapshot()
+
+    def rental_history(self, rental_id: int) -> List[history.RentalEvent]:
+        return history.rental_events(rental_id)
+
+    def fleet_state_at(self, when: datetime) -> history.FleetState:
+        """Which rentals were open (and so which vehicles were out) at `when`."""
+        return history.fleet_state_at(when.timestamp())
+
+    # -------- Availability by date range --------
+    def _availability_index(self) -> AvailabilityIndex:
+        # Built from the active rentals on first use, then brought up to date from the
+        # rental event log before each query, so bulk loads and other writers are seen too.
+        with self._availability_lock:
+            if self._availability is None:
+                head, rows = repo.active_rental_days()
+                self._availability = AvailabilityIndex()
+                self._availability.load(rows)
+                self._availability_event = head
+            else:
+                for event_id, rental_id, vehicle_id, event, start, end in \
+                        repo.rental_changes_since(self._availability_event):
+                    if event == 'created':
+                        self._availability.add(rental_id, vehicle_id, start, end)
+                    else:
+                        self._availability.remove(rental_id)
+                    self._availability_event = event_id
+            return self._availability
+
+    def is_vehicle_free(self, vehicle_id: int, start: date, end: date) -> bool:
+        """True if no active rental of the vehicle overlaps [start, end], i.e. it can be booked."""
+        if start > end:
+            raise ValidationError("Start date cannot be after end date.")
+        return self._availability_index().is_free(vehicle_id, start.toordinal(), end.toordinal())
+
+    def find_available_vehicles(self, start: date, end: date) -> List[Vehicle]:
+        """Vehicles with no active rental overlapping [start, end], whatever they hold for other dates."""
+        if start > end:
+            raise ValidationError("Start date cannot be after end date.")
+        index = self._availability_index()
+        s, e = start.toordinal(), end.toordinal()
+        return [v for v in repo.list_vehicles() if index.is_free(v.id, s, e)]
+
+    # -------- Reports (served from the rollup tables) --------
+    def revenue_by_vehicle_type(self) -> List[reports.VehicleTypeReport]:
+        return reports.revenue_by_vehicle_type()
+
+    def daily_utilization(self, start: date, end: date) -> List[reports.DailyUtilization]:
+        if start > end:
+            raise ValidationError("Start date cannot be after end date.")
+        if (end - start).days >= 366:
+            raise ValidationError("Utilization reports cover at most a year at a time.")
+        return reports.daily_utilization(start, end)
+
+    def top_customers(self, limit: int = 10) -> List[reports.CustomerRevenue]:
+        _check_page(0, limit)
+        return reports.top_customers(limit)
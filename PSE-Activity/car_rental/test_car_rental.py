@@ -0,0 +1,1078 @@
+
+import asyncio
+import gzip
+import http.client
+import io
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import api
+import bulk
+from async_service import AsyncCarRentalService
+import cli
+import datagen
+import history
+import metrics
+import migrations
+from availability import AvailabilityIndex
+from cache import TTLCache
+from models import SUV, Customer, OtherVehicle, Rental
+import repository as repo
+import pricing
+import reports
+from pricing import (PricingContext, QuoteCache, StandardPricing, WeekendDiscountPricing,
+                     count_days, quote_batch)
+from pool import ConnectionPool, PoolClosedError, PoolTimeoutError
+from services import CarRentalService, ValidationError
+
+HAS_FTS5 = migrations.fts5_available(sqlite3.connect(":memory:").cursor())
+
+
+class TempDBTestCase(unittest.TestCase):
+    pool_size = 3
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "test.db")
+        repo.configure(db_name=self.db_path, pool_size=self.pool_size)
+        self.service = CarRentalService()
+
+    def tearDown(self):
+        repo.close_pool()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class TestConnectionPool(TempDBTestCase):
+    def test_connections_are_reused(self):
+        for _ in range(20):
+            self.service.list_vehicles()
+        self.assertEqual(repo.get_pool().open_connections, 1)
+
+    def test_broken_connection_is_replaced(self):
+        pool = repo.get_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()  # simulate a dead connection sitting in the pool
+        self.assertEqual(self.service.list_customers(), [])
+        self.assertEqual(pool.open_connections, 1)
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = ConnectionPool(self.db_path, size=1, timeout=0.05)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+        pool.release(held)
+        pool.close()
+
+    def test_close_pool(self):
+        pool = repo.get_pool()
+        pool.close()
+        with self.assertRaises(PoolClosedError):
+            pool.acquire()
+        self.assertEqual(pool.open_connections, 0)
+
+    def test_failed_write_is_rolled_back(self):
+        self.service.add_customer("Alice", "alice@example.com", "123")
+        with self.assertRaises(Exception):
+            self.service.add_customer("Alice 2", "alice@example.com", "456")
+        self.assertEqual(len(self.service.list_customers()), 1)
+
+
+class TestOpenPerCall(TempDBTestCase):
+    pool_size = 0
+
+    def test_rental_round_trip_without_pool(self):
+        cid = self.service.add_customer("Bob", "bob@example.com", "123")
+        vid = self.service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy")
+        rid = self.service.create_rental(cid, vid, date(2025, 1, 6), date(2025, 1, 8))
+        self.assertIsNone(repo.get_pool())
+        with self.assertRaises(ValidationError):
+            self.service.create_rental(cid, vid, date(2025, 1, 7), date(2025, 1, 9))
+        self.service.return_vehicle(rid)
+        self.assertEqual(self.service.list_rentals(status="finished")[0].id, rid)
+
+
+class TestTransactionalBooking(TempDBTestCase):
+    pool_size = 8
+
+    def setUp(self):
+        super().setUp()
+        self.cid = self.service.add_customer("Carol", "carol@example.com", "123")
+        self.vid = self.service.add_vehicle("Nissan", "X-Trail", 2022, 80.0, "SUV")
+
+    def test_rejections_are_validation_errors(self):
+        start = date(2025, 1, 6)
+        with self.assertRaisesRegex(ValidationError, "Customer 999"):
+            self.service.create_rental(999, self.vid, start, start)
+        with self.assertRaisesRegex(ValidationError, "Vehicle 999"):
+            self.service.create_rental(self.cid, 999, start, start)
+        self.service.create_rental(self.cid, self.vid, start, start + timedelta(days=1))
+        with self.assertRaisesRegex(ValidationError, "overlapping"):
+            self.service.create_rental(self.cid, self.vid, start, start)
+        self.assertEqual(len(self.service.list_rentals()), 1)
+
+    def test_overlap_guard_in_insert(self):
+        start = date(2025, 1, 6)
+        self.service.create_rental(self.cid, self.vid, start, start + timedelta(days=4))
+        with self.assertRaisesRegex(ValidationError, "overlapping"):
+            self.service.create_rental(self.cid, self.vid, start + timedelta(days=4), start + timedelta(days=6))
+        self.assertEqual(len(self.service.list_rentals()), 1)
+
+    def test_concurrent_bookings_never_double_book(self):
+        vehicle_ids = [self.vid] + [self.service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy")
+                                    for _ in range(3)]
+        start = date(2025, 1, 6)
+        booked, rejected = [], []
+
+        def client(n):
+            for i in range(10):
+                vid = vehicle_ids[(n + i) % len(vehicle_ids)]
+                try:
+                    booked.append(self.service.create_rental(self.cid, vid, start, start + timedelta(days=3)))
+                except ValidationError:
+                    rejected.append(vid)
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        active = self.service.list_rentals(status="active")
+        self.assertEqual(len(booked), len(vehicle_ids))
+        self.assertEqual(sorted(r.vehicle_id for r in active), sorted(vehicle_ids))
+        self.assertEqual(len(rejected), 80 - len(vehicle_ids))
+
+
+def query_plans(fn, *args, **kwargs):
+    """Run a repository function and return the EXPLAIN QUERY PLAN of every SELECT it issued."""
+    statements = []
+    pool = repo.get_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.set_trace_callback(statements.append)
+    try:
+        fn(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    return [" | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+            for sql in statements if sql.lstrip().upper().startswith("SELECT") and "FROM" in sql.upper()]
+
+
+class TestDBProfiles(TempDBTestCase):
+    def pragmas(self):
+        with repo.get_conn() as conn:
+            return tuple(conn.execute(f"PRAGMA {name}").fetchone()[0]
+                         for name in ("journal_mode", "synchronous", "busy_timeout", "foreign_keys"))
+
+    def test_profiles_apply_their_pragmas(self):
+        self.assertEqual(self.pragmas(), ("wal", 1, 5000, 1))
+        repo.configure(db_name=os.path.join(self.tmpdir, "rollback.db"), db_profile="rollback")
+        try:
+            self.assertEqual(self.pragmas(), ("delete", 2, 5000, 1))
+        finally:
+            repo.configure(db_profile="wal")
+        with self.assertRaises(ValueError):
+            repo.configure(db_profile="turbo")
+
+    def test_profile_from_environment_is_validated_at_import(self):
+        env = dict(os.environ, CAR_RENTAL_DB_PROFILE="turbo")
+        proc = subprocess.run([sys.executable, "-c", "import repository"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=env, capture_output=True, text=True)
+        self.assertNotEqual(proc.returncode, 0)
+        self.assertIn("ValueError: Unknown DB profile 'turbo'; choose from rollback, wal.", proc.stderr)
+
+    def test_wal_writer_commits_while_a_reader_holds_a_snapshot(self):
+        vid = self.service.add_vehicle("Toyota", "Corolla", 2021, 50, "Economy")
+        reader = sqlite3.connect(self.db_path)
+        try:
+            reader.execute("BEGIN")
+            self.assertEqual(reader.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0], 1)
+            repo.set_vehicle_availability(vid, False)  # would wait on the reader's lock without WAL
+            self.service.add_vehicle("Honda", "Civic", 2021, 50, "Economy")
+            self.assertEqual(reader.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0], 1)
+            reader.rollback()
+            self.assertEqual(reader.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0], 2)
+        finally:
+            reader.close()
+
+
+class TestMigrations(TempDBTestCase):
+    pool_size = 1
+
+    def test_schema_is_at_latest_version(self):
+        with repo.get_conn() as conn:
+            self.assertEqual(migrations.current_version(conn), migrations.SCHEMA_VERSION)
+        repo.init_db()  # re-running is a no-op
+        with repo.get_conn() as conn:
+            self.assertEqual(migrations.current_version(conn), migrations.SCHEMA_VERSION)
+
+    def test_upgrades_unversioned_database(self):
+        # a car_rental.db created before migrations existed: base tables, ISO dates, user_version 0
+        legacy_path = os.path.join(self.tmpdir, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        migrations.MIGRATIONS[0](conn.cursor())
+        conn.execute("INSERT INTO customers(name, email, phone) VALUES ('Dan', 'dan@example.com', '1')")
+        conn.execute("INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type) VALUES ('Ford', 'Ranger', 2023, 95, 'Truck')")
+        conn.execute("""INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, total_cost, status)
+                        VALUES (1, 1, '2024-02-27', '2024-03-02', 475, 'active')""")
+        conn.commit()
+        conn.close()
+
+        repo.configure(db_name=legacy_path)
+        repo.init_db()
+        with repo.get_conn() as conn:
+            self.assertEqual(migrations.current_version(conn), migrations.SCHEMA_VERSION)
+            days = conn.execute("SELECT start_day, end_day FROM rentals").fetchone()
+        self.assertEqual(days, (date(2024, 2, 27).toordinal(), date(2024, 3, 2).toordinal()))
+        self.assertTrue(repo.has_overlapping_rental(1, date(2024, 3, 2), date(2024, 3, 5)))
+        self.assertFalse(repo.has_overlapping_rental(1, date(2024, 3, 3), date(2024, 3, 5)))
+        (truck,) = reports.revenue_by_vehicle_type()
+        self.assertEqual((truck.vehicles, truck.rentals, truck.active, truck.revenue, truck.rented_days),
+                         (1, 1, 1, 475.0, 5))
+        self.assertEqual(reports.daily_utilization(date(2024, 3, 2), date(2024, 3, 2))[0].vehicles_out, 1)
+        self.assertEqual([e.event for e in history.rental_events(1)], ["created"])
+
+    def test_lookups_use_indexes(self):
+        cases = [
+            (repo.has_overlapping_rental, (1, date(2025, 1, 1), date(2025, 1, 5)), {}),
+            (repo.list_rentals, (), {"status": "active"}),
+            (repo.list_vehicles, (), {"only_available": True}),
+        ]
+        for fn, args, kwargs in cases:
+            plans = query_plans(fn, *args, **kwargs)
+            self.assertTrue(plans, fn.__name__)
+            for plan in plans:
+                self.assertIn("USING", plan, f"{fn.__name__}: {plan}")
+                self.assertNotRegex(plan, r"SCAN (rentals|vehicles|customers)\b", fn.__name__)
+        # the overlap check must range-scan the day ordinals, not just match vehicle/status
+        (plan,) = query_plans(repo.has_overlapping_rental, 1, date(2025, 1, 1), date(2025, 1, 5))
+        self.assertIn("start_day<", plan)
+
+
+class TestAvailabilityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AvailabilityIndex()
+        self.index.load([(1, 7, 10, 12), (2, 7, 20, 25), (3, 8, 0, 100)])
+
+    def test_is_free(self):
+        self.assertTrue(self.index.is_free(7, 13, 19))
+        self.assertTrue(self.index.is_free(7, 26, 30))
+        self.assertTrue(self.index.is_free(7, 1, 9))
+        self.assertFalse(self.index.is_free(7, 12, 13))
+        self.assertFalse(self.index.is_free(7, 5, 30))
+        self.assertFalse(self.index.is_free(7, 21, 22))
+        self.assertTrue(self.index.is_free(9, 0, 1000))
+
+    def test_add_remove_and_free_vehicles(self):
+        self.index.add(4, 7, 14, 16)
+        self.assertFalse(self.index.is_free(7, 15, 15))
+        self.assertEqual(self.index.free_vehicles([7, 8, 9], 13, 19), [9])
+        self.index.remove(4)
+        self.index.remove(3)
+        self.assertEqual(self.index.free_vehicles([7, 8, 9], 13, 19), [7, 8, 9])
+        self.assertEqual(len(self.index), 2)
+
+
+class TestDateRangeAvailability(TempDBTestCase):
+    def test_service_keeps_index_in_sync(self):
+        cid = self.service.add_customer("Erin", "erin@example.com", "1")
+        v1 = self.service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy")
+        v2 = self.service.add_vehicle("Ford", "Ranger", 2023, 95.0, "Truck")
+        jan6, jan10 = date(2025, 1, 6), date(2025, 1, 10)
+        rid = self.service.create_rental(cid, v1, jan6, jan10)  # before the index is built
+        self.assertEqual([v.id for v in self.service.find_available_vehicles(jan10, jan10)], [v2])
+        feb = self.service.create_rental(cid, v2, date(2025, 2, 1), date(2025, 2, 3))  # after
+        self.assertFalse(self.service.is_vehicle_free(v2, date(2025, 2, 3), date(2025, 2, 9)))
+        self.assertTrue(self.service.is_vehicle_free(v2, jan6, jan10))  # booked only for February
+        jan = self.service.create_rental(cid, v2, jan6, jan10)
+        self.assertFalse(self.service.is_vehicle_free(v2, jan6, jan10))
+        self.service.return_vehicle(rid)
+        self.assertTrue(self.service.is_vehicle_free(v1, jan6, jan10))
+        self.service.cancel_rental(feb)
+        self.assertTrue(self.service.is_vehicle_free(v2, date(2025, 2, 3), date(2025, 2, 9)))
+        self.assertFalse(self.service.get_vehicle(v2).available)  # January is still booked
+        self.service.return_vehicle(jan)
+        self.assertTrue(self.service.get_vehicle(v2).available)
+        with self.assertRaises(ValidationError):
+            self.service.find_available_vehicles(jan10, jan6)
+
+    def test_search_agrees_with_booking(self):
+        cid = self.service.add_customer("Finn", "finn@example.com", "2")
+        vids = [self.service.add_vehicle("Kia", f"Rio {i}", 2022, 40.0 + i, "Economy") for i in range(4)]
+        march = (date(2025, 3, 1), date(2025, 3, 5))
+        self.service.create_rental(cid, vids[0], *march)
+        self.service.create_rental(cid, vids[1], date(2025, 6, 1), date(2025, 6, 2))  # a later booking
+        free = self.service.find_available_vehicles(*march)
+        self.assertEqual([v.id for v in free], vids[1:])
+        self.assertFalse(self.service.is_vehicle_free(vids[0], *march))
+        with self.assertRaises(ValidationError):
+            self.service.create_rental(cid, vids[0], *march)
+        for v in free:
+            self.assertTrue(self.service.is_vehicle_free(v.id, *march))
+            self.service.create_rental(cid, v.id, *march)
+        self.assertEqual(self.service.find_available_vehicles(*march), [])
+
+    def test_index_sees_other_writers(self):
+        cid = self.service.add_customer("Gus", "gus@example.com", "3")
+        vids = [self.service.add_vehicle("Fiat", f"Panda {i}", 2022, 30.0, "Economy") for i in range(3)]
+        when = (date(2025, 4, 1), date(2025, 4, 2))
+        self.assertEqual(len(self.service.find_available_vehicles(*when)), 3)  # index built
+        day = when[0].toordinal()
+        repo.add_rentals_bulk([(cid, vids[0], day, day + 1, 60.0, "active")])
+        other = CarRentalService()  # e.g. another process on the same database
+        rid = other.create_rental(cid, vids[1], *when)
+        self.assertEqual([v.id for v in self.service.find_available_vehicles(*when)], [vids[2]])
+        other.cancel_rental(rid)
+        self.assertTrue(self.service.is_vehicle_free(vids[1], *when))
+        self.assertFalse(self.service.is_vehicle_free(vids[0], *when))
+
+
+def loop_weekend_cost(rate, start, end):
+    """The original day-by-day WeekendDiscountPricing loop, kept as the reference."""
+    d, total, weekend = start, 0.0, 0
+    while d <= end:
+        weekend += d.weekday() >= 5
+        total += rate * 0.9 if d.weekday() >= 5 else rate
+        d += timedelta(days=1)
+    return round(total, 2), weekend
+
+
+class TestWeekendDayCounter(unittest.TestCase):
+    def test_matches_day_by_day_loop(self):
+        rng = random.Random(2025)
+        pricing = WeekendDiscountPricing()
+        for _ in range(2000):
+            start = date(1990, 1, 1) + timedelta(days=rng.randrange(20000))
+            end = start + timedelta(days=rng.choice([0, 1, 2, 5, 6, 7, 8, 13, 30, 365, rng.randrange(1900)]))
+            rate = round(rng.uniform(1, 500), 2)
+            expected_cost, expected_weekend = loop_weekend_cost(rate, start, end)
+            weekdays, weekend = count_days(start, end)
+            self.assertEqual(weekend, expected_weekend, (start, end))
+            self.assertEqual(weekdays + weekend, (end - start).days + 1)
+            # the loop accumulates float error; the closed form may differ by at most a cent
+            cost = pricing.compute_cost(weekdays + weekend, rate, start, end)
+            self.assertAlmostEqual(cost, expected_cost, delta=0.0101)
+
+    def test_empty_range(self):
+        self.assertEqual(count_days(date(2025, 1, 6), date(2025, 1, 5)), (0, 0))
+
+    def test_context_detects_saturday_and_sunday(self):
+        sunday, monday, friday = date(2025, 1, 5), date(2025, 1, 6), date(2025, 1, 10)
+        self.assertIsInstance(PricingContext("Economy").choose(sunday, sunday), WeekendDiscountPricing)
+        self.assertIsInstance(PricingContext("Economy").choose(monday, friday), StandardPricing)
+
+
+class TestQuoteBatch(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.rates, self.types, self.starts, self.ends, self.expected = [], [], [], [], []
+        for _ in range(3000):
+            start = date(2024, 1, 1) + timedelta(days=rng.randrange(700))
+            end = start + timedelta(days=rng.choice([0, 1, 3, 4, 6, 14, rng.randrange(800)]))
+            rate, vtype = round(rng.uniform(20, 300), 2), rng.choice(["Economy", "SUV", "Truck"])
+            days = (end - start).days + 1
+            self.expected.append(PricingContext(vtype).choose(start, end).compute_cost(days, rate, start, end))
+            self.rates.append(rate)
+            self.types.append(vtype)
+            self.starts.append(start.toordinal())
+            self.ends.append(end.toordinal())
+
+    def test_matches_scalar_strategies(self):
+        self.assertEqual(quote_batch(self.rates, self.types, self.starts, self.ends), self.expected)
+
+    def test_pure_python_fallback_matches(self):
+        self.assertEqual(pricing._quote_batch_python(self.rates, self.types, self.starts, self.ends), self.expected)
+
+    @unittest.skipIf(pricing.np is None, "numpy not installed")
+    def test_numpy_path_matches(self):
+        self.assertEqual(pricing._quote_batch_numpy(self.rates, self.types, self.starts, self.ends), self.expected)
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            quote_batch([1.0], ["SUV"], [1, 2], [3])
+
+
+class TestQuoteCache(unittest.TestCase):
+    def test_strategies_are_shared(self):
+        a = PricingContext("Economy").choose(date(2025, 1, 6), date(2025, 1, 7))
+        b = PricingContext("Truck").choose(date(2025, 2, 3), date(2025, 2, 4))
+        self.assertIs(a, b)
+        self.assertIs(PricingContext("SUV").choose(date(2025, 1, 6), date(2025, 1, 7)), pricing.get_strategy("suv_premium"))
+
+    def test_lru_eviction_and_stats(self):
+        cache = QuoteCache(maxsize=2)
+        k1, k2, k3 = (("Economy", 45.0, date(2025, 1, d), date(2025, 1, d)) for d in (6, 7, 8))
+        calls = []
+        compute = lambda: calls.append(1) or 1.0  # noqa: E731
+        cache.get_or_compute(k1, compute)
+        cache.get_or_compute(k2, compute)
+        cache.get_or_compute(k1, compute)  # k1 is now most recent
+        cache.get_or_compute(k3, compute)  # evicts k2
+        cache.get_or_compute(k2, compute)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 4, "size": 2, "maxsize": 2})
+
+    def test_invalidate_by_type_and_rate(self):
+        cache = QuoteCache()
+        for vtype, rate in (("Economy", 45.0), ("Economy", 50.0), ("SUV", 80.0)):
+            cache.get_or_compute((vtype, rate, date(2025, 1, 6), date(2025, 1, 6)), lambda: rate)
+        self.assertEqual(cache.invalidate(vehicle_type="Economy", daily_rate=45.0), 1)
+        self.assertEqual(cache.invalidate(vehicle_type="SUV"), 1)
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_quote_matches_strategy(self):
+        start, end = date(2025, 1, 3), date(2025, 1, 6)
+        expected = WeekendDiscountPricing().compute_cost(4, 45.0, start, end)
+        before = pricing.quote_cache.stats()["hits"]
+        self.assertEqual(pricing.quote("Economy", 45.0, start, end), expected)
+        self.assertEqual(pricing.quote("Economy", 45.0, start, end), expected)
+        self.assertEqual(pricing.quote_cache.stats()["hits"], before + 1)
+
+
+class TestReports(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ann = self.service.add_customer("Ann", "ann@example.com", "1")
+        self.bob = self.service.add_customer("Bob", "bob@example.com", "2")
+        self.car = self.service.add_vehicle("Toyota", "Corolla", 2021, 50, "Economy")
+        self.suv = self.service.add_vehicle("Nissan", "X-Trail", 2022, 100, "SUV")
+
+    def test_rollups_follow_bookings_and_returns(self):
+        r1 = self.service.create_rental(self.ann, self.car, date(2025, 1, 6), date(2025, 1, 8))  # 150
+        self.service.create_rental(self.bob, self.suv, date(2025, 1, 7), date(2025, 1, 7))  # 120 with premium
+        self.service.return_vehicle(r1)
+        by_type = {t.vehicle_type: t for t in self.service.revenue_by_vehicle_type()}
+        economy, suv = by_type["Economy"], by_type["SUV"]
+        self.assertEqual((economy.vehicles, economy.rentals, economy.active, economy.revenue, economy.rented_days),
+                         (1, 1, 0, 150.0, 3))
+        self.assertEqual((suv.rentals, suv.active, suv.rented_days), (1, 1, 1))
+        days = self.service.daily_utilization(date(2025, 1, 5), date(2025, 1, 9))
+        self.assertEqual([d.vehicles_out for d in days], [0, 1, 2, 1, 0])
+        self.assertEqual(days[2].utilization, 1.0)
+        self.assertEqual([d.rentals_started for d in days], [0, 1, 1, 0, 0])
+        self.assertEqual(days[1].revenue, 150.0)
+        top = self.service.top_customers(5)
+        self.assertEqual([(c.name, c.rentals, c.revenue) for c in top], [("Ann", 1, 150.0), ("Bob", 1, 120.0)])
+
+    def test_rollups_match_a_full_recount(self):
+        repo.add_vehicles_bulk([("Ford", f"Ranger {i}", 2023, 90, "Truck") for i in range(20)])
+        rng = random.Random(7)
+        for _ in range(40):
+            start = date(2025, 1, 1) + timedelta(days=rng.randrange(60))
+            try:
+                self.service.create_rental(rng.choice([self.ann, self.bob]), rng.randint(1, 22),
+                                           start, start + timedelta(days=rng.randrange(5)))
+            except ValidationError:
+                pass
+        with repo.get_conn() as conn:
+            expected = dict(conn.execute("""SELECT v.vehicle_type, TOTAL(r.total_cost) FROM rentals r
+                                            JOIN vehicles v ON v.id = r.vehicle_id GROUP BY v.vehicle_type""").fetchall())
+            fleet = dict(conn.execute("SELECT vehicle_type, COUNT(*) FROM vehicles GROUP BY vehicle_type").fetchall())
+            triggers = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+        by_type = self.service.revenue_by_vehicle_type()
+        self.assertEqual({t.vehicle_type: t.vehicles for t in by_type}, fleet)
+        self.assertEqual({t.vehicle_type: round(t.revenue, 2) for t in by_type if t.rentals},
+                         {k: round(v, 2) for k, v in expected.items()})
+        self.assertIn("vehicles_report_ai", triggers)  # restored after the bulk insert
+
+    def test_report_arguments_are_validated(self):
+        with self.assertRaises(ValidationError):
+            self.service.daily_utilization(date(2025, 2, 1), date(2025, 1, 1))
+        with self.assertRaises(ValidationError):
+            self.service.top_customers(0)
+
+
+class TestEventLog(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cid = self.service.add_customer("Ann", "ann@example.com", "1")
+        self.vids = [self.service.add_vehicle("Toyota", "Corolla", 2021, 50, "Economy") for _ in range(3)]
+
+    def book(self, vid):
+        time.sleep(0.003)  # recorded_at has millisecond resolution
+        return self.service.create_rental(self.cid, vid, date(2025, 1, 6), date(2025, 1, 8))
+
+    def test_events_are_logged_and_append_only(self):
+        r1, r2 = self.book(self.vids[0]), self.book(self.vids[1])
+        self.service.return_vehicle(r1)
+        self.service.cancel_rental(r2)
+        self.assertEqual([e.event for e in self.service.rental_history(r1)], ["created", "returned"])
+        self.assertEqual([e.event for e in self.service.rental_history(r2)], ["created", "cancelled"])
+        self.assertTrue(self.service.get_vehicle(self.vids[1]).available)
+        with self.assertRaises(ValidationError):
+            self.service.return_vehicle(r2)
+        with repo.get_conn() as conn:
+            with self.assertRaises(sqlite3.IntegrityError):
+                conn.execute("DELETE FROM rental_events")
+        self.assertEqual([r.status for r in self.service.list_rentals(status="cancelled")], ["cancelled"])
+
+    def test_cancelling_takes_the_rental_out_of_reports(self):
+        rid = self.book(self.vids[0])
+        self.service.cancel_rental(rid)
+        (economy,) = self.service.revenue_by_vehicle_type()
+        self.assertEqual((economy.rentals, economy.active, economy.revenue, economy.rented_days), (0, 0, 0.0, 0))
+        self.assertEqual(self.service.daily_utilization(date(2025, 1, 6), date(2025, 1, 6))[0].vehicles_out, 0)
+
+    def test_fleet_state_at_matches_a_full_replay(self):
+        self.service.snapshot_every = 3
+        rentals = []
+        for step in range(12):
+            vid = self.vids[step % 3]
+            open_rental = next((r for r in rentals if r[1] == vid), None)
+            if open_rental:
+                rentals.remove(open_rental)
+                time.sleep(0.003)
+                (self.service.cancel_rental if step % 2 else self.service.return_vehicle)(open_rental[0])
+            else:
+                rentals.append((self.book(vid), vid))
+        with repo.get_conn() as conn:
+            events = conn.execute("SELECT rental_id, vehicle_id, event, recorded_at FROM rental_events ORDER BY id").fetchall()
+            (snapshots,) = conn.execute("SELECT COUNT(*) FROM availability_snapshots").fetchone()
+        self.assertEqual(snapshots, 4)
+        replayed = {}
+        for rental_id, vehicle_id, event, recorded_at in events:
+            history._apply(replayed, [(rental_id, vehicle_id, event)])
+            state = self.service.fleet_state_at(datetime.fromtimestamp(recorded_at))
+            self.assertEqual(state.active, replayed)
+        self.assertEqual(self.service.fleet_state_at(datetime(2000, 1, 1)).active, {})
+        self.assertEqual(self.service.fleet_state_at(datetime.now()).vehicles_out, {vid for _, vid in rentals})
+
+
+    def test_backfilled_events_never_follow_live_ones(self):
+        # pre-log rentals: one booked for 2030 and still active, one finished
+        legacy_path = os.path.join(self.tmpdir, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        migrations.MIGRATIONS[0](conn.cursor())
+        conn.execute("INSERT INTO customers(name, email, phone) VALUES ('Dan', 'dan@example.com', '1')")
+        for _ in range(2):
+            conn.execute("INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type) VALUES ('Ford', 'Ranger', 2023, 95, 'Truck')")
+        conn.executemany("""INSERT INTO rentals(customer_id, vehicle_id, start_date, end_date, total_cost, status)
+                            VALUES (1, ?, ?, ?, 475, ?)""",
+                         [(1, "2030-01-01", "2030-01-05", "active"), (2, "2024-02-27", "2024-03-02", "finished")])
+        conn.execute("UPDATE vehicles SET available=0 WHERE id=1")
+        conn.commit()
+        conn.close()
+        repo.configure(db_name=legacy_path)
+        service = CarRentalService()
+        migrated = time.time()
+        time.sleep(0.003)
+        live = service.create_rental(1, 2, date(2025, 1, 6), date(2025, 1, 8))
+
+        with repo.get_conn() as conn:
+            events = conn.execute("SELECT rental_id, vehicle_id, event, recorded_at FROM rental_events ORDER BY id").fetchall()
+        stamps = [e[3] for e in events]
+        self.assertEqual(stamps, sorted(stamps))
+        self.assertEqual(service.fleet_state_at(datetime.fromtimestamp(migrated)).active, {1: 1})
+        self.assertEqual(service.fleet_state_at(datetime.now()).active, {1: 1, live: 2})
+        self.assertEqual(service.fleet_state_at(datetime(2024, 3, 1)).active, {2: 2})
+
+class TestDataGen(TempDBTestCase):
+    def dump(self, *queries):
+        with repo.get_conn() as conn:
+            return [conn.execute(q).fetchall() for q in queries]
+
+    def test_same_seed_gives_same_data(self):
+        counts = datagen.generate(customers=50, vehicles=20, rentals=300, seed=4)
+        self.assertEqual((counts.customers, counts.vehicles, counts.rentals), (50, 20, 300))
+        first = self.dump("SELECT * FROM customers", "SELECT * FROM vehicles", "SELECT * FROM rentals")
+        for seed, same in ((4, True), (5, False)):
+            repo.configure(db_name=os.path.join(self.tmpdir, f"seed{seed}.db"))
+            datagen.generate(customers=50, vehicles=20, rentals=300, seed=seed)
+            again = self.dump("SELECT * FROM customers", "SELECT * FROM vehicles", "SELECT * FROM rentals")
+            self.assertEqual(again == first, same)
+
+    def test_generated_rentals_follow_booking_rules(self):
+        datagen.generate(customers=100, vehicles=30, rentals=900, seed=1, days=365)
+        overlaps, multi_active, flag_mismatch = self.dump(
+            """SELECT COUNT(*) FROM rentals a JOIN rentals b ON a.vehicle_id = b.vehicle_id AND a.id < b.id
+               WHERE a.status <> 'cancelled' AND b.status <> 'cancelled'
+               AND a.start_day <= b.end_day AND b.start_day <= a.end_day""",
+            "SELECT vehicle_id FROM rentals WHERE status = 'active' GROUP BY vehicle_id HAVING COUNT(*) > 1",
+            """SELECT id FROM vehicles v WHERE available =
+               EXISTS(SELECT 1 FROM rentals r WHERE r.vehicle_id = v.id AND r.status = 'active')""")
+        self.assertEqual((overlaps, multi_active, flag_mismatch), ([(0,)], [], []))
+
+    def test_bulk_rentals_keep_rollups_and_log_consistent(self):
+        datagen.generate(customers=40, vehicles=10, rentals=200, seed=2)
+        # a live booking on top of the bulk load goes through the triggers again
+        vid = self.service.add_vehicle("Toyota", "Corolla", 2021, 50, "Economy")
+        self.service.cancel_rental(self.service.create_rental(1, vid, date(2030, 1, 6), date(2030, 1, 8)))
+        by_type, expected_types, events, expected_events, out_days, triggers = self.dump(
+            "SELECT vehicle_type, rentals, active, ROUND(revenue, 2), rented_days FROM report_by_type ORDER BY 1",
+            """SELECT v.vehicle_type, COUNT(r.id), TOTAL(r.status = 'active'), ROUND(TOTAL(r.total_cost), 2),
+                      TOTAL(r.end_day - r.start_day + 1)
+               FROM vehicles v LEFT JOIN rentals r ON r.vehicle_id = v.id AND r.status <> 'cancelled'
+               GROUP BY v.vehicle_type ORDER BY 1""",
+            "SELECT event, COUNT(*) FROM rental_events GROUP BY event ORDER BY 1",
+            """SELECT 'cancelled', SUM(status = 'cancelled') FROM rentals UNION ALL
+               SELECT 'created', COUNT(*) FROM rentals UNION ALL
+               SELECT 'returned', SUM(status = 'finished') FROM rentals""",
+            """SELECT (SELECT SUM(vehicles_out) FROM report_daily),
+                      (SELECT SUM(end_day - start_day + 1) FROM rentals WHERE status <> 'cancelled')""",
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'rentals'")
+        self.assertEqual(by_type, expected_types)
+        self.assertEqual(events, expected_events)
+        self.assertEqual(out_days[0][0], out_days[0][1])
+        self.assertEqual({name for (name,) in triggers}, set(repo._RENTAL_INSERT_TRIGGERS))
+
+
+class TestMetrics(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        metrics.enable()
+        self.addCleanup(metrics.disable)
+
+    def test_service_repository_and_sql_are_timed(self):
+        cid = self.service.add_customer("Ann", "ann@example.com", "1")
+        vid = self.service.add_vehicle("Toyota", "Corolla", 2021, 50, "Economy")
+        self.service.create_rental(cid, vid, date(2025, 1, 6), date(2025, 1, 8))
+        with self.assertRaises(ValidationError):
+            self.service.create_rental(cid, vid, date(2025, 1, 7), date(2025, 1, 9))
+        doc = metrics.export_json()
+        self.assertEqual(doc["service"]["create_rental"]["count"], 2)
+        self.assertEqual(doc["service"]["create_rental"]["errors"], 1)
+        self.assertGreaterEqual(doc["repository"]["add_customer"]["count"], 1)
+        inserts = [fp for fp in doc["sql"].values() if fp["sql"].startswith("INSERT INTO customers")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(inserts[0]["execute"]["count"], 1)
+        text = metrics.export_prometheus()
+        self.assertIn('car_rental_service_seconds_count{method="create_rental"} 2', text)
+        self.assertIn('car_rental_service_errors_total{method="create_rental"} 1', text)
+        self.assertIn('car_rental_sql_seconds_bucket{fingerprint="', text)
+
+    def test_iterating_a_cursor_is_timed_as_one_fetch(self):
+        for i in range(5):
+            self.service.add_vehicle("Toyota", f"Model {i}", 2021, 50, "Economy")
+
+        def fetch(sql):
+            fp = metrics.fingerprint(sql)[0]
+            return metrics.export_json()["sql"].get(fp, {}).get("fetch", {}).get("count", 0)
+
+        with repo.get_conn() as conn:
+            self.assertEqual(len([row for row in conn.execute("SELECT id FROM vehicles")]), 5)
+            self.assertEqual(fetch("SELECT id FROM vehicles"), 1)
+            cur = conn.execute("SELECT model FROM vehicles")
+            next(cur)  # abandoned half way: recorded when the cursor is closed
+            self.assertEqual(fetch("SELECT model FROM vehicles"), 0)
+            cur.close()
+            self.assertEqual(fetch("SELECT model FROM vehicles"), 1)
+            conn.execute("SELECT year FROM vehicles").fetchall()
+            self.assertEqual(fetch("SELECT year FROM vehicles"), 1)  # fetchall is not counted twice
+
+    def test_fingerprint_ignores_literals_and_whitespace(self):
+        a = metrics.fingerprint("SELECT * FROM vehicles WHERE id IN (1, 2, 3) AND brand = 'Kia'")
+        b = metrics.fingerprint("SELECT *  FROM vehicles\n WHERE id IN (?,?) AND brand = ?")
+        self.assertEqual(a, b)
+        self.assertEqual(a[1], "SELECT * FROM vehicles WHERE id IN (?...) AND brand = ?")
+
+    def test_disable_restores_originals(self):
+        self.assertTrue(hasattr(CarRentalService.add_customer, "__wrapped__"))
+        metrics.disable()
+        self.assertFalse(metrics.is_enabled())
+        self.assertFalse(hasattr(CarRentalService.add_customer, "__wrapped__"))
+        self.assertIs(repo.CONNECTION_FACTORY, sqlite3.Connection)
+        metrics.reset()
+        self.service.add_customer("Bob", "bob@example.com", "2")
+        self.assertEqual(metrics.export_json().keys(), {"enabled", "buckets"})
+
+
+class TestVehicleSearch(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.corolla = self.service.add_vehicle("Toyota", "Corolla", 2021, 45.0, "Economy")
+        self.rav4 = self.service.add_vehicle("Toyota", "RAV4", 2022, 70.0, "SUV")
+        self.xtrail = self.service.add_vehicle("Nissan", "X-Trail", 2022, 80.0, "SUV")
+
+    def ids(self, keyword):
+        return [v.id for v in self.service.search_vehicles(keyword)]
+
+    @unittest.skipUnless(HAS_FTS5, "SQLite built without FTS5")
+    def test_prefix_and_multi_token(self):
+        self.assertTrue(repo.has_vehicle_fts())
+        self.assertEqual(sorted(self.ids("toy")), [self.corolla, self.rav4])
+        self.assertEqual(self.ids("toyota suv"), [self.rav4])
+        self.assertEqual(self.ids("X-Trail"), [self.xtrail])
+        self.assertEqual(self.ids("honda"), [])
+
+    @unittest.skipUnless(HAS_FTS5, "SQLite built without FTS5")
+    def test_index_follows_updates_and_deletes(self):
+        with repo.get_conn() as conn:
+            conn.execute("UPDATE vehicles SET model='Yaris' WHERE id=?", (self.corolla,))
+            conn.execute("DELETE FROM vehicles WHERE id=?", (self.xtrail,))
+        self.assertEqual(self.ids("yaris"), [self.corolla])
+        self.assertEqual(self.ids("corolla"), [])
+        self.assertEqual(self.ids("nissan"), [])
+
+    def test_like_fallback(self):
+        repo._vehicle_fts[repo.DB_NAME] = False
+        self.assertEqual(self.ids("oyot"), [self.corolla, self.rav4])
+        self.assertEqual(self.ids(""), [self.corolla, self.rav4, self.xtrail])
+
+
+class TestPagination(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.service.add_vehicle("Toyota", f"Model {i}", 2021, 45.0, "Economy") for i in range(45)]
+        repo.set_vehicle_availability(self.ids[0], False)
+
+    def test_keyset_pages(self):
+        first = self.service.list_vehicles_page(limit=20)
+        second = self.service.list_vehicles_page(after_id=first[-1].id, limit=20)
+        self.assertEqual([v.id for v in first + second], self.ids[:40])
+        available = self.service.list_vehicles_page(limit=5, only_available=True)
+        self.assertEqual(available[0].id, self.ids[1])
+        with self.assertRaises(ValidationError):
+            self.service.list_vehicles_page(limit=0)
+        with self.assertRaises(ValidationError):
+            self.service.list_rentals_page(status="lost")
+
+    def test_streaming_iterators(self):
+        self.assertEqual([v.id for v in repo.iter_vehicles(batch_size=7)], self.ids)
+        self.assertEqual(len(list(self.service.iter_vehicles(only_available=True))), 44)
+        self.assertEqual(list(self.service.iter_customers()), [])
+
+    def test_cli_next_and_previous(self):
+        out = io.StringIO()
+        with mock.patch("builtins.input", side_effect=["n", "n", "p", ""]), redirect_stdout(out):
+            cli.list_vehicles(self.service)
+        printed = [line for line in out.getvalue().splitlines() if line.startswith("[")]
+        # pages 1, 2, 3, then back to 2
+        self.assertEqual(len(printed), 20 + 20 + 5 + 20)
+        self.assertTrue(printed[-1].startswith(f"[{self.ids[39]}]"))
+
+
+class TestBulkImportExport(TempDBTestCase):
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_import_customers_reports_rejects(self):
+        self.service.add_customer("Existing", "taken@example.com", "1")
+        path = self.write("customers.csv", "name,email,phone\n"
+                                           "Ann,ANN@example.com,111\n"
+                                           ",nobody@example.com,222\n"
+                                           "Dup,taken@example.com,333\n"
+                                           "Ben,ben@example.com,444\n")
+        report = bulk.import_customers(path, chunk_size=2)
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([line for line, _ in report.rejected], [3, 4])
+        self.assertIn("UNIQUE", report.rejected[1][1])
+        emails = [c.email for c in self.service.list_customers()]
+        self.assertEqual(emails, ["taken@example.com", "ann@example.com", "ben@example.com"])
+
+    def test_import_vehicles_jsonl_and_export_round_trip(self):
+        path = self.write("fleet.jsonl", '{"brand": "Ford", "model": "Ranger", "year": 2023, "daily_rate": 95, "vehicle_type": "Truck"}\n'
+                                         '{"brand": "Ford", "model": "Focus", "year": "old", "daily_rate": 40, "vehicle_type": "Economy"}\n'
+                                         'not json\n'
+                                         '{"brand": "Mazda", "model": "CX-5", "year": 2022, "daily_rate": 0, "vehicle_type": "SUV"}\n')
+        report = bulk.import_vehicles(path)
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line for line, _ in report.rejected], [2, 3, 4])
+
+        out = os.path.join(self.tmpdir, "out.csv")
+        self.assertEqual(bulk.export_table("vehicles", out), 1)
+        self.assertEqual(bulk.import_vehicles(out).imported, 1)
+        self.assertEqual(len(self.service.list_vehicles()), 2)
+        if HAS_FTS5:
+            self.assertEqual(len(self.service.search_vehicles("ranger")), 2)
+            self.service.add_vehicle("Ford", "Ranger", 2023, 95.0, "Truck")  # trigger is back in place
+            self.assertEqual(len(self.service.search_vehicles("ranger")), 3)
+
+
+class TestEntityCache(TempDBTestCase):
+    def test_ttl_and_size_bounds(self):
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        loads = []
+        load = lambda: loads.append(1) or "row"  # noqa: E731
+        cache.get_or_load("a", load)
+        cache.get_or_load("a", load)
+        now[0] = 11
+        cache.get_or_load("a", load)  # expired -> reloaded
+        cache.get_or_load("b", load)
+        cache.get_or_load("c", load)  # evicts "a"
+        self.assertEqual(len(loads), 4)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 4, "expired": 1, "size": 2, "maxsize": 2})
+        self.assertIsNone(cache.get_or_load("missing", lambda: None))
+        self.assertEqual(len(cache), 2)
+
+    def test_typed_lookups_are_cached_and_invalidated(self):
+        cid = self.service.add_customer("Fay", "fay@example.com", "1")
+        vid = self.service.add_vehicle("Nissan", "X-Trail", 2022, 80.0, "SUV")
+        self.assertEqual(self.service.get_customer(cid), Customer(cid, "Fay", "fay@example.com", "1"))
+        vehicle = self.service.get_vehicle(vid)
+        self.assertIsInstance(vehicle, SUV)
+        self.assertTrue(vehicle.available)
+        self.assertIs(self.service.get_vehicle(vid), vehicle)
+
+        rid = self.service.create_rental(cid, vid, date(2025, 1, 6), date(2025, 1, 8))
+        self.assertFalse(self.service.get_vehicle(vid).available)
+        rental = self.service.get_rental(rid)
+        self.assertIsInstance(rental, Rental)
+        self.assertEqual((rental.start_date, rental.status), (date(2025, 1, 6), "active"))
+
+        self.service.return_vehicle(rid)
+        self.assertEqual(self.service.get_rental(rid).status, "finished")
+        self.assertTrue(self.service.get_vehicle(vid).available)
+        with self.assertRaises(ValidationError):
+            self.service.return_vehicle(rid)
+        self.assertGreater(self.service.cache_stats()["hits"], 0)
+        self.assertIsNone(self.service.get_customer(999))
+
+    def test_repository_returns_slotted_entities(self):
+        cid = self.service.add_customer("Gus", "gus@example.com", "1")
+        vid = self.service.add_vehicle("Ford", "Ranger", 2023, 95.0, "Truck")
+        rid = self.service.create_rental(cid, vid, date(2025, 1, 6), date(2025, 1, 6))
+        for entity in (repo.get_customer(cid), repo.get_vehicle(vid), repo.get_rental(rid)):
+            self.assertFalse(hasattr(entity, "__dict__"), type(entity).__name__)
+        self.assertEqual(repo.list_rentals()[0].end_date, date(2025, 1, 6))
+
+    def test_unknown_vehicle_type(self):
+        vid = self.service.add_vehicle("Ford", "Transit", 2022, 90.0, "Van")
+        vehicle = self.service.get_vehicle(vid)
+        self.assertIsInstance(vehicle, OtherVehicle)
+        self.assertEqual((vehicle.id, vehicle.vehicle_type), (vid, "Van"))
+
+
+class TestAsyncService(TempDBTestCase):
+    pool_size = 4
+
+    def test_concurrent_async_bookings(self):
+        async def scenario():
+            async with AsyncCarRentalService(self.service) as svc:
+                cid = await svc.add_customer("Hana", "hana@example.com", "1")
+                vids = [await svc.add_vehicle("Toyota", "Yaris", 2022, 40.0, "Economy") for _ in range(5)]
+
+                async def client(n):
+                    try:
+                        return await svc.create_rental(cid, vids[n % 5], date(2025, 3, 3), date(2025, 3, 5))
+                    except ValidationError:
+                        return None
+
+                results = await asyncio.gather(*(client(n) for n in range(100)))
+                return [r for r in results if r is not None]
+
+        booked = asyncio.run(scenario())
+        self.assertEqual(len(booked), 5)
+        self.assertEqual(len(self.service.list_rentals(status="active")), 5)
+
+    def test_return_and_cancel(self):
+        async def scenario():
+            async with AsyncCarRentalService(self.service) as svc:
+                cid = await svc.add_customer("Ines", "ines@example.com", "1")
+                vid = await svc.add_vehicle("Toyota", "Yaris", 2022, 40.0, "Economy")
+                first = await svc.create_rental(cid, vid, date(2025, 3, 3), date(2025, 3, 5))
+                second = await svc.create_rental(cid, vid, date(2025, 4, 1), date(2025, 4, 2))
+                await svc.cancel_rental(first)
+                await svc.return_vehicle(second)
+                with self.assertRaises(ValidationError):
+                    await svc.cancel_rental(first)
+                return [(await svc.get_rental(rid)).status for rid in (first, second)]
+
+        self.assertEqual(asyncio.run(scenario()), ["cancelled", "finished"])
+
+    def test_timeout_and_cancellation_drop_queued_calls(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_list(*args, **kwargs):
+            calls.append(args)
+            started.set()
+            release.wait(5)
+            return []
+
+        async def scenario():
+            svc = AsyncCarRentalService(self.service, max_workers=1)
+            with mock.patch.object(self.service, "list_customers_page", slow_list):
+                blocker = asyncio.ensure_future(svc.list_customers_page(timeout=5))
+                await asyncio.get_running_loop().run_in_executor(None, started.wait)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await svc.list_customers_page(after_id=1, timeout=0.05)
+                queued = asyncio.ensure_future(svc.list_customers_page(after_id=2))
+                await asyncio.sleep(0.01)
+                queued.cancel()
+                await asyncio.sleep(0.01)  # let the cancellation reach the executor's queue
+                release.set()
+                self.assertEqual(await blocker, [])
+                with self.assertRaises(asyncio.CancelledError):
+                    await queued
+            await svc.aclose()
+
+        asyncio.run(scenario())
+        self.assertEqual(calls, [(0, 50)])
+
+
+class TestHTTPAPI(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = api.make_server(port=0, service=self.service)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else None
+        self.conn.request(method, path, body=data, headers=headers or {})
+        resp = self.conn.getresponse()
+        raw = resp.read()
+        if resp.getheader("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        return resp, json.loads(raw) if raw else None
+
+    def test_create_and_fetch_over_one_connection(self):
+        resp, body = self.request("POST", "/customers", {"name": "Ann", "email": "a@x.com", "phone": "1"})
+        self.assertEqual(resp.status, 201)
+        cid = body["id"]
+        _, body = self.request("POST", "/vehicles", {"brand": "Toyota", "model": "Corolla", "year": 2021,
+                                                     "daily_rate": 50, "vehicle_type": "Economy"})
+        vid = body["id"]
+        resp, body = self.request("POST", "/rentals", {"customer_id": cid, "vehicle_id": vid,
+                                                       "start": "2025-01-06", "end": "2025-01-08"})
+        self.assertEqual(resp.status, 201)
+        resp, rental = self.request("GET", f"/rentals/{body['id']}")
+        self.assertEqual((rental["vehicle_id"], rental["start_date"], rental["status"]),
+                         (vid, "2025-01-06", "active"))
+        _, quote = self.request("GET", f"/quote?vehicle_id={vid}&start=2025-01-06&end=2025-01-08")
+        self.assertEqual(quote["total_cost"], 150.0)
+        resp, body = self.request("POST", f"/rentals/{rental['id']}/return")
+        self.assertEqual((resp.status, body["status"]), (200, "finished"))
+
+    def test_errors_map_to_status_codes(self):
+        resp, body = self.request("GET", "/vehicles/999")
+        self.assertEqual(resp.status, 404)
+        self.assertIn("does not exist", body["error"])
+        resp, _ = self.request("GET", "/nowhere")
+        self.assertEqual(resp.status, 404)
+        resp, body = self.request("GET", "/quote?vehicle_id=1&start=tomorrow&end=2025-01-01")
+        self.assertEqual(resp.status, 400)
+        resp, _ = self.request("POST", "/customers", {"name": "Ann"})
+        self.assertEqual(resp.status, 400)
+        self.request("POST", "/customers", {"name": "Ann", "email": "a@x.com", "phone": "1"})
+        resp, _ = self.request("POST", "/customers", {"name": "Bob", "email": "a@x.com", "phone": "2"})
+        self.assertEqual(resp.status, 409)
+
+    def test_rejected_requests_leave_the_connection_usable(self):
+        resp, body = self.request("POST", "/nowhere", {"name": "Ann", "email": "a@x.com", "phone": "1"})
+        self.assertEqual((resp.status, body["error"]), (404, "No such endpoint."))
+        resp, _ = self.request("GET", "/vehicles")  # same kept-alive connection
+        self.assertEqual(resp.status, 200)
+        resp, body = self.request("POST", "/vehicles/1", {"brand": "Toyota"})
+        self.assertEqual((resp.status, resp.getheader("Allow"), body["error"]), (405, "GET", "Method not allowed."))
+        resp, _ = self.request("GET", "/rentals/1/return")
+        self.assertEqual((resp.status, resp.getheader("Allow")), (405, "POST"))
+        resp, _ = self.request("GET", "/customers")
+        self.assertEqual(resp.status, 200)
+
+    def test_bad_content_length_is_rejected(self):
+        for value in ("abc", "-5", "1.5"):
+            conn = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+            conn.putrequest("POST", "/customers")
+            conn.putheader("Content-Length", value)
+            conn.endheaders()
+            resp = conn.getresponse()
+            body = json.loads(resp.read())
+            self.assertEqual((resp.status, resp.getheader("Connection")), (400, "close"), value)
+            self.assertIn("Content-Length", body["error"])
+            conn.close()
+
+    def test_numbers_must_be_finite_and_of_the_right_type(self):
+        vehicle = {"brand": "Toyota", "model": "Corolla", "year": 2021, "vehicle_type": "Economy"}
+        for rate in ("inf", "nan", "-Infinity", True):
+            resp, body = self.request("POST", "/vehicles", dict(vehicle, daily_rate=rate))
+            self.assertEqual(resp.status, 400, rate)
+        for year in (True, 2021.5, 2021.0):
+            resp, _ = self.request("POST", "/vehicles", dict(vehicle, year=year, daily_rate=50))
+            self.assertEqual(resp.status, 400, year)
+        self.assertEqual(self.service.list_vehicles(), [])
+        with self.assertRaises(ValidationError):
+            self.service.add_vehicle("Toyota", "Corolla", 2021, float("inf"), "Economy")
+        with repo.get_conn() as conn:  # bad data that got in some other way
+            conn.execute("""INSERT INTO vehicles(brand, model, year, daily_rate, vehicle_type)
+                            VALUES ('Ford', 'Ranger', 2023, 1e999, 'Truck')""")
+        with mock.patch.object(api.RequestHandler, "log_error"):
+            resp, body = self.request("GET", "/vehicles")
+        self.assertEqual((resp.status, body), (500, {"error": "Internal server error."}))
+
+    def test_out_of_range_ids_and_unexpected_errors(self):
+        huge = "99999999999999999999999"
+        for path in (f"/vehicles/{huge}", f"/customers/{huge}", f"/rentals/{huge}"):
+            resp, body = self.request("GET", path)
+            self.assertEqual(resp.status, 404, path)
+            self.assertIn("does not exist", body["error"])
+        resp, _ = self.request("POST", f"/rentals/{huge}/cancel")
+        self.assertEqual(resp.status, 404)
+        for path in (f"/vehicles?after_id={huge}", f"/rentals?limit=-{huge}", f"/quote?vehicle_id={huge}&start=2025-01-01&end=2025-01-02"):
+            resp, body = self.request("GET", path)
+            self.assertEqual((resp.status, body["error"].endswith("is out of range.")), (400, True), path)
+        resp, _ = self.request("POST", "/rentals", {"customer_id": 1, "vehicle_id": 2**64,
+                                                    "start": "2025-01-06", "end": "2025-01-08"})
+        self.assertEqual(resp.status, 400)
+        with mock.patch.object(self.service, "list_vehicles_page", side_effect=RuntimeError("boom")), \
+                mock.patch.object(api.RequestHandler, "log_error"):
+            resp, body = self.request("GET", "/vehicles")
+        self.assertEqual((resp.status, body), (500, {"error": "Internal server error."}))
+        resp, _ = self.request("GET", "/vehicles")  # same kept-alive connection still works
+        self.assertEqual(resp.status, 200)
+
+    def test_conditional_get_returns_304(self):
+        self.service.add_vehicle("Toyota", "Corolla", 2021, 50, "Economy")
+        resp, _ = self.request("GET", "/vehicles")
+        etag = resp.getheader("ETag")
+        self.assertEqual(resp.getheader("Cache-Control"), "no-cache")
+        resp, body = self.request("GET", "/vehicles", headers={"If-None-Match": etag})
+        self.assertEqual((resp.status, body), (304, None))
+        self.service.add_vehicle("Honda", "Civic", 2021, 50, "Economy")
+        resp, body = self.request("GET", "/vehicles", headers={"If-None-Match": etag})
+        self.assertEqual((resp.status, len(body)), (200, 2))
+        self.assertNotEqual(resp.getheader("ETag"), etag)
+
+    def test_large_lists_are_gzipped_when_accepted(self):
+        repo.add_vehicles_bulk([("Toyota", f"Corolla {i}", 2021, 50.0, "Economy") for i in range(100)])
+        resp, plain = self.request("GET", "/vehicles?limit=100")
+        self.assertIsNone(resp.getheader("Content-Encoding"))
+        resp, zipped = self.request("GET", "/vehicles?limit=100", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(zipped, plain)
+        resp, _ = self.request("GET", "/vehicles?limit=100", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": resp.getheader("ETag")})
+        self.assertEqual(resp.status, 304)
+
+    def test_metrics_endpoint(self):
+        metrics.reset()
+        metrics.enable()
+        self.addCleanup(metrics.disable)
+        self.request("POST", "/customers", {"name": "Ann", "email": "a@x.com", "phone": "1"})
+        _, doc = self.request("GET", "/metrics?format=json")
+        self.assertEqual(doc["service"]["add_customer"]["count"], 1)
+        self.conn.request("GET", "/metrics")
+        resp = self.conn.getresponse()
+        self.assertTrue(resp.getheader("Content-Type").startswith("text/plain"))
+        self.assertIn('car_rental_service_seconds_count{method="add_customer"} 1', resp.read().decode())
+        resp, _ = self.request("GET", "/metrics?format=xml")
+        self.assertEqual(resp.status, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
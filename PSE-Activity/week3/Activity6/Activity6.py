@@ -1,21 +1,83 @@
 import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shlex
+import sys
+import time
 from pathlib import Path
 import sqlite3
 
 DB_PATH = Path(__file__).with_name("university.sqlite3")
 ROOT = Path(__file__).parent
 
+_shared = None  # set while a batch or shell runs so every command reuses one connection
+
 def conn():
+    if _shared is not None:
+        return _shared
     c = sqlite3.connect(DB_PATH)
     c.row_factory = sqlite3.Row
     c.execute("PRAGMA foreign_keys = ON;")
     return c
 
+def tuned_conn():
+    """Long-lived connection for the shell: room for every command's prepared statement,
+    WAL so a commit is an append without an fsync, temp b-trees in memory."""
+    c = sqlite3.connect(DB_PATH, cached_statements=512)
+    c.row_factory = sqlite3.Row
+    c.execute("PRAGMA foreign_keys = ON;")
+    c.execute("PRAGMA journal_mode = WAL;")
+    c.execute("PRAGMA synchronous = NORMAL;")
+    c.execute("PRAGMA temp_store = MEMORY;")
+    return c
+
+# Schema changes made after schema.sql, applied in order; PRAGMA user_version counts the applied ones.
+MIGRATIONS = [
+    # 1: index foreign-key columns that no UNIQUE constraint already leads with, so
+    #    child lookups and ON DELETE CASCADE search instead of scanning the child table
+    """
+    CREATE INDEX IF NOT EXISTS idx_lecturer_school ON LECTURER(school_id);
+    CREATE INDEX IF NOT EXISTS idx_programme_course_course ON PROGRAMME_COURSE(course_id);
+    CREATE INDEX IF NOT EXISTS idx_course_prerequisite_prereq ON COURSE_PREREQUISITE(prereq_course_id);
+    CREATE INDEX IF NOT EXISTS idx_offering_semester ON COURSE_OFFERING(semester_id, campus_id);
+    CREATE INDEX IF NOT EXISTS idx_offering_campus ON COURSE_OFFERING(campus_id, semester_id);
+    CREATE INDEX IF NOT EXISTS idx_offering_lecturer_lecturer ON OFFERING_LECTURER(lecturer_id);
+    CREATE INDEX IF NOT EXISTS idx_meeting_offering ON MEETING(offering_id);
+    CREATE INDEX IF NOT EXISTS idx_meeting_room ON MEETING(room_id);
+    CREATE INDEX IF NOT EXISTS idx_enrollment_student ON ENROLLMENT(student_id, offering_id);
+    CREATE INDEX IF NOT EXISTS idx_assessment_offering ON ASSESSMENT(offering_id);
+    CREATE INDEX IF NOT EXISTS idx_submission_student ON SUBMISSION(student_id);
+    CREATE INDEX IF NOT EXISTS idx_attendance_meeting ON ATTENDANCE(meeting_id);
+    """,
+    # 2: for the filtered queries: MEETING by (room, offering) so `query room-usage` groups
+    #    in index order, and enrolled counts per offering answered from the index alone
+    """
+    DROP INDEX IF EXISTS idx_meeting_room;
+    CREATE INDEX IF NOT EXISTS idx_meeting_room_offering ON MEETING(room_id, offering_id);
+    CREATE INDEX IF NOT EXISTS idx_enrollment_offering_status ON ENROLLMENT(offering_id, status);
+    """,
+    # 3: `query enrollments --status` on its own; the index ends in the rowid, so rows come
+    #    out in e.id order and --after is a range on the same index
+    """
+    CREATE INDEX IF NOT EXISTS idx_enrollment_status ON ENROLLMENT(status);
+    """,
+]
+
+def migrate(c):
+    (version,) = c.execute("PRAGMA user_version").fetchone()
+    for number, script in enumerate(MIGRATIONS[version:], version + 1):
+        c.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+    return len(MIGRATIONS) - version
+
 def init_db():
     sql = (ROOT / "schema.sql").read_text(encoding="utf-8")
     with conn() as c:
         c.executescript(sql)
         c.commit()
+        migrate(c)
 
 def seed_db():
     init_db()
@@ -24,113 +86,239 @@ def seed_db():
         c.executescript(sql)
         c.commit()
 
-def table_print(rows, headers):
-    if not rows:
+# ---------- output ----------
+PAGE_ROWS = 500     # rows fetched and written per step
+SAMPLE_ROWS = 100   # rows used to size table columns
+MAX_WIDTH = 60      # longer cells are cut with '…'
+
+def _pages(cur, first=()):
+    if first:
+        yield first
+    while True:
+        rows = cur.fetchmany(PAGE_ROWS)
+        if not rows:
+            return
+        yield rows
+
+def print_table(cur, headers):
+    """Column widths come from the first SAMPLE_ROWS rows; later, wider cells are truncated."""
+    sample = [[str(v) for v in r] for r in cur.fetchmany(SAMPLE_ROWS)]
+    if not sample:
         print("No rows.")
         return
-    widths = [len(h) for h in headers]
-    for r in rows:
-        for i, h in enumerate(headers):
-            widths[i] = max(widths[i], len(str(r[h])))
+    widths = [min(MAX_WIDTH, max([len(h)] + [len(r[i]) for r in sample])) for i, h in enumerate(headers)]
     def line(ch='-'):
         return '+' + '+'.join(ch * (w+2) for w in widths) + '+'
-    print(line('-'))
-    print('| ' + ' | '.join(h.ljust(widths[i]) for i, h in enumerate(headers)) + ' |')
-    print(line('='))
-    for r in rows:
-        print('| ' + ' | '.join(str(r[h]).ljust(widths[i]) for i, h in enumerate(headers)) + ' |')
-        print(line('-'))
+    def fit(v, w):
+        return v.ljust(w) if len(v) <= w else v[:w-1] + '…'
+    sep = line('-') + '\n'
+    out = sys.stdout
+    out.write(sep)
+    out.write('| ' + ' | '.join(h.ljust(widths[i]) for i, h in enumerate(headers)) + ' |\n')
+    out.write(line('=') + '\n')
+    for page in _pages(cur, sample):
+        out.write(''.join('| ' + ' | '.join(fit(str(v), w) for v, w in zip(r, widths)) + ' |\n' + sep
+                          for r in page))
+
+def print_csv(cur, headers):
+    w = csv.writer(sys.stdout, lineterminator='\n')
+    w.writerow(headers)
+    for page in _pages(cur):
+        w.writerows(page)
+
+def print_jsonl(cur, headers):
+    for page in _pages(cur):
+        sys.stdout.write(''.join(json.dumps(dict(zip(headers, r)), ensure_ascii=False) + '\n' for r in page))
+
+RENDERERS = {"table": print_table, "csv": print_csv, "jsonl": print_jsonl}
 
 # ---------- add commands ----------
-def add_school(args):
-    with conn() as c:
-        cur = c.execute("INSERT INTO SCHOOL(name) VALUES (?)", (args.name,))
-        c.commit()
-        print("SCHOOL id=", cur.lastrowid)
+# entity -> (label printed after insert, INSERT statement, argument names in placeholder order)
+INSERTS = {
+    "school":     ("SCHOOL", "INSERT INTO SCHOOL(name) VALUES (?)", ("name",)),
+    "programme":  ("PROGRAMME", "INSERT INTO PROGRAMME(school_id, name) VALUES (?, ?)", ("school_id", "name")),
+    "course":     ("COURSE", "INSERT INTO COURSE(school_id, code, title) VALUES (?, ?, ?)", ("school_id", "code", "title")),
+    "lecturer":   ("LECTURER", "INSERT INTO LECTURER(school_id, name, email) VALUES (?, ?, ?)", ("school_id", "name", "email")),
+    "student":    ("STUDENT", "INSERT INTO STUDENT(name, email) VALUES (?, ?)", ("name", "email")),
+    "campus":     ("CAMPUS", "INSERT INTO CAMPUS(name) VALUES (?)", ("name",)),
+    "building":   ("BUILDING", "INSERT INTO BUILDING(campus_id, name) VALUES (?, ?)", ("campus_id", "name")),
+    "room":       ("ROOM", "INSERT INTO ROOM(building_id, name, capacity) VALUES (?, ?, ?)", ("building_id", "name", "capacity")),
+    "semester":   ("SEMESTER", "INSERT INTO SEMESTER(name, start_date, end_date) VALUES (?, ?, ?)", ("name", "start", "end")),
+    "offering":   ("OFFERING", "INSERT INTO COURSE_OFFERING(course_id, semester_id, campus_id, section) VALUES (?, ?, ?, ?)", ("course_id", "semester_id", "campus_id", "section")),
+    "enrollment": ("ENROLLMENT", "INSERT INTO ENROLLMENT(offering_id, student_id, status) VALUES (?, ?, ?)", ("offering_id", "student_id", "status")),
+}
 
-def add_programme(args):
-    with conn() as c:
-        cur = c.execute("INSERT INTO PROGRAMME(school_id, name) VALUES (?, ?)", (args.school_id, args.name))
-        c.commit()
-        print("PROGRAMME id=", cur.lastrowid)
+def insert_values(entity, args):
+    return tuple(getattr(args, f) for f in INSERTS[entity][2])
 
-def add_course(args):
+def add_row(entity, args):
+    label, sql, _ = INSERTS[entity]
     with conn() as c:
-        cur = c.execute(
-            "INSERT INTO COURSE(school_id, code, title) VALUES (?, ?, ?)",
-            (args.school_id, args.code, args.title),
-        )
+        cur = c.execute(sql, insert_values(entity, args))
         c.commit()
-        print("COURSE id=", cur.lastrowid)
+        print(f"{label} id=", cur.lastrowid)
 
-def add_lecturer(args):
-    with conn() as c:
-        cur = c.execute(
-            "INSERT INTO LECTURER(school_id, name, email) VALUES (?, ?, ?)",
-            (args.school_id, args.name, args.email),
-        )
-        c.commit()
-        print("LECTURER id=", cur.lastrowid)
+# ---------- view commands ----------
+# view -> (SELECT ... FROM ... JOIN ..., key column for ordering and --after, headers)
+VIEWS = {
+    "schools":     ("SELECT id, name FROM SCHOOL", "id", ["id","name"]),
+    "programmes":  ("SELECT p.id, s.name AS school, p.name FROM PROGRAMME p JOIN SCHOOL s ON s.id=p.school_id", "p.id", ["id","school","name"]),
+    "courses":     ("SELECT c.id, s.name AS school, c.code, c.title FROM COURSE c JOIN SCHOOL s ON s.id=c.school_id", "c.id", ["id","school","code","title"]),
+    "lecturers":   ("SELECT l.id, s.name AS school, l.name, l.email FROM LECTURER l JOIN SCHOOL s ON s.id=l.school_id", "l.id", ["id","school","name","email"]),
+    "students":    ("SELECT id, name, email FROM STUDENT", "id", ["id","name","email"]),
+    "campuses":    ("SELECT id, name FROM CAMPUS", "id", ["id","name"]),
+    "buildings":   ("SELECT b.id, c.name AS campus, b.name FROM BUILDING b JOIN CAMPUS c ON c.id=b.campus_id", "b.id", ["id","campus","name"]),
+    "rooms":       ("SELECT r.id, b.name AS building, r.name, r.capacity FROM ROOM r JOIN BUILDING b ON b.id=r.building_id", "r.id", ["id","building","name","capacity"]),
+    "semesters":   ("SELECT id, name, start_date, end_date FROM SEMESTER", "id", ["id","name","start_date","end_date"]),
+    "offerings":   ("SELECT o.id, c.code AS course, s.name AS semester, cp.name AS campus, o.section FROM COURSE_OFFERING o JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER s ON s.id=o.semester_id JOIN CAMPUS cp ON cp.id=o.campus_id", "o.id", ["id","course","semester","campus","section"]),
+    "enrollments": ("SELECT e.id, st.name AS student, c.code AS course, se.name AS semester, e.status FROM ENROLLMENT e JOIN STUDENT st ON st.id=e.student_id JOIN COURSE_OFFERING o ON o.id=e.offering_id JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER se ON se.id=o.semester_id", "e.id", ["id","student","course","semester","status"]),
+}
 
-def add_student(args):
-    with conn() as c:
-        cur = c.execute("INSERT INTO STUDENT(name, email) VALUES (?, ?)", (args.name, args.email))
-        c.commit()
-        print("STUDENT id=", cur.lastrowid)
+def single_key(key):
+    """Keyset paging (--after ID) needs a single-column key; composite keys only get LIMIT/OFFSET."""
+    return "," not in key
 
-def add_campus(args):
-    with conn() as c:
-        cur = c.execute("INSERT INTO CAMPUS(name) VALUES (?)", (args.name,))
-        c.commit()
-        print("CAMPUS id=", cur.lastrowid)
+def select_sql(sql, key, where=(), params=(), group=None, having=(), after=None, limit=None, offset=0):
+    """Add WHERE/GROUP BY/HAVING, keyset paging on `key` and LIMIT/OFFSET to a SELECT ... FROM ... JOIN."""
+    where, params = list(where), list(params)
+    if after is not None:  # keyset paging: resume after the last id seen, no rows skipped over
+        where.append(f"{key} > ?")
+        params.append(after)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group:
+        sql += f" GROUP BY {group}"
+    if having:
+        sql += " HAVING " + " AND ".join(having)
+    sql += f" ORDER BY {key}"
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+    return sql, params
 
-def add_building(args):
-    with conn() as c:
-        cur = c.execute("INSERT INTO BUILDING(campus_id, name) VALUES (?, ?)", (args.campus_id, args.name))
-        c.commit()
-        print("BUILDING id=", cur.lastrowid)
+def view_sql(view, after=None, limit=None, offset=0):
+    sql, key, _ = VIEWS[view]
+    return select_sql(sql, key, after=after, limit=limit, offset=offset)
 
-def add_room(args):
-    with conn() as c:
-        cur = c.execute(
-            "INSERT INTO ROOM(building_id, name, capacity) VALUES (?, ?, ?)",
-            (args.building_id, args.name, args.capacity),
-        )
-        c.commit()
-        print("ROOM id=", cur.lastrowid)
+def _stream(sql, params, headers, fmt):
+    cur = conn().cursor()
+    cur.row_factory = None  # plain tuples; the renderers index by position
+    try:
+        cur.execute(sql, params)
+        RENDERERS[fmt](cur, headers)
+    finally:  # also on Ctrl-C in the shell, which keeps the connection
+        cur.close()
 
-def add_semester(args):
-    with conn() as c:
-        cur = c.execute(
-            "INSERT INTO SEMESTER(name, start_date, end_date) VALUES (?, ?, ?)",
-            (args.name, args.start, args.end),
-        )
-        c.commit()
-        print("SEMESTER id=", cur.lastrowid)
+def view_table(view, args):
+    sql, params = view_sql(view, args.after, args.limit, args.offset)
+    _stream(sql, params, VIEWS[view][2], args.format)
 
-def add_offering(args):
-    with conn() as c:
-        cur = c.execute(
-            "INSERT INTO COURSE_OFFERING(course_id, semester_id, campus_id, section) VALUES (?, ?, ?, ?)",
-            (args.course_id, args.semester_id, args.campus_id, args.section),
-        )
-        c.commit()
-        print("OFFERING id=", cur.lastrowid)
+# ---------- filtered queries ----------
+# Each filter is option -> (condition, type); a type of None makes it a flag with no parameter.
+# Counts come from correlated COUNT(*) subqueries that search ENROLLMENT's (offering_id, student_id) index.
+ENROLLED_COUNT = "(SELECT COUNT(*) FROM ENROLLMENT en WHERE en.offering_id = o.id AND en.status = 'ENROLLED')"
+QUERIES = {
+    "enrollments": {
+        "help": "enrollments by student, offering, semester and/or status",
+        "sql": "SELECT e.id, st.name AS student, c.code AS course, o.section, se.name AS semester, e.status FROM ENROLLMENT e JOIN STUDENT st ON st.id=e.student_id JOIN COURSE_OFFERING o ON o.id=e.offering_id JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER se ON se.id=o.semester_id",
+        "key": "e.id",
+        "headers": ["id","student","course","section","semester","status"],
+        "where": {"student_id": ("e.student_id = ?", int), "offering_id": ("e.offering_id = ?", int),
+                  "semester_id": ("o.semester_id = ?", int), "status": ("e.status = ?", str)},
+    },
+    "offerings": {
+        "help": "offerings by campus, semester and/or course, with enrolled counts",
+        "sql": f"SELECT o.id, c.code AS course, s.name AS semester, cp.name AS campus, o.section, {ENROLLED_COUNT} AS enrolled FROM COURSE_OFFERING o JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER s ON s.id=o.semester_id JOIN CAMPUS cp ON cp.id=o.campus_id",
+        "key": "o.id",
+        "headers": ["id","course","semester","campus","section","enrolled"],
+        "where": {"campus_id": ("o.campus_id = ?", int), "semester_id": ("o.semester_id = ?", int),
+                  "course_id": ("o.course_id = ?", int)},
+    },
+    "room-usage": {
+        "help": "room capacity vs. enrolled count for each offering that meets in the room",
+        "sql": f"SELECT r.id, b.name AS building, r.name AS room, r.capacity, o.id AS offering_id, c.code AS course, se.name AS semester, {ENROLLED_COUNT} AS enrolled FROM MEETING m JOIN ROOM r ON r.id=m.room_id JOIN BUILDING b ON b.id=r.building_id JOIN COURSE_OFFERING o ON o.id=m.offering_id JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER se ON se.id=o.semester_id",
+        "key": "m.room_id, m.offering_id",
+        "group": "m.room_id, m.offering_id",  # one row per room and offering, however many meetings
+        "headers": ["room_id","building","room","capacity","offering_id","course","semester","enrolled"],
+        "where": {"semester_id": ("o.semester_id = ?", int), "campus_id": ("b.campus_id = ?", int),
+                  "room_id": ("m.room_id = ?", int)},
+        "having": {"over_capacity": ("enrolled > r.capacity", None)},
+    },
+}
 
-def add_enrollment(args):
-    with conn() as c:
-        cur = c.execute(
-            "INSERT INTO ENROLLMENT(offering_id, student_id, status) VALUES (?, ?, ?)",
-            (args.offering_id, args.student_id, args.status),
-        )
-        c.commit()
-        print("ENROLLMENT id=", cur.lastrowid)
+def query_sql(name, values, after=None, limit=None, offset=0):
+    """SQL and parameters for QUERIES[name] with the filters whose value in `values` is set."""
+    q = QUERIES[name]
+    clauses = {"where": ([], []), "having": ([], [])}
+    for part, (conds, params) in clauses.items():
+        for opt, (cond, kind) in q.get(part, {}).items():
+            value = values.get(opt)
+            if value is None or value is False:
+                continue
+            conds.append(cond)
+            if kind is not None:
+                params.append(value)
+    (where, where_params), (having, having_params) = clauses["where"], clauses["having"]
+    return select_sql(q["sql"], q["key"], where, where_params + having_params, q.get("group"), having,
+                      after, limit, offset)
 
-# ---------- view commands ----------
-def view_table(sql, headers):
-    with conn() as c:
-        rows = c.execute(sql).fetchall()
-    table_print(rows, headers)
+def run_query(name, args):
+    sql, params = query_sql(name, vars(args), getattr(args, "after", None), args.limit, args.offset)
+    _stream(sql, params, QUERIES[name]["headers"], args.format)
+
+# ---------- query plans ----------
+def plan_lines(c, sql, params=(), filtered=False):
+    """(depth, detail, flag) for each EXPLAIN QUERY PLAN row.
+
+    The outermost loop of an unfiltered listing may scan (it reads every row anyway);
+    any other SCAN, including the outer one when the statement has a WHERE filter,
+    and any automatic index is flagged, and so is a temp b-tree for ORDER BY/GROUP BY
+    when the outer loop scanned (sorting a filtered search result is cheap).
+    """
+    depth, lines, first_loop, outer_scan = {0: -1}, [], True, False
+    for node, parent, _, detail in c.execute("EXPLAIN QUERY PLAN " + sql, params):
+        depth[node] = depth.get(parent, -1) + 1
+        flag = None
+        if detail.startswith(("SCAN", "SEARCH")):
+            if detail.startswith("SCAN") and (filtered or not first_loop):
+                flag = "full scan"
+            elif "AUTOMATIC" in detail:  # SQLite builds a throw-away index on every run
+                flag = "automatic index"
+            if first_loop:
+                outer_scan = detail.startswith("SCAN")
+            first_loop = False
+        elif detail.startswith("USE TEMP B-TREE") and outer_scan:
+            flag = "sort"
+        lines.append((depth[node], detail, flag))
+    return lines
+
+def _explain_cases(names, after, limit):
+    """(label, sql, params, filtered): every view, then every query once per filter (others unset)."""
+    for name in VIEWS:
+        if not names or name in names:
+            yield (f"view {name}", *view_sql(name, after, limit), False)
+    for name, q in QUERIES.items():
+        if names and name not in names:
+            continue
+        for opt, (_, kind) in {**q.get("where", {}), **q.get("having", {})}.items():
+            value = True if kind is None else kind(1)
+            sql, params = query_sql(name, {opt: value}, after if single_key(q["key"]) else None, limit)
+            yield f"query {name} --{opt}", sql, params, opt in q.get("where", {})
+
+def explain_views(args):
+    unknown = [v for v in args.views if v not in VIEWS and v not in QUERIES]
+    if unknown:
+        sys.exit(f"Unknown view(s): {', '.join(unknown)}")
+    c = conn()
+    flagged = 0
+    for label, sql, params, filtered in _explain_cases(args.views, args.after, args.limit):
+        print(f"{label}: {sql}")
+        for d, detail, flag in plan_lines(c, sql, params, filtered):
+            print("  " * (d + 1) + detail + (f"   <-- {flag}" if flag else ""))
+            flagged += flag is not None
+    print(f"{flagged} flagged plan step(s).")
+    if flagged:
+        sys.exit(1)
 
 # ---------- delete commands ----------
 def del_by_id(table, id_value):
@@ -148,6 +336,172 @@ def del_enrollment(args):
         c.commit()
         print(f"Deleted rows: {cur.rowcount}")
 
+# ---------- batch mode ----------
+BATCH_CHUNK = 500  # rows per transaction
+
+def _parse_line(parser, argv):
+    """Parse one command; argparse errors come back as a message instead of exiting."""
+    err = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(err):
+            return parser.parse_args(argv), None
+    except SystemExit as e:
+        if e.code == 0:  # --help, already printed
+            return None, None
+        lines = err.getvalue().strip().splitlines()
+        return None, lines[-1].split(": error: ", 1)[-1] if lines else "invalid command"
+
+def _command_lines(f):
+    for line_no, line in enumerate(f, 1):
+        argv = shlex.split(line, comments=True)
+        if argv:
+            yield line_no, argv
+
+def _csv_lines(f, entity):
+    """Each CSV row becomes `add <entity> --col value ...`; empty cells fall back to the option default."""
+    reader = csv.DictReader(f)
+    for row in reader:
+        argv = ["add", entity]
+        for col, value in row.items():
+            if col and value not in (None, ""):
+                argv += [f"--{col.strip()}", value]
+        yield reader.line_num, argv
+
+def _flush(c, entity, chunk, failures):
+    """Insert [(line_no, values)] in one transaction; if any row fails, redo it row by row."""
+    sql = INSERTS[entity][1]
+    try:
+        with c:
+            c.executemany(sql, [values for _, values in chunk])
+        return len(chunk)
+    except sqlite3.Error:
+        pass  # the whole chunk was rolled back
+    inserted = 0
+    with c:
+        for line_no, values in chunk:
+            try:
+                c.execute(sql, values)
+                inserted += 1
+            except sqlite3.Error as e:
+                failures.append((line_no, str(e)))
+    return inserted
+
+def run_batch(args, parser):
+    """Run add/view/delete commands (or CSV rows for one entity) over a single connection.
+
+    Consecutive `add` commands for the same entity are inserted with executemany,
+    BATCH_CHUNK rows per transaction. A failing row or command is reported with its
+    line number and skipped; the rest of the batch still runs.
+    """
+    global _shared
+    f = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+    lines = _csv_lines(f, args.csv) if args.csv else _command_lines(f)
+    failures, inserted, other = [], 0, 0
+    pending_entity, chunk = None, []
+    _shared = conn()
+    try:
+        for line_no, argv in lines:
+            a, error = _parse_line(parser, argv)
+            if a is not None and a.cmd in ("batch", "shell"):
+                error = f"{a.cmd} cannot run inside a batch"
+            if error is not None:
+                failures.append((line_no, error))
+            if error is not None or a is None:
+                continue
+            if a.cmd == "add":
+                if a.entity != pending_entity or len(chunk) >= args.chunk:
+                    if chunk:
+                        inserted += _flush(_shared, pending_entity, chunk, failures)
+                    pending_entity, chunk = a.entity, []
+                chunk.append((line_no, insert_values(a.entity, a)))
+                continue
+            if chunk:  # keep the stream's order: earlier adds land before a view/delete runs
+                inserted += _flush(_shared, pending_entity, chunk, failures)
+                chunk = []
+            try:
+                a.func(a)
+                other += 1
+            except sqlite3.Error as e:
+                failures.append((line_no, str(e)))
+            except SystemExit as e:  # e.g. explain with an unknown view or a flagged plan
+                if e.code in (None, 0):
+                    other += 1
+                else:
+                    failures.append((line_no, e.code if isinstance(e.code, str) else f"{a.cmd} exited with status {e.code}"))
+        if chunk:
+            inserted += _flush(_shared, pending_entity, chunk, failures)
+    finally:
+        _shared.close()
+        _shared = None
+        if f is not sys.stdin:
+            f.close()
+    for line_no, error in sorted(failures):
+        print(f"line {line_no}: {error}", file=sys.stderr)
+    print(f"Batch done: {inserted} rows inserted, {other} other commands, {len(failures)} failed.")
+    if failures:
+        sys.exit(1)
+
+# ---------- interactive shell ----------
+SHELL_HELP = "Commands as on the command line without the program name, e.g. `view students --limit 5`. " \
+             "`help` lists them; Ctrl-C cancels a line or a running command; `exit` or Ctrl-D leaves."
+
+def run_shell(args, parser):
+    """Read-eval loop over one tuned connection; the parser is built once by main()."""
+    global _shared
+    try:
+        import readline  # noqa: F401  (line editing and history where available)
+    except ImportError:
+        pass
+    _shared = tuned_conn()
+    interactive = sys.stdin.isatty()
+    if interactive:
+        print(f"University shell on {DB_PATH}. {SHELL_HELP}")
+    try:
+        while True:
+            try:
+                line = input("university> " if interactive else "")
+            except EOFError:
+                break
+            except KeyboardInterrupt:  # Ctrl-C drops the line being typed, as in a shell
+                print()
+                continue
+            try:
+                argv = shlex.split(line, comments=True)
+            except ValueError as e:  # unbalanced quotes
+                print(f"error: {e}")
+                continue
+            if not argv:
+                continue
+            if argv[0] in ("exit", "quit"):
+                break
+            if argv[0] == "help":
+                parser.print_help()
+                continue
+            start = time.perf_counter()
+            a, error = _parse_line(parser, argv)
+            if a is not None and a.cmd in ("batch", "shell"):
+                error = f"{a.cmd} is not available inside the shell"
+            if error is not None:
+                print(f"error: {error}")
+                continue
+            if a is None:
+                continue
+            try:
+                a.func(a)
+            except sqlite3.Error as e:
+                print(f"error: {e}")
+            except SystemExit as e:  # commands such as explain report through their exit status
+                if isinstance(e.code, str):
+                    print(e.code)
+            except KeyboardInterrupt:  # stops a long view; an unfinished write was rolled back
+                print()
+                continue
+            if args.timing:
+                print(f"({(time.perf_counter() - start) * 1000:.2f} ms)")
+    finally:
+        _shared.close()
+        _shared = None
+
 def build_parser():
     p = argparse.ArgumentParser(description="Week 3 — Activity 4: University ERD SQLite CLI")
     sub = p.add_subparsers(dest="cmd", required=True)
@@ -158,31 +512,42 @@ def build_parser():
     # add
     add = sub.add_parser("add"); add_sub = add.add_subparsers(dest="entity", required=True)
 
-    sp = add_sub.add_parser("school");   sp.add_argument("--name", required=True); sp.set_defaults(func=add_school)
-    sp = add_sub.add_parser("programme");sp.add_argument("--school_id", type=int, required=True); sp.add_argument("--name", required=True); sp.set_defaults(func=add_programme)
-    sp = add_sub.add_parser("course");   sp.add_argument("--school_id", type=int, required=True); sp.add_argument("--code", required=True); sp.add_argument("--title", required=True); sp.set_defaults(func=add_course)
-    sp = add_sub.add_parser("lecturer"); sp.add_argument("--school_id", type=int, required=True); sp.add_argument("--name", required=True); sp.add_argument("--email", default=None); sp.set_defaults(func=add_lecturer)
-    sp = add_sub.add_parser("student");  sp.add_argument("--name", required=True); sp.add_argument("--email", required=True); sp.set_defaults(func=add_student)
-    sp = add_sub.add_parser("campus");   sp.add_argument("--name", required=True); sp.set_defaults(func=add_campus)
-    sp = add_sub.add_parser("building"); sp.add_argument("--campus_id", type=int, required=True); sp.add_argument("--name", required=True); sp.set_defaults(func=add_building)
-    sp = add_sub.add_parser("room");     sp.add_argument("--building_id", type=int, required=True); sp.add_argument("--name", required=True); sp.add_argument("--capacity", type=int, default=0); sp.set_defaults(func=add_room)
-    sp = add_sub.add_parser("semester"); sp.add_argument("--name", required=True); sp.add_argument("--start", required=True); sp.add_argument("--end", required=True); sp.set_defaults(func=add_semester)
-    sp = add_sub.add_parser("offering"); sp.add_argument("--course_id", type=int, required=True); sp.add_argument("--semester_id", type=int, required=True); sp.add_argument("--campus_id", type=int, required=True); sp.add_argument("--section", required=True); sp.set_defaults(func=add_offering)
-    sp = add_sub.add_parser("enrollment"); sp.add_argument("--offering_id", type=int, required=True); sp.add_argument("--student_id", type=int, required=True); sp.add_argument("--status", default="ENROLLED"); sp.set_defaults(func=add_enrollment)
+    sp = add_sub.add_parser("school");   sp.add_argument("--name", required=True); sp.set_defaults(func=lambda a, e="school": add_row(e, a))
+    sp = add_sub.add_parser("programme");sp.add_argument("--school_id", type=int, required=True); sp.add_argument("--name", required=True); sp.set_defaults(func=lambda a, e="programme": add_row(e, a))
+    sp = add_sub.add_parser("course");   sp.add_argument("--school_id", type=int, required=True); sp.add_argument("--code", required=True); sp.add_argument("--title", required=True); sp.set_defaults(func=lambda a, e="course": add_row(e, a))
+    sp = add_sub.add_parser("lecturer"); sp.add_argument("--school_id", type=int, required=True); sp.add_argument("--name", required=True); sp.add_argument("--email", default=None); sp.set_defaults(func=lambda a, e="lecturer": add_row(e, a))
+    sp = add_sub.add_parser("student");  sp.add_argument("--name", required=True); sp.add_argument("--email", required=True); sp.set_defaults(func=lambda a, e="student": add_row(e, a))
+    sp = add_sub.add_parser("campus");   sp.add_argument("--name", required=True); sp.set_defaults(func=lambda a, e="campus": add_row(e, a))
+    sp = add_sub.add_parser("building"); sp.add_argument("--campus_id", type=int, required=True); sp.add_argument("--name", required=True); sp.set_defaults(func=lambda a, e="building": add_row(e, a))
+    sp = add_sub.add_parser("room");     sp.add_argument("--building_id", type=int, required=True); sp.add_argument("--name", required=True); sp.add_argument("--capacity", type=int, default=0); sp.set_defaults(func=lambda a, e="room": add_row(e, a))
+    sp = add_sub.add_parser("semester"); sp.add_argument("--name", required=True); sp.add_argument("--start", required=True); sp.add_argument("--end", required=True); sp.set_defaults(func=lambda a, e="semester": add_row(e, a))
+    sp = add_sub.add_parser("offering"); sp.add_argument("--course_id", type=int, required=True); sp.add_argument("--semester_id", type=int, required=True); sp.add_argument("--campus_id", type=int, required=True); sp.add_argument("--section", required=True); sp.set_defaults(func=lambda a, e="offering": add_row(e, a))
+    sp = add_sub.add_parser("enrollment"); sp.add_argument("--offering_id", type=int, required=True); sp.add_argument("--student_id", type=int, required=True); sp.add_argument("--status", default="ENROLLED"); sp.set_defaults(func=lambda a, e="enrollment": add_row(e, a))
 
     # view
+    def output_options(sp, keyset=True):
+        sp.add_argument("--limit", type=int, default=None, help="stop after this many rows")
+        sp.add_argument("--offset", type=int, default=0, help="skip this many rows first")
+        if keyset:
+            sp.add_argument("--after", type=int, default=None, metavar="ID", help="only rows with id > ID (keyset paging)")
+        sp.add_argument("--format", choices=RENDERERS, default="table")
+
     view = sub.add_parser("view"); view_sub = view.add_subparsers(dest="entity", required=True)
-    view_sub.add_parser("schools").set_defaults(func=lambda a: view_table("SELECT * FROM SCHOOL ORDER BY id", ["id","name"]))
-    view_sub.add_parser("programmes").set_defaults(func=lambda a: view_table("SELECT p.id, s.name AS school, p.name FROM PROGRAMME p JOIN SCHOOL s ON s.id=p.school_id ORDER BY p.id", ["id","school","name"]))
-    view_sub.add_parser("courses").set_defaults(func=lambda a: view_table("SELECT c.id, s.name AS school, c.code, c.title FROM COURSE c JOIN SCHOOL s ON s.id=c.school_id ORDER BY c.id", ["id","school","code","title"]))
-    view_sub.add_parser("lecturers").set_defaults(func=lambda a: view_table("SELECT l.id, s.name AS school, l.name, l.email FROM LECTURER l JOIN SCHOOL s ON s.id=l.school_id ORDER BY l.id", ["id","school","name","email"]))
-    view_sub.add_parser("students").set_defaults(func=lambda a: view_table("SELECT * FROM STUDENT ORDER BY id", ["id","name","email"]))
-    view_sub.add_parser("campuses").set_defaults(func=lambda a: view_table("SELECT * FROM CAMPUS ORDER BY id", ["id","name"]))
-    view_sub.add_parser("buildings").set_defaults(func=lambda a: view_table("SELECT b.id, c.name AS campus, b.name FROM BUILDING b JOIN CAMPUS c ON c.id=b.campus_id ORDER BY b.id", ["id","campus","name"]))
-    view_sub.add_parser("rooms").set_defaults(func=lambda a: view_table("SELECT r.id, b.name AS building, r.name, r.capacity FROM ROOM r JOIN BUILDING b ON b.id=r.building_id ORDER BY r.id", ["id","building","name","capacity"]))
-    view_sub.add_parser("semesters").set_defaults(func=lambda a: view_table("SELECT * FROM SEMESTER ORDER BY id", ["id","name","start_date","end_date"]))
-    view_sub.add_parser("offerings").set_defaults(func=lambda a: view_table("SELECT o.id, c.code AS course, s.name AS semester, cp.name AS campus, o.section FROM COURSE_OFFERING o JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER s ON s.id=o.semester_id JOIN CAMPUS cp ON cp.id=o.campus_id ORDER BY o.id", ["id","course","semester","campus","section"]))
-    view_sub.add_parser("enrollments").set_defaults(func=lambda a: view_table("SELECT e.id, st.name AS student, c.code AS course, se.name AS semester, e.status FROM ENROLLMENT e JOIN STUDENT st ON st.id=e.student_id JOIN COURSE_OFFERING o ON o.id=e.offering_id JOIN COURSE c ON c.id=o.course_id JOIN SEMESTER se ON se.id=o.semester_id ORDER BY e.id", ["id","student","course","semester","status"]))
+    for name in VIEWS:
+        sp = view_sub.add_parser(name); output_options(sp)
+        sp.set_defaults(func=lambda a, v=name: view_table(v, a))
+
+    # query
+    query = sub.add_parser("query"); query_sub = query.add_subparsers(dest="entity", required=True)
+    for name, q in QUERIES.items():
+        sp = query_sub.add_parser(name, help=q["help"])
+        for opt, (_, kind) in {**q.get("where", {}), **q.get("having", {})}.items():
+            if kind is None:
+                sp.add_argument(f"--{opt}", action="store_true")
+            else:
+                sp.add_argument(f"--{opt}", type=kind, default=None)
+        output_options(sp, keyset=single_key(q["key"]))
+        sp.set_defaults(func=lambda a, n=name: run_query(n, a))
 
     # delete
     delete = sub.add_parser("delete"); del_sub = delete.add_subparsers(dest="entity", required=True)
@@ -190,12 +555,36 @@ def build_parser():
         sp = del_sub.add_parser(tab); sp.add_argument("--id", type=int, required=True); sp.set_defaults(func=lambda a, t=tab.upper(): del_by_id(t, a.id))
     sp = del_sub.add_parser("enrollment"); sp.add_argument("--offering_id", type=int, required=True); sp.add_argument("--student_id", type=int, required=True); sp.set_defaults(func=del_enrollment)
 
+    # explain
+    sp = sub.add_parser("explain", help="print EXPLAIN QUERY PLAN for the views and queries")
+    sp.add_argument("views", nargs="*", metavar="NAME", help="views/queries to plan (default: all)")
+    sp.add_argument("--after", type=int, default=None, metavar="ID", help="plan the keyset page form")
+    sp.add_argument("--limit", type=int, default=None)
+    sp.set_defaults(func=explain_views)
+
+    # batch
+    sp = sub.add_parser("batch", help="run many commands over one connection")
+    sp.add_argument("file", nargs="?", default="-", help="one command per line, or CSV with --csv ('-' = stdin)")
+    sp.add_argument("--csv", choices=sorted(INSERTS), metavar="ENTITY",
+                    help="read CSV rows for ENTITY; header names are the add options (e.g. name,email)")
+    sp.add_argument("--chunk", type=int, default=BATCH_CHUNK, help="rows per transaction")
+    sp.set_defaults(func=lambda a: run_batch(a, p))
+
+    # shell
+    sp = sub.add_parser("shell", help="interactive prompt over one open connection")
+    sp.add_argument("--timing", action="store_true", help="print how long each command took")
+    sp.set_defaults(func=lambda a: run_shell(a, p))
+
     return p
 
 def main(argv=None):
     parser = build_parser()
     args = parser.parse_args(argv)
-    args.func(args)
+    try:
+        args.func(args)
+    except BrokenPipeError:  # e.g. `view enrollments --format csv | head`; silence the final flush too
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
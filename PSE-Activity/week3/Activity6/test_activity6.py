@@ -0,0 +1,272 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import Activity6
+
+
+class TempDBTestCase(unittest.TestCase):
+    """Each test runs against a freshly seeded database in a temp directory."""
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(Activity6, "DB_PATH", Path(self.tmpdir) / "university.sqlite3")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Activity6.seed_db()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def run_cli(self, *argv):
+        """(exit code or None, stdout, stderr) of one CLI invocation."""
+        out, err, code = io.StringIO(), io.StringIO(), None
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                Activity6.main(list(argv))
+            except SystemExit as e:
+                code = e.code
+        return code, out.getvalue(), err.getvalue()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def sql(self, statement, params=()):
+        c = sqlite3.connect(Activity6.DB_PATH)
+        try:
+            with c:
+                return c.execute(statement, params).fetchall()
+        finally:
+            c.close()
+
+    def add_students(self, count):
+        lines = "".join(f"add student --name S{i} --email s{i}@example.com\n" for i in range(count))
+        code, _, _ = self.run_cli("batch", self.write("students.txt", lines))
+        self.assertEqual(code, None)
+
+
+class TestBatch(TempDBTestCase):
+    def test_failures_are_reported_per_line(self):
+        path = self.write("commands.txt", "\n".join([
+            "# comment",
+            "add student --name Bob --email bob@example.com",
+            "add student --name Bob2 --email bob@example.com",   # duplicate email
+            "add enrollment --offering_id 99 --student_id 1",    # no such offering
+            "add student --name NoEmail",                        # argparse error
+            "explain nosuch",                                     # exits with a message
+            "add student --name Cat --email cat@example.com",
+            "shell",
+            "delete student --id 3",
+        ]) + "\n")
+        code, out, err = self.run_cli("batch", path, "--chunk", "2")
+        self.assertEqual(code, 1)
+        self.assertEqual(err.splitlines(), [
+            "line 3: UNIQUE constraint failed: STUDENT.email",
+            "line 4: FOREIGN KEY constraint failed",
+            "line 5: the following arguments are required: --email",
+            "line 6: Unknown view(s): nosuch",
+            "line 8: shell cannot run inside a batch",
+        ])
+        self.assertIn("Batch done: 2 rows inserted, 1 other commands, 5 failed.", out)
+        self.assertEqual(self.sql("SELECT name FROM STUDENT ORDER BY id"), [("Alice",), ("Bob",)])
+
+    def test_csv_rows_use_option_defaults(self):
+        self.add_students(2)
+        path = self.write("enrollments.csv", "offering_id,student_id,status\n1,2,\n1,3,WAITLISTED\n1,1,\n")
+        code, out, err = self.run_cli("batch", "--csv", "enrollment", path)
+        self.assertEqual(code, 1)
+        self.assertEqual(err.strip(), "line 4: UNIQUE constraint failed: ENROLLMENT.offering_id, ENROLLMENT.student_id")
+        self.assertIn("2 rows inserted", out)
+        self.assertEqual(self.sql("SELECT student_id, status FROM ENROLLMENT ORDER BY id"),
+                         [(1, "ENROLLED"), (2, "ENROLLED"), (3, "WAITLISTED")])
+
+    def test_commands_from_stdin_share_one_connection(self):
+        opened = []
+        real_connect = sqlite3.connect
+
+        def connect(*args, **kwargs):
+            opened.append(args)
+            return real_connect(*args, **kwargs)
+
+        stdin = io.StringIO("".join(f"add student --name S{i} --email s{i}@example.com\n" for i in range(50)))
+        with mock.patch("sys.stdin", stdin), mock.patch.object(sqlite3, "connect", connect):
+            code, out, _ = self.run_cli("batch", "-", "--chunk", "20")
+        self.assertEqual(code, None)
+        self.assertIn("Batch done: 50 rows inserted, 0 other commands, 0 failed.", out)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(self.sql("SELECT COUNT(*) FROM STUDENT"), [(51,)])
+
+
+class TestView(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_students(5)  # ids 2..6 after Alice
+
+    def test_after_and_limit(self):
+        code, out, _ = self.run_cli("view", "students", "--after", "2", "--limit", "2", "--format", "csv")
+        self.assertEqual(code, None)
+        self.assertEqual(out.splitlines(), ["id,name,email", "3,S1,s1@example.com", "4,S2,s2@example.com"])
+
+    def test_offset_and_jsonl(self):
+        _, out, _ = self.run_cli("view", "students", "--offset", "4", "--format", "jsonl")
+        rows = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual([r["id"] for r in rows], [5, 6])
+        self.assertEqual(rows[0], {"id": 5, "name": "S3", "email": "s3@example.com"})
+
+    def test_table_format(self):
+        _, out, _ = self.run_cli("view", "students", "--limit", "1")
+        self.assertEqual(out.splitlines()[1:4], ["| id | name  | email             |",
+                                                 "+====+=======+===================+",
+                                                 "| 1  | Alice | alice@example.com |"])
+        _, out, _ = self.run_cli("view", "students", "--after", "100")
+        self.assertEqual(out.strip(), "No rows.")
+
+    def test_widths_come_from_the_first_rows(self):
+        self.sql("UPDATE STUDENT SET name = ? WHERE id = 6", ("x" * 100,))
+        with mock.patch.object(Activity6, "SAMPLE_ROWS", 2):
+            _, out, _ = self.run_cli("view", "students")
+        rows = out.splitlines()
+        self.assertEqual(len({len(line) for line in rows}), 1)  # every line as wide as the sample made it
+        self.assertIn("| 6  | xxxx… |", rows[-2])  # Alice sets the width
+        _, out, _ = self.run_cli("view", "students", "--after", "5", "--format", "csv")
+        self.assertEqual(out.splitlines()[1], "6," + "x" * 100 + ",s4@example.com")  # csv is exact
+
+
+class TestQuery(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_students(2)
+        self.run_cli("add", "semester", "--name", "2025-T2", "--start", "2025-07-01", "--end", "2025-10-01")
+        self.run_cli("add", "offering", "--course_id", "1", "--semester_id", "2", "--campus_id", "1", "--section", "B")
+        for offering, student, status in ((1, 2, "ENROLLED"), (1, 3, "WITHDRAWN"), (2, 2, "ENROLLED")):
+            self.run_cli("add", "enrollment", "--offering_id", str(offering), "--student_id", str(student),
+                         "--status", status)
+
+    def query(self, *argv):
+        code, out, _ = self.run_cli("query", *argv, "--format", "csv")
+        self.assertEqual(code, None)
+        return [line.split(",") for line in out.splitlines()[1:]]
+
+    def test_enrollment_filters(self):
+        self.assertEqual([r[0] for r in self.query("enrollments", "--student_id", "2")], ["2", "4"])
+        self.assertEqual([r[0] for r in self.query("enrollments", "--status", "WITHDRAWN")], ["3"])
+        self.assertEqual([r[0] for r in self.query("enrollments", "--semester_id", "1", "--status", "ENROLLED")],
+                         ["1", "2"])
+        self.assertEqual([r[0] for r in self.query("enrollments", "--offering_id", "1", "--after", "1")], ["2", "3"])
+
+    def test_offering_counts(self):
+        rows = self.query("offerings", "--campus_id", "1")
+        self.assertEqual([(r[0], r[-1]) for r in rows], [("1", "2"), ("2", "1")])  # WITHDRAWN is not counted
+        self.assertEqual([r[0] for r in self.query("offerings", "--semester_id", "2")], ["2"])
+
+    def test_room_usage_over_capacity(self):
+        self.sql("UPDATE ROOM SET capacity = 1")
+        self.sql("""INSERT INTO MEETING(offering_id, room_id, day_of_week, start_time, end_time)
+                    VALUES (1, 1, 1, '09:00', '10:00'), (1, 1, 3, '09:00', '10:00'), (2, 1, 2, '09:00', '10:00')""")
+        rows = self.query("room-usage", "--room_id", "1")
+        self.assertEqual([(r[4], r[-1]) for r in rows], [("1", "2"), ("2", "1")])  # one row per offering
+        self.assertEqual([r[4] for r in self.query("room-usage", "--over_capacity")], ["1"])
+        code, _, err = self.run_cli("query", "room-usage", "--after", "1")
+        self.assertEqual(code, 2)
+        self.assertIn("unrecognized arguments: --after", err)
+
+
+class TestMigrations(TempDBTestCase):
+    def test_migrations_apply_once(self):
+        self.assertEqual(self.sql("PRAGMA user_version"), [(len(Activity6.MIGRATIONS),)])
+        Activity6.init_db()
+        with Activity6.conn() as c:
+            self.assertEqual(Activity6.migrate(c), 0)
+        indexes = {name for (name,) in self.sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertLessEqual({"idx_lecturer_school", "idx_meeting_offering", "idx_enrollment_student"}, indexes)
+
+
+class TestExplain(TempDBTestCase):
+    def labels(self):
+        for name in Activity6.VIEWS:
+            yield f"view {name}"
+        for name, q in Activity6.QUERIES.items():
+            for opt in {**q.get("where", {}), **q.get("having", {})}:
+                yield f"query {name} --{opt}"
+
+    def check(self, *argv):
+        code, out, _ = self.run_cli("explain", *argv)
+        self.assertEqual(code, None, out)
+        self.assertTrue(out.endswith("0 flagged plan step(s).\n"))
+        planned = {line.split(": ", 1)[0]: line for line in out.splitlines() if not line.startswith(" ")}
+        for label in self.labels():
+            self.assertIn(label, planned)
+        return planned
+
+    def test_every_case_plans_without_flags(self):
+        planned = self.check()
+        self.assertNotIn("LIMIT", planned["view students"])
+
+    def test_keyset_form(self):
+        planned = self.check("--after", "1", "--limit", "5")
+        self.assertIn("WHERE id > ? ORDER BY id LIMIT ? OFFSET ?", planned["view students"])
+        self.assertIn("WHERE e.status = ? AND e.id > ?", planned["query enrollments --status"])
+        self.assertNotIn(">", planned["query room-usage --room_id"].split(" WHERE ", 1)[1])  # composite key
+
+    def test_flags_and_exit_status(self):
+        self.sql("DROP INDEX idx_enrollment_status")
+        code, out, _ = self.run_cli("explain", "enrollments")
+        self.assertEqual(code, 1)
+        self.assertIn("SCAN e   <-- full scan", out)
+        code, _, _ = self.run_cli("explain", "nosuch")
+        self.assertEqual(code, "Unknown view(s): nosuch")
+
+
+class TestShell(TempDBTestCase):
+    def test_ctrl_c_cancels_the_line_or_command(self):
+        lines = iter([KeyboardInterrupt, "view students", "explain nosuch", "view schools --format csv", EOFError])
+
+        def fake_input(prompt=""):
+            line = next(lines)
+            if isinstance(line, type):
+                raise line
+            return line
+
+        def interrupted(cur, headers):
+            raise KeyboardInterrupt
+
+        with mock.patch("builtins.input", fake_input), \
+                mock.patch.dict(Activity6.RENDERERS, table=interrupted):
+            code, out, _ = self.run_cli("shell")
+        self.assertEqual(code, None)
+        self.assertEqual(out.splitlines(), ["", "", "Unknown view(s): nosuch", "id,name", "1,School of Computing"])
+
+    def test_commands_share_one_connection(self):
+        opened = []
+        real_connect = sqlite3.connect
+
+        def connect(*args, **kwargs):
+            opened.append(args)
+            return real_connect(*args, **kwargs)
+
+        stdin = io.StringIO("add student --name Bob --email bob@example.com\n"
+                            "add student --name Bob2 --email bob@example.com\n"
+                            "batch commands.txt\n"
+                            "view students --format csv --after 1\n"
+                            "quit\n"
+                            "view students\n")
+        with mock.patch("sys.stdin", stdin), mock.patch.object(sqlite3, "connect", connect):
+            code, out, _ = self.run_cli("shell")
+        self.assertEqual(code, None)
+        self.assertEqual(len(opened), 1)
+        self.assertIn("error: UNIQUE constraint failed: STUDENT.email", out)
+        self.assertIn("error: batch is not available inside the shell", out)
+        self.assertTrue(out.endswith("id,name,email\n2,Bob,bob@example.com\n"))  # nothing runs after quit
+
+
+if __name__ == "__main__":
+    unittest.main()